@@ -2,7 +2,35 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import functools
+import os
+import statistics
+import threading
+import time
+from collections import deque
 import warnings
+import plotly.graph_objects as go
+from investment_core import (
+    build_projection_table,
+    calculate_emi,
+    calculate_investment_returns,
+    calculate_time_to_goal,
+    DEFAULT_TRANSITION_MATRIX,
+    goal_seek,
+    inflation_adjusted_target,
+    PRESET_ALLOCATIONS,
+    sensitivity_sweep,
+    simulate_monte_carlo,
+    simulate_regime_switching,
+)
+from optimizer import optimize_allocation
+from backtest import load_return_series, load_uploaded_series, rolling_backtest, simulate_bootstrap
+from progressive import BackgroundTask
+from cashflow import cashflow_goal_seek, evaluate_cashflow_plan, ledger_projection_table, uses_cashflow_ledger
+from profiling import checkpoint, profiling, section
+from result_cache import SharedResultCache, plan_key
+from preset_tables import PresetTables
+from report import build_report, reports_to_csv, reports_to_json, reports_to_parquet
 warnings.filterwarnings('ignore')
 
 # Page configuration
@@ -243,136 +271,291 @@ EDUCATIONAL_CONTENT = {
     }
 }
 
-def calculate_scenario_risk_multipliers(scenario):
-    """Calculate risk multipliers based on market scenarios"""
-    multipliers = {
-        'normal': {
-            'mutual_funds': 1.0, 'stocks': 1.0, 'fd': 1.0, 'bonds': 1.0, 'aif': 1.0
-        },
-        'bullish': {
-            'mutual_funds': 0.7, 'stocks': 0.8, 'fd': 1.0, 'bonds': 0.9, 'aif': 0.8
-        },
-        'bearish': {
-            'mutual_funds': 1.4, 'stocks': 1.6, 'fd': 1.0, 'bonds': 1.2, 'aif': 1.8
-        }
-    }
-    return multipliers[scenario]
+# Memoized computation layer: Streamlit reruns the whole script on every
+# widget interaction, so the calculation core is cached on its inputs.
+CACHE_MAX_ENTRIES = 512
 
-def calculate_investment_returns(amount, years, monthly_investment, allocation, scenario='normal', debt_emi=0):
-    """Enhanced calculation with scenario-based risk and debt obligations"""
-    
-    asset_returns = {
-        'normal': {
-            'mutual_funds': 0.12, 'stocks': 0.15, 'fd': 0.06, 'bonds': 0.07, 'aif': 0.18
-        },
-        'bullish': {
-            'mutual_funds': 0.18, 'stocks': 0.25, 'fd': 0.06, 'bonds': 0.07, 'aif': 0.28
-        },
-        'bearish': {
-            'mutual_funds': 0.04, 'stocks': 0.02, 'fd': 0.06, 'bonds': 0.07, 'aif': 0.08
-        }
-    }
-    
-    # Base risk levels
-    base_asset_risks = {
-        'mutual_funds': 0.18, 'stocks': 0.25, 'fd': 0.02, 'bonds': 0.05, 'aif': 0.30
-    }
-    
-    # Apply scenario-based risk multipliers
-    risk_multipliers = calculate_scenario_risk_multipliers(scenario)
-    asset_risks = {
-        asset: base_asset_risks[asset] * risk_multipliers[asset] 
-        for asset in base_asset_risks
-    }
-    
-    asset_betas = {
-        'mutual_funds': 0.85, 'stocks': 1.2, 'fd': 0.0, 'bonds': 0.1, 'aif': 1.5
-    }
-    
-    returns = asset_returns[scenario]
-    
-    # Calculate portfolio metrics
-    portfolio_return = sum(allocation[asset] * returns[asset] for asset in allocation)
-    portfolio_risk = sum(allocation[asset] * asset_risks[asset] for asset in allocation)
-    portfolio_beta = sum(allocation[asset] * asset_betas[asset] for asset in allocation)
-    
-    # Calculate future value
-    months = years * 12
-    monthly_return = portfolio_return / 12
-    
-    # Adjust for debt EMI impact
-    effective_monthly_investment = max(0, monthly_investment - debt_emi)
-    
-    # Future value of lump sum
-    fv_lumpsum = amount * (1 + portfolio_return) ** years
-    
-    # Future value of monthly investments (adjusted for debt)
-    if effective_monthly_investment > 0:
-        fv_monthly = effective_monthly_investment * (((1 + monthly_return) ** months - 1) / monthly_return)
-    else:
-        fv_monthly = 0
-    
-    total_future_value = fv_lumpsum + fv_monthly
-    total_investment = amount + (monthly_investment * months)
-    total_debt_paid = debt_emi * months
-    
-    # Calculate time-adjusted Sharpe ratio
-    risk_free_rate = 0.07
-    excess_return = portfolio_return - risk_free_rate
-    annualized_sharpe = excess_return / portfolio_risk if portfolio_risk > 0 else 0
-    
-    # Time-adjusted Sharpe ratio
-    time_adjusted_sharpe = annualized_sharpe * np.sqrt(years)
-    
-    return {
-        'total_investment': total_investment,
-        'future_value': total_future_value,
-        'gains': total_future_value - total_investment,
-        'portfolio_return': portfolio_return,
-        'portfolio_risk': portfolio_risk,
-        'portfolio_beta': portfolio_beta,
-        'sharpe_ratio': annualized_sharpe,
-        'time_adjusted_sharpe': time_adjusted_sharpe,
-        'effective_monthly_investment': effective_monthly_investment,
-        'total_debt_paid': total_debt_paid
-    }
+@st.cache_resource
+def _cache_stats():
+    """Process-wide call/miss counters for the cached computation layer"""
+    return {'lock': threading.Lock(), 'calls': {}, 'misses': {}}
 
-def calculate_time_to_goal(target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi=0):
-    """Calculate time needed to reach goal considering debt obligations"""
-    effective_monthly = max(0, monthly_investment - debt_emi)
-    
-    if portfolio_return <= 0 or (initial_amount <= 0 and effective_monthly <= 0):
-        return None
-    
-    if initial_amount >= target_amount:
-        return 0
-    
-    if effective_monthly <= 0:
-        # Only lump sum
-        years_needed = np.log(target_amount / initial_amount) / np.log(1 + portfolio_return)
+def _count_cache(kind, name):
+    stats = _cache_stats()
+    with stats['lock']:
+        stats[kind][name] = stats[kind].get(name, 0) + 1
+
+def cache_statistics():
+    """Hit/miss counts per cached function as a DataFrame"""
+    stats = _cache_stats()
+    with stats['lock']:
+        rows = [
+            {'Function': name, 'Calls': calls, 'Hits': calls - stats['misses'].get(name, 0),
+             'Misses': stats['misses'].get(name, 0)}
+            for name, calls in sorted(stats['calls'].items())
+        ]
+    df = pd.DataFrame(rows, columns=['Function', 'Calls', 'Hits', 'Misses'])
+    df['Hit Rate (%)'] = (100 * df['Hits'] / df['Calls'].where(df['Calls'] > 0)).round(1)
+    return df
+
+# Simulation and backtest results are shared across sessions, so a popular
+# plan (e.g. a preset with default amounts) is simulated once per server
+SHARED_CACHE_MAX_ENTRIES = 256
+SHARED_CACHE_TTL = 6 * 60 * 60
+
+@st.cache_resource
+def shared_results():
+    """Process-wide result cache for the slow panels"""
+    return SharedResultCache(SHARED_CACHE_MAX_ENTRIES, SHARED_CACHE_TTL)
+
+def shared_result(function, *args, **kwargs):
+    """function(*args, **kwargs) through the shared result cache"""
+    return shared_results().get_or_compute(plan_key(function.__name__, *args, **kwargs), function, *args, **kwargs)
+
+@st.cache_resource
+def preset_tables():
+    """Growth-factor tables for the sidebar presets, built once per process"""
+    return PresetTables()
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_investment_returns(amount, years, monthly_investment, allocation_items, scenario, debt_emi):
+    _count_cache('misses', 'calculate_investment_returns')
+    return calculate_investment_returns(amount, years, monthly_investment, dict(allocation_items), scenario, debt_emi)
+
+def cached_investment_returns(amount, years, monthly_investment, allocation, scenario='normal', debt_emi=0):
+    """Memoized calculate_investment_returns; preset plans are looked up in the preset tables"""
+    _count_cache('calls', 'calculate_investment_returns')
+    tables = preset_tables()
+    preset = tables.preset_for(allocation, years)
+    if preset is not None:
+        return tables.investment_returns(preset, amount, years, monthly_investment, scenario, debt_emi)
+    return _cached_investment_returns(amount, years, monthly_investment, tuple(allocation.items()), scenario, debt_emi)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_time_to_goal(target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi):
+    _count_cache('misses', 'calculate_time_to_goal')
+    return calculate_time_to_goal(target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi)
+
+def cached_time_to_goal(target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi=0):
+    """Memoized calculate_time_to_goal; preset returns are looked up in the preset tables"""
+    _count_cache('calls', 'calculate_time_to_goal')
+    if preset_tables().has_goal_table(portfolio_return):
+        return preset_tables().time_to_goal(target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi)
+    return _cached_time_to_goal(target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_emi(principal, annual_rate, tenure_years):
+    _count_cache('misses', 'calculate_emi')
+    return calculate_emi(principal, annual_rate, tenure_years)
+
+def cached_emi(principal, annual_rate, tenure_years):
+    """Memoized calculate_emi"""
+    _count_cache('calls', 'calculate_emi')
+    return _cached_emi(principal, annual_rate, tenure_years)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_projection_table(amount, years, monthly_investment, allocation_items, debt_emi, scenarios, labels, monthly):
+    _count_cache('misses', 'build_projection_table')
+    return build_projection_table(
+        amount, years, monthly_investment, dict(allocation_items), debt_emi, scenarios, labels, monthly
+    )
+
+def cached_projection_table(amount, years, monthly_investment, allocation, debt_emi=0,
+                            scenarios=None, labels=None, monthly=False):
+    """Memoized build_projection_table; preset plans are looked up in the preset tables"""
+    _count_cache('calls', 'build_projection_table')
+    tables = preset_tables()
+    preset = tables.preset_for(allocation, years)
+    if preset is not None:
+        return tables.projection_table(
+            preset, amount, years, monthly_investment, debt_emi, scenarios, labels, monthly
+        )
+    return _cached_projection_table(
+        amount, years, monthly_investment, tuple(allocation.items()), debt_emi,
+        None if scenarios is None else tuple(scenarios),
+        None if labels is None else tuple(labels),
+        monthly
+    )
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_optimize_allocation(target_amount, amount, years, monthly_investment, debt_emi, scenario, max_risk):
+    _count_cache('misses', 'optimize_allocation')
+    return optimize_allocation(target_amount, amount, years, monthly_investment, debt_emi, scenario, max_risk=max_risk)
+
+def cached_optimize_allocation(target_amount, amount, years, monthly_investment, debt_emi=0,
+                               scenario='normal', max_risk=None):
+    """Memoized optimize_allocation"""
+    _count_cache('calls', 'optimize_allocation')
+    return _cached_optimize_allocation(target_amount, amount, years, monthly_investment, debt_emi, scenario, max_risk)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_cashflow_plan(amount, years, monthly_investment, allocation_items, scenario, target_amount,
+                          debt_amount, debt_rate, debt_emi, debt_tenure, sip_step_up, redirect_emi):
+    _count_cache('misses', 'evaluate_cashflow_plan')
+    return evaluate_cashflow_plan(
+        amount, years, monthly_investment, dict(allocation_items), scenario, target_amount,
+        debt_amount, debt_rate, debt_emi, debt_tenure, sip_step_up, redirect_emi
+    )
+
+def cached_cashflow_plan(amount, years, monthly_investment, allocation, scenario='normal', target_amount=None,
+                         debt_amount=0, debt_rate=0, debt_emi=0, debt_tenure=0, sip_step_up=0, redirect_emi=True):
+    """Memoized evaluate_cashflow_plan"""
+    _count_cache('calls', 'evaluate_cashflow_plan')
+    return _cached_cashflow_plan(
+        amount, years, monthly_investment, tuple(allocation.items()), scenario, target_amount,
+        debt_amount, debt_rate, debt_emi, debt_tenure, sip_step_up, redirect_emi
+    )
+
+RERUN_HISTORY = 200
+
+def record_rerun(scope, seconds):
+    """Keep the latest rerun durations per page section for the debug panel"""
+    timings = st.session_state.setdefault('rerun_timings', {})
+    timings.setdefault(scope, deque(maxlen=RERUN_HISTORY)).append(seconds * 1000)
+
+def timed_rerun(scope):
+    """Decorator recording how long each run of a page section takes"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with section(scope):
+                start = time.perf_counter()
+                result = function(*args, **kwargs)
+                record_rerun(scope, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+def rerun_statistics():
+    """Run count and cost per timed page section as a DataFrame"""
+    timings = st.session_state.get('rerun_timings', {})
+    return pd.DataFrame([
+        {'Section': scope, 'Runs': len(runs), 'Last (ms)': round(runs[-1], 1),
+         'Median (ms)': round(statistics.median(runs), 1)}
+        for scope, runs in timings.items()
+    ], columns=['Section', 'Runs', 'Last (ms)', 'Median (ms)'])
+
+def heavy_panel(name, inputs, function, args, kwargs, render, label, deferred=None, render_partial=None):
+    """Render a slow panel from the session memo or the shared result cache, or compute it on a worker thread.
+
+    While computing, the panel's placeholder shows a progress bar and
+    ``render_partial`` of the latest partial result. Given a ``deferred``
+    list the placeholder is filled after the rest of the page has rendered;
+    otherwise straight away.
+    """
+    placeholder = st.empty()
+    if st.session_state.get(f"{name}_key") == inputs:
+        with placeholder.container():
+            render(st.session_state[f"{name}_result"])
+        return
+    
+    # Results do not depend on the worker count
+    shared = shared_results()
+    key = plan_key(function.__name__, *args, **{k: v for k, v in kwargs.items() if k != 'workers'})
+    result = shared.get(key)
+    if result is not None:
+        st.session_state[f"{name}_key"] = inputs
+        st.session_state[f"{name}_result"] = result
+        with placeholder.container():
+            render(result)
+        return
+    
+    task = BackgroundTask(shared.get_or_compute, key, function, *args, **kwargs)
+    st.session_state.setdefault('background_tasks', []).append(task)
+    placeholder.progress(0.0, text=label)
+    
+    def fill():
+        try:
+            for done, total, partial in task.iter_progress():
+                with placeholder.container():
+                    st.progress(done / total, text=f"{label} {partial['n_paths']:,} paths done")
+                    if render_partial is not None:
+                        render_partial(partial)
+        except ValueError as error:
+            placeholder.error(str(error))
+            return
+        finally:
+            task.cancel()
+        st.session_state[f"{name}_key"] = inputs
+        st.session_state[f"{name}_result"] = task.result
+        with placeholder.container():
+            render(task.result)
+    
+    if deferred is None:
+        fill()
     else:
-        # Combined lump sum and SIP
-        monthly_return = portfolio_return / 12
-        if initial_amount > 0:
-            # Complex calculation for combined investment
-            # Using iterative approach for accuracy
-            for months in range(1, 1200):  # Max 100 years
-                fv_lump = initial_amount * (1 + portfolio_return) ** (months/12)
-                if effective_monthly > 0:
-                    fv_sip = effective_monthly * (((1 + monthly_return) ** months - 1) / monthly_return)
-                else:
-                    fv_sip = 0
-                if fv_lump + fv_sip >= target_amount:
-                    years_needed = months / 12
-                    break
+        deferred.append(fill)
+
+PROFILE_HISTORY = 20
+
+def profile_statistics(runs):
+    """Per-section cost of the latest profiled run and the mean over ``runs``"""
+    totals = {}
+    for run in runs:
+        for row in run['sections']:
+            totals.setdefault(row['section'], []).append(row['total_ms'])
+    last = {row['section']: row for row in runs[-1]['sections']}
+    return pd.DataFrame([
+        {'Section': path, 'Calls': last[path]['calls'] if path in last else 0,
+         'Last (ms)': round(last[path]['total_ms'], 2) if path in last else None,
+         'Mean (ms)': round(statistics.fmean(values), 2), 'Runs': len(values)}
+        for path, values in totals.items()
+    ], columns=['Section', 'Calls', 'Last (ms)', 'Mean (ms)', 'Runs'])
+
+def show_profiling_panel(profiler):
+    """Toggles for section profiling, and the results of the profiled runs"""
+    with st.expander("Debug: section profiling", expanded=False):
+        st.toggle("Profile page sections", key='profile_sections',
+                  help="Times each section of the page and the core calculations it calls")
+        st.toggle("Capture cProfile statistics", key='profile_cprofile',
+                  disabled=not st.session_state.get('profile_sections', False))
+        st.caption("Changes apply from the next run; simulations on worker threads are not covered.")
+        
+        runs = st.session_state.setdefault('profile_runs', deque(maxlen=PROFILE_HISTORY))
+        if profiler is not None:
+            runs.append(profiler.to_dict())
+        if not runs:
+            return
+        st.metric("Last profiled run", f"{runs[-1]['elapsed_ms']:,.1f} ms")
+        st.dataframe(profile_statistics(list(runs)), hide_index=True)
+        
+        col1, col2 = st.columns(2)
+        if profiler is not None:
+            with col1:
+                st.download_button("Download timings (JSON)", profiler.to_json(),
+                                   file_name="section_timings.json", mime="application/json")
+            if profiler.cprofile_error is not None:
+                st.warning(f"cProfile was not captured: {profiler.cprofile_error}")
             else:
-                years_needed = None
-        else:
-            # Only SIP
-            months_needed = np.log(1 + (target_amount * monthly_return) / effective_monthly) / np.log(1 + monthly_return)
-            years_needed = months_needed / 12
-    
-    return years_needed if years_needed and years_needed < 100 else None
+                dump = profiler.cprofile_dump()
+                if dump is not None:
+                    with col2:
+                        st.download_button("Download cProfile stats (.prof)", dump,
+                                           file_name="page_run.prof", mime="application/octet-stream",
+                                           help="Open with pstats or snakeviz")
+        if st.button("Clear profile history"):
+            runs.clear()
+
+def show_debug_panel(profiler=None):
+    """Hidden diagnostics, shown when the page is opened with ?debug=1"""
+    if st.query_params.get("debug") != "1":
+        return
+    show_profiling_panel(profiler)
+    with st.expander("Debug: computation cache", expanded=False):
+        st.dataframe(cache_statistics(), hide_index=True)
+        shared = shared_results().statistics()
+        st.caption(
+            f"Shared simulation results: {shared['entries']}/{shared['max_entries']} entries, "
+            f"{shared['hits']} hits, {shared['misses']} computed, {shared['coalesced']} waited on another session, "
+            f"{shared['evictions']} evicted, {shared['expirations']} expired, "
+            f"{shared['seconds_saved']:.1f} s of computation saved"
+        )
+        if st.button("Clear computation cache"):
+            st.cache_data.clear()
+            shared_results().clear()
+    with st.expander("Debug: rerun timings", expanded=False):
+        st.dataframe(rerun_statistics(), hide_index=True)
+        st.caption("Full page covers every widget change; the other sections rerun on their own as fragments.")
 
 def show_educational_popup(content_key):
     """Show educational content in expander"""
@@ -385,6 +568,162 @@ def show_educational_popup(content_key):
             </div>
             """, unsafe_allow_html=True)
 
+# Self-contained sections: their widgets rerun only the fragment, using
+# results already computed by the full page run
+@st.fragment
+@timed_rerun("Education Hub")
+def show_education_hub(results, time_horizon, has_debt, debt_rate):
+    """Education Hub buttons with explanations for the current plan"""
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        if st.button("Risk Management", type="secondary"):
+            st.markdown(f"""
+            <div class="educational-card">
+                <h4>Risk Management in Different Markets</h4>
+                <strong>Your Portfolio Risk Analysis:</strong><br>
+                • Normal Market: {results['normal']['portfolio_risk']*100:.1f}%<br>
+                • Bull Market: {results['bullish']['portfolio_risk']*100:.1f}%<br>
+                • Bear Market: {results['bearish']['portfolio_risk']*100:.1f}%<br><br>
+                
+                <strong>Risk varies because:</strong><br>
+                • Market sentiment affects volatility<br>
+                • Bull markets reduce perceived risk<br>
+                • Bear markets amplify uncertainty<br>
+                • Asset correlations change with conditions
+            </div>
+            """, unsafe_allow_html=True)
+    
+    with col2:
+        if st.button("Sharpe Ratio Deep Dive", type="secondary"):
+            show_educational_popup("sharpe_ratio")
+            st.markdown(f"""
+            <div class="educational-card">
+                <h4>Your Sharpe Ratio Analysis</h4>
+                <strong>Time-Adjusted Sharpe Ratios:</strong><br>
+                • Normal: {results['normal']['time_adjusted_sharpe']:.2f}<br>
+                • Bull: {results['bullish']['time_adjusted_sharpe']:.2f}<br>
+                • Bear: {results['bearish']['time_adjusted_sharpe']:.2f}<br><br>
+                
+                <strong>Investment Horizon: {time_horizon} years</strong><br>
+                Higher ratios indicate better risk-adjusted returns over your investment period.
+            </div>
+            """, unsafe_allow_html=True)
+    
+    with col3:
+        if st.button("Debt vs Investment", type="secondary"):
+            debt_analysis = debt_rate - (results['normal']['portfolio_return'] * 100) if has_debt else 0
+            st.markdown(f"""
+            <div class="educational-card">
+                <h4>Debt vs Investment Strategy</h4>
+                {"<strong>Your Situation:</strong><br>" if has_debt else ""}
+                {f"• Debt Interest: {debt_rate:.1f}%<br>" if has_debt else ""}
+                {f"• Portfolio Return: {results['normal']['portfolio_return']*100:.1f}%<br>" if has_debt else ""}
+                {f"• Cost Difference: {debt_analysis:+.1f}%<br><br>" if has_debt else ""}
+                
+                <strong>General Strategy:</strong><br>
+                • High-interest debt (>15%): Pay off first<br>
+                • Medium debt (8-15%): Balance both<br>
+                • Low-interest debt (<8%): Invest more<br>
+                • Consider tax implications
+            </div>
+            """, unsafe_allow_html=True)
+
+@st.fragment
+@timed_rerun("Age-based advice")
+def show_age_allocation(current_equity, current_debt):
+    """Age-based equity/debt rule of thumb next to the current split"""
+    user_age = st.number_input("Enter your age for personalized advice", min_value=18, max_value=80, value=35)
+    equity_percent = min(100 - user_age, 80)
+    debt_percent = 100 - equity_percent
+    
+    st.markdown(f"""
+    <div class="info-box">
+        <h4>Age-Based Allocation (Rule of Thumb)</h4>
+        <strong>Age {user_age} Suggestion:</strong><br>
+        • Equity (MF + Stocks + AIF): {equity_percent}%<br>
+        • Debt (FD + Bonds): {debt_percent}%<br><br>
+        
+        <strong>Your Current Allocation:</strong><br>
+        • Equity: {current_equity}%<br>
+        • Debt: {current_debt}%
+    </div>
+    """, unsafe_allow_html=True)
+
+@st.fragment
+@timed_rerun("Investment tips")
+def show_investment_tips(results):
+    """Tip category picker and the selected tip"""
+    tip_category = st.selectbox("Choose tip category:", [
+        "Risk Management", "Tax Planning", "Market Timing", "Rebalancing", "Emergency Planning"
+    ])
+    
+    tips = {
+        "Risk Management": f"Diversify across asset classes and review your risk tolerance annually. Your current portfolio risk varies from {results['bullish']['portfolio_risk']*100:.1f}% to {results['bearish']['portfolio_risk']*100:.1f}% across market scenarios.",
+        "Tax Planning": "Consider ELSS funds for tax saving under 80C. Debt funds held >3 years get indexation benefits.",
+        "Market Timing": "Time in the market beats timing the market. Your SIP approach helps average market volatility.",
+        "Rebalancing": "Rebalance your portfolio annually or when allocation deviates by >5% from target.",
+        "Emergency Planning": "Maintain 6-12 months of expenses in liquid funds before investing in growth assets."
+    }
+    
+    st.markdown(f"""
+    <div class="info-box">
+        <h4>{tip_category}</h4>
+        {tips[tip_category]}
+    </div>
+    """, unsafe_allow_html=True)
+
+@st.fragment
+@timed_rerun("Report")
+def show_report_generator(*report_inputs):
+    """Report button, the generated report and its downloads; takes build_report's arguments.
+
+    The report and its exports are built only when the button is pressed and
+    kept in the session, so other reruns just redraw them. A report whose
+    plan has changed since is dropped rather than shown out of date.
+    """
+    if st.button("Generate Comprehensive Report", type="primary"):
+        report = build_report(*report_inputs)
+        # Machine-readable exports carry the raw numbers rather than display strings
+        st.session_state['report'] = {
+            'report': report,
+            'display': report.to_display(),
+            'json': reports_to_json([report]),
+            'csv': reports_to_csv([report]),
+            'parquet': reports_to_parquet([report]),
+        }
+    
+    generated = st.session_state.get('report')
+    if generated is None:
+        return
+    if generated['report'] != build_report(*report_inputs):
+        del st.session_state['report']
+        st.info("Your plan has changed since the report was generated. Generate it again for the current inputs.")
+        return
+    
+    st.json(generated['display'])
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.download_button("Download JSON", generated['json'], file_name="investment_report.json",
+                           mime="application/json")
+    with col2:
+        st.download_button("Download CSV", generated['csv'], file_name="investment_report.csv",
+                           mime="text/csv")
+    with col3:
+        st.download_button("Download Parquet", generated['parquet'], file_name="investment_report.parquet",
+                           mime="application/octet-stream")
+    with col4:
+        st.button("Dismiss report", on_click=st.session_state.pop, args=('report', None))
+    
+    # Success message
+    st.markdown("""
+    <div class="success-message">
+        Report Generated Successfully!<br>
+        Download it above as JSON, CSV or Parquet to save your investment analysis
+    </div>
+    """, unsafe_allow_html=True)
+
 def create_metric_card(title, value, color="#ffffff"):
     """Create a professional metric card"""
     return f"""
@@ -394,8 +733,14 @@ def create_metric_card(title, value, color="#ffffff"):
     </div>
     """
 
+@timed_rerun("Full page")
 def main():
+    # Stop simulations still running for an interrupted earlier run
+    for task in st.session_state.pop('background_tasks', []):
+        task.cancel()
+    
     # Header
+    checkpoint("Header")
     st.markdown("""
     <div class="investment-card">
         <h1>Strategic Investment Planner</h1>
@@ -415,6 +760,7 @@ def main():
     """, unsafe_allow_html=True)
     
     # Sidebar for inputs
+    checkpoint("Sidebar inputs")
     st.sidebar.header("Investment Parameters")
     
     # Investment type selection
@@ -474,6 +820,16 @@ def main():
         help="How long do you plan to invest?"
     )
     
+    sip_step_up = 0
+    if monthly_investment > 0:
+        sip_step_up = st.sidebar.slider(
+            "Annual SIP Step-up (%)",
+            min_value=0,
+            max_value=20,
+            value=0,
+            help="Increase your SIP by this percentage every year"
+        )
+    
     # Debt Management Section
     st.sidebar.subheader("Debt Analysis (Optional)")
     has_debt = st.sidebar.checkbox("I have existing debt obligations", help="Check if you have loans/debt to consider")
@@ -482,6 +838,7 @@ def main():
     debt_rate = 0
     debt_emi = 0
     debt_tenure = 0
+    redirect_emi = True
     
     if has_debt:
         debt_amount = st.sidebar.number_input(
@@ -524,12 +881,7 @@ def main():
             )
             
             if debt_amount > 0 and debt_tenure > 0:
-                monthly_rate = debt_rate / (12 * 100)
-                num_payments = debt_tenure * 12
-                if monthly_rate > 0:
-                    debt_emi = debt_amount * (monthly_rate * (1 + monthly_rate) ** num_payments) / ((1 + monthly_rate) ** num_payments - 1)
-                else:
-                    debt_emi = debt_amount / num_payments
+                debt_emi = cached_emi(debt_amount, debt_rate, debt_tenure)
                 
                 st.sidebar.markdown(f"""
                 <div class="debt-card">
@@ -537,6 +889,12 @@ def main():
                     ₹{debt_emi:,.0f} per month
                 </div>
                 """, unsafe_allow_html=True)
+        
+        redirect_emi = st.sidebar.checkbox(
+            "Invest freed-up EMI after debt payoff",
+            value=True,
+            help="Once the loan is repaid, add the EMI amount to your monthly SIP"
+        )
     
     # Investment goals
     st.sidebar.subheader("Investment Goals")
@@ -563,7 +921,7 @@ def main():
         help="Adjust target amount for inflation"
     )
     
-    real_target = target_amount * ((1 + inflation_rate/100) ** time_horizon)
+    real_target = inflation_adjusted_target(target_amount, inflation_rate, time_horizon)
     
     st.sidebar.markdown(f"""
     <div class="info-box">
@@ -578,17 +936,11 @@ def main():
     # Preset allocation options
     preset = st.sidebar.selectbox(
         "Choose Preset or Customize",
-        ["Custom", "Conservative", "Balanced", "Aggressive", "Ultra Aggressive"]
+        ["Custom"] + list(PRESET_ALLOCATIONS)
     )
     
-    if preset == "Conservative":
-        mf_allocation, stocks_allocation, fd_allocation, bonds_allocation, aif_allocation = 20, 10, 40, 25, 5
-    elif preset == "Balanced":
-        mf_allocation, stocks_allocation, fd_allocation, bonds_allocation, aif_allocation = 40, 25, 15, 15, 5
-    elif preset == "Aggressive":
-        mf_allocation, stocks_allocation, fd_allocation, bonds_allocation, aif_allocation = 50, 35, 5, 5, 5
-    elif preset == "Ultra Aggressive":
-        mf_allocation, stocks_allocation, fd_allocation, bonds_allocation, aif_allocation = 40, 40, 0, 5, 15
+    if preset in PRESET_ALLOCATIONS:
+        mf_allocation, stocks_allocation, fd_allocation, bonds_allocation, aif_allocation = PRESET_ALLOCATIONS[preset]
     else:  # Custom
         mf_allocation = st.sidebar.slider("Mutual Funds (%)", 0, 100, 40)
         show_educational_popup("mutual_funds")
@@ -642,6 +994,7 @@ def main():
         """, unsafe_allow_html=True)
     
     # Main calculations
+    checkpoint("Main calculations")
     st.header("Investment Analysis Results")
     
     col1, col2, col3 = st.columns(3)
@@ -655,19 +1008,45 @@ def main():
     
     results = {}
     time_to_goals = {}
+    ledgers = {}
+    
+    # Amortizing debt or SIP step-ups need the month-by-month ledger
+    use_ledger = uses_cashflow_ledger(debt_amount, debt_emi, debt_tenure, sip_step_up)
     
     for scenario in scenarios:
-        results[scenario] = calculate_investment_returns(
+        if use_ledger:
+            plan = cached_cashflow_plan(
+                initial_amount, time_horizon, monthly_investment, allocation, scenario, real_target,
+                debt_amount, debt_rate, debt_emi, debt_tenure, sip_step_up, redirect_emi
+            )
+            results[scenario] = plan['result']
+            time_to_goals[scenario] = plan['time_to_goal']
+            ledgers[scenario] = plan['ledger']
+            continue
+        
+        results[scenario] = cached_investment_returns(
             initial_amount, time_horizon, monthly_investment, allocation, scenario, debt_emi
         )
         
         # Calculate time to goal for each scenario
-        time_to_goals[scenario] = calculate_time_to_goal(
+        time_to_goals[scenario] = cached_time_to_goal(
             real_target, initial_amount, monthly_investment, 
             results[scenario]['portfolio_return'], debt_emi
         )
     
+    def plan_goal_seek(targets, years, goal_scenarios):
+        """What reaching targets takes, solved on the ledger when the results come from it"""
+        if use_ledger:
+            return cashflow_goal_seek(
+                targets, initial_amount, years, monthly_investment, allocation, debt_amount, debt_rate, debt_emi,
+                debt_tenure, sip_step_up, redirect_emi, scenarios=goal_scenarios
+            )
+        return goal_seek(
+            targets, initial_amount, years, monthly_investment, allocation, debt_emi, scenarios=goal_scenarios
+        )
+    
     # Display results
+    checkpoint("Results summary")
     for i, scenario in enumerate(scenarios):
         result = results[scenario]
         time_to_goal = time_to_goals[scenario]
@@ -720,6 +1099,7 @@ def main():
                     f"₹{result['effective_monthly_investment']:,.0f}/mo", "#f97316"), unsafe_allow_html=True)
     
     # Goal achievement analysis
+    checkpoint("Goal analysis")
     st.header("Goal Achievement Analysis")
     
     normal_result = results['normal']
@@ -739,21 +1119,22 @@ def main():
             """, unsafe_allow_html=True)
         else:
             shortfall = real_target - normal_result['future_value']
-            additional_monthly_needed = shortfall / (time_horizon * 12)
-            
-            # Fixed the calculation error in the original code
-            additional_years_needed = 0
-            try:
-                if normal_result['portfolio_return'] > 0:
-                    additional_years_needed = (np.log(real_target/normal_result['future_value']) / np.log(1 + normal_result['portfolio_return']))
-            except:
-                additional_years_needed = 0
+            # Solve exactly (with compounding and EMI deductions) for the fixes
+            requirements = plan_goal_seek(real_target, time_horizon, ['normal'])['normal']
+            additional_monthly_needed = max(0, float(requirements['monthly_investment']) - monthly_investment)
+            additional_lump_sum_needed = max(0, float(requirements['lump_sum']) - initial_amount)
+            required_years = float(requirements['years'])
+            timeline_advice = (
+                f"Or extend timeline by {required_years - time_horizon:.1f} years"
+                if not np.isnan(required_years) else "Extending the timeline alone won't reach the goal"
+            )
             
             st.markdown(f"""
             <div class="warning-message">
                 You're on the right track! To reach your goal:<br>
                 • Increase monthly SIP by ₹{additional_monthly_needed:,.0f}<br>
-                • Or extend timeline by {additional_years_needed:.1f} years<br>
+                • Or invest an extra ₹{additional_lump_sum_needed:,.0f} today<br>
+                • {timeline_advice}<br>
                 • Consider more aggressive allocation<br><br>
                 <strong>Shortfall: ₹{shortfall:,.0f}</strong>
             </div>
@@ -783,14 +1164,100 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
     
+    with st.expander("Goal Sensitivity: Required Monthly SIP", expanded=False):
+        sensitivity_scenario = st.radio("Scenario", scenario_names, horizontal=True, key="sensitivity_scenario")
+        target_multiples = np.array([0.5, 0.75, 1.0, 1.5, 2.0])
+        horizons = np.array(sorted({5, 10, 15, 20, 25, 30, time_horizon}))
+        # Targets are in today's money, inflated to each horizon
+        sensitivity_targets = inflation_adjusted_target(
+            target_amount * target_multiples[:, np.newaxis], inflation_rate, horizons[np.newaxis, :]
+        )
+        sensitivity_key = scenarios[scenario_names.index(sensitivity_scenario)]
+        required_sip = plan_goal_seek(
+            sensitivity_targets, horizons[np.newaxis, :], [sensitivity_key]
+        )[sensitivity_key]['monthly_investment']
+        st.dataframe(pd.DataFrame(
+            required_sip.round(),
+            index=[f"₹{target_amount * m:,.0f}" for m in target_multiples],
+            columns=[f"{h} years" for h in horizons]
+        ).style.format("₹{:,.0f}"))
+        st.caption("Monthly SIP needed (including EMI deductions) for each target in today's money"
+                   + (", before the annual step-up." if sip_step_up > 0 else "."))
+    
+    with st.expander("Sensitivity Sweep: Return × Inflation × Horizon", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            sweep_view = st.selectbox(
+                "Heatmap axes", ["Return vs Horizon", "Inflation vs Horizon", "Return vs Inflation"], key="sweep_view"
+            )
+        with col2:
+            sweep_metric = st.radio("Show", ["Future Value", "Goal Shortfall"], horizontal=True, key="sweep_metric")
+        with col3:
+            return_points = st.select_slider(
+                "Return grid points", options=[25, 50, 100, 250, 500, 1000], value=100, key="sweep_points"
+            )
+        
+        # Returns span the bear-to-bull range of this allocation, widened a little
+        scenario_returns = [results[scenario]['portfolio_return'] * 100 for scenario in scenarios]
+        sweep_returns = np.linspace(max(0.5, min(scenario_returns) - 3), max(scenario_returns) + 3, return_points)
+        sweep_inflation = np.round(np.arange(3.0, 8.05, 0.1), 1)
+        sweep_horizons = np.arange(1, 31)
+        sweep = sensitivity_sweep(
+            target_amount, initial_amount, monthly_investment, sweep_returns / 100, sweep_inflation, sweep_horizons,
+            debt_emi
+        )
+        values = sweep['future_value' if sweep_metric == "Future Value" else 'shortfall']
+        
+        # The axis not shown is held at the current plan
+        current_return = results['normal']['portfolio_return'] * 100
+        return_idx = np.abs(sweep_returns - current_return).argmin()
+        inflation_idx = np.abs(sweep_inflation - inflation_rate).argmin()
+        horizon_idx = time_horizon - 1
+        if sweep_view == "Return vs Horizon":
+            z, x, y = values[:, inflation_idx, :], sweep_horizons, sweep_returns
+            x_title, y_title, current = "Horizon (Years)", "Portfolio Return (%)", (time_horizon, current_return)
+            held = f"{inflation_rate:.1f}% inflation"
+        elif sweep_view == "Inflation vs Horizon":
+            z, x, y = values[return_idx, :, :], sweep_horizons, sweep_inflation
+            x_title, y_title, current = "Horizon (Years)", "Inflation (%)", (time_horizon, inflation_rate)
+            held = f"{sweep_returns[return_idx]:.2f}% return"
+        else:
+            z, x, y = values[:, :, horizon_idx], sweep_inflation, sweep_returns
+            x_title, y_title, current = "Inflation (%)", "Portfolio Return (%)", (inflation_rate, current_return)
+            held = f"{time_horizon} years"
+        
+        fig = go.Figure(go.Heatmap(
+            z=z, x=x, y=y, colorscale="Viridis" if sweep_metric == "Future Value" else "Reds",
+            colorbar=dict(title="₹"),
+            hovertemplate=f"{x_title}: %{{x}}<br>{y_title}: %{{y:.2f}}<br>{sweep_metric}: ₹%{{z:,.0f}}<extra></extra>"
+        ))
+        fig.add_trace(go.Scatter(
+            x=[current[0]], y=[current[1]], mode="markers", name="Your plan",
+            marker=dict(symbol="x", size=12, color="white", line=dict(width=1, color="black"))
+        ))
+        fig.update_layout(
+            title=f"{sweep_metric} at {held}", xaxis_title=x_title, yaxis_title=y_title,
+            height=450, margin=dict(t=50, b=40), showlegend=False
+        )
+        st.plotly_chart(fig)
+        st.caption(
+            f"{values.size:,} combinations evaluated in one pass. Shortfall is measured against "
+            f"₹{target_amount:,.0f} in today's money, inflated to each horizon."
+            + (" Contributions are held constant (no SIP step-up or debt payoff)." if use_ledger else "")
+        )
+    
     # Debt Impact Analysis (if applicable)
+    checkpoint("Debt impact")
     if debt_emi > 0:
         st.header("Debt Impact Analysis")
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            total_debt_interest = (debt_emi * debt_tenure * 12) - debt_amount if debt_tenure > 0 else 0
+            if use_ledger:
+                total_debt_interest = normal_result['total_interest_paid']
+            else:
+                total_debt_interest = (debt_emi * debt_tenure * 12) - debt_amount if debt_tenure > 0 else 0
             st.markdown(f"""
             <div class="debt-card">
                 <h4>Debt Summary</h4>
@@ -802,10 +1269,17 @@ def main():
             """, unsafe_allow_html=True)
         
         with col2:
-            # Calculate scenario without debt
-            no_debt_result = calculate_investment_returns(
-                initial_amount, time_horizon, monthly_investment + debt_emi, allocation, 'normal', 0
-            )
+            # Calculate scenario without debt, on the ledger with the same step-ups
+            # when the debt-side figures come from it
+            if use_ledger:
+                no_debt_result = cached_cashflow_plan(
+                    initial_amount, time_horizon, monthly_investment + debt_emi, allocation, 'normal',
+                    sip_step_up=sip_step_up
+                )['result']
+            else:
+                no_debt_result = cached_investment_returns(
+                    initial_amount, time_horizon, monthly_investment + debt_emi, allocation, 'normal', 0
+                )
             
             opportunity_cost = no_debt_result['future_value'] - normal_result['future_value']
             st.markdown(f"""
@@ -834,27 +1308,32 @@ def main():
             </div>
             """, unsafe_allow_html=True)
     
+        if use_ledger:
+            payoff_month = normal_result['debt_payoff_month']
+            if payoff_month is not None:
+                st.info(f"Debt is fully repaid in month {payoff_month} ({payoff_month / 12:.1f} years)"
+                        + (", after which the EMI is invested." if redirect_emi else "."))
+            elif debt_amount > 0:
+                st.warning("Debt is not fully repaid within your investment horizon.")
+            
+            with st.expander("Monthly Cashflow Ledger (Normal Market)"):
+                ledger = ledgers['normal']
+                st.line_chart(ledger[['Debt Balance', 'Portfolio Value']])
+                st.dataframe(ledger.style.format('₹{:,.0f}', subset=ledger.columns.drop('Year')))
+    
     # Charts Section
+    checkpoint("Projection charts")
     st.header("Investment Projections & Analytics")
     
     # Create projection data
-    years_range = list(range(1, min(time_horizon + 1, 21)))
-    projection_data = {
-        'Year': years_range,
-        'Normal Market': [],
-        'Bull Market': [],
-        'Bear Market': []
-    }
-    
-    for year in years_range:
-        for i, scenario in enumerate(scenarios):
-            temp_result = calculate_investment_returns(
-                initial_amount, year, monthly_investment, allocation, scenario, debt_emi
-            )
-            projection_data[scenario_names[i]].append(temp_result['future_value'])
-    
-    df_projection = pd.DataFrame(projection_data)
-    df_projection.set_index('Year', inplace=True)
+    monthly_detail = st.checkbox("Show month-by-month projection", value=False)
+    if use_ledger:
+        df_projection = ledger_projection_table(ledgers, scenario_names, monthly=monthly_detail)
+    else:
+        df_projection = cached_projection_table(
+            initial_amount, time_horizon, monthly_investment, allocation, debt_emi,
+            scenarios, scenario_names, monthly=monthly_detail
+        )
     
     col1, col2 = st.columns(2)
     
@@ -896,65 +1375,203 @@ def main():
         }, index=['Normal', 'Bull', 'Bear'])
         st.bar_chart(sharpe_data)
     
-    # Learning Section
-    st.header("Investment Education Hub")
+    # Monte Carlo Simulation
+    checkpoint("Monte Carlo")
+    st.header("Monte Carlo Simulation")
     
-    col1, col2, col3 = st.columns(3)
+    # Simulations run on worker threads; with progressive rendering their
+    # panels fill in after the rest of the page is drawn
+    progressive = st.sidebar.toggle(
+        "Progressive rendering", value=True,
+        help="Show the page straight away and fill in simulations as they finish"
+    )
+    deferred_panels = [] if progressive else None
     
-    with col1:
-        if st.button("Risk Management", type="secondary"):
-            st.markdown(f"""
-            <div class="educational-card">
-                <h4>Risk Management in Different Markets</h4>
-                <strong>Your Portfolio Risk Analysis:</strong><br>
-                • Normal Market: {results['normal']['portfolio_risk']*100:.1f}%<br>
-                • Bull Market: {results['bullish']['portfolio_risk']*100:.1f}%<br>
-                • Bear Market: {results['bearish']['portfolio_risk']*100:.1f}%<br><br>
-                
-                <strong>Risk varies because:</strong><br>
-                • Market sentiment affects volatility<br>
-                • Bull markets reduce perceived risk<br>
-                • Bear markets amplify uncertainty<br>
-                • Asset correlations change with conditions
-            </div>
-            """, unsafe_allow_html=True)
+    def render_simulation(simulation):
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            st.subheader("Outcome Range (Percentiles)")
+            st.line_chart(simulation['percentiles'])
+        with col2:
+            probability = simulation['goal_probability']
+            color = "#22c55e" if probability >= 0.75 else "#f59e0b" if probability >= 0.5 else "#ef4444"
+            st.markdown(create_metric_card("Probability of Reaching Goal",
+                f"{probability*100:.1f}%", color), unsafe_allow_html=True)
+            st.markdown(create_metric_card("Median Outcome",
+                f"₹{simulation['percentiles']['P50'].iloc[-1]:,.0f}", "#22c55e"), unsafe_allow_html=True)
+            st.markdown(create_metric_card("Pessimistic Outcome (5th pct)",
+                f"₹{simulation['percentiles']['P5'].iloc[-1]:,.0f}", "#ef4444"), unsafe_allow_html=True)
+        
+        if 'regime_occupancy' in simulation:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.subheader("Time to Goal Distribution")
+                goal_years = simulation['goal_years'][~np.isnan(simulation['goal_years'])]
+                if len(goal_years):
+                    counts = np.bincount(np.ceil(goal_years).astype(int))
+                    st.bar_chart(pd.Series(counts / len(simulation['goal_years']) * 100,
+                                           name="Share of Paths (%)").rename_axis("Year Goal Reached"))
+                    ttg = simulation['time_to_goal']
+                    st.caption(f"Median {ttg['P50']:.1f} years; 90% of paths that reach the goal do so "
+                               f"within {np.nanpercentile(simulation['goal_years'], 90):.1f} years. "
+                               f"{len(goal_years) / len(simulation['goal_years']) * 100:.1f}% of paths reach it "
+                               f"within 50 years.")
+                else:
+                    st.warning("No simulated path reaches the goal within 50 years.")
+            with col2:
+                st.subheader("Regime Occupancy")
+                occupancy = simulation['regime_occupancy'] * 100
+                occupancy.columns = scenario_names
+                st.area_chart(occupancy)
+                st.caption("Share of months spent in each market: " + ", ".join(
+                    f"{name} {share * 100:.0f}%" for name, share in zip(scenario_names, simulation['time_in_regime'])
+                ))
+    
+    def render_partial_percentiles(partial):
+        st.line_chart(partial['percentiles'])
+    
+    run_simulation = st.checkbox(
+        "Simulate market uncertainty",
+        help="Simulate thousands of randomized market paths using each asset's scenario risk"
+    )
     
-    with col2:
-        if st.button("Sharpe Ratio Deep Dive", type="secondary"):
-            show_educational_popup("sharpe_ratio")
-            st.markdown(f"""
-            <div class="educational-card">
-                <h4>Your Sharpe Ratio Analysis</h4>
-                <strong>Time-Adjusted Sharpe Ratios:</strong><br>
-                • Normal: {results['normal']['time_adjusted_sharpe']:.2f}<br>
-                • Bull: {results['bullish']['time_adjusted_sharpe']:.2f}<br>
-                • Bear: {results['bearish']['time_adjusted_sharpe']:.2f}<br><br>
-                
-                <strong>Investment Horizon: {time_horizon} years</strong><br>
-                Higher ratios indicate better risk-adjusted returns over your investment period.
-            </div>
-            """, unsafe_allow_html=True)
+    if run_simulation:
+        col1, col2 = st.columns(2)
+        with col1:
+            mc_scenario_name = st.selectbox("Market scenario", scenario_names + ["Regime Switching"])
+        with col2:
+            mc_paths = st.select_slider("Number of simulated paths", [10000, 20000, 50000, 100000], value=20000)
+        
+        # Keep the finished simulation for this session; stream partial
+        # percentiles from the worker processes only while computing
+        plan_inputs = (initial_amount, time_horizon, monthly_investment, tuple(allocation.items()), debt_emi,
+                       real_target, mc_paths)
+        if mc_scenario_name == "Regime Switching":
+            with st.expander("Monthly Regime Transition Probabilities (%)"):
+                transition_table = st.data_editor(
+                    pd.DataFrame(np.array(DEFAULT_TRANSITION_MATRIX) * 100, index=scenario_names,
+                                 columns=scenario_names),
+                    key="transition_matrix"
+                )
+                st.caption("Each row is the chance of moving from that market next month and must total 100%.")
+            transition = transition_table.to_numpy(dtype=float) / 100
+            heavy_panel(
+                'regime', plan_inputs + (transition.tobytes(),), simulate_regime_switching,
+                (initial_amount, time_horizon, monthly_investment, allocation, debt_emi, real_target, transition),
+                {'n_paths': mc_paths, 'seed': 42},
+                render_simulation, "Simulating regime-switching markets...", deferred_panels,
+                render_partial_percentiles
+            )
+        else:
+            mc_scenario = scenarios[scenario_names.index(mc_scenario_name)]
+            heavy_panel(
+                'mc', plan_inputs + (mc_scenario,), simulate_monte_carlo,
+                (initial_amount, time_horizon, monthly_investment, allocation, mc_scenario, debt_emi,
+                 real_target, mc_paths),
+                {'seed': 42, 'workers': os.cpu_count()},
+                render_simulation, "Simulating market paths...", deferred_panels, render_partial_percentiles
+            )
     
-    with col3:
-        if st.button("Debt vs Investment", type="secondary"):
-            debt_analysis = debt_rate - (normal_result['portfolio_return'] * 100) if has_debt else 0
-            st.markdown(f"""
-            <div class="educational-card">
-                <h4>Debt vs Investment Strategy</h4>
-                {"<strong>Your Situation:</strong><br>" if has_debt else ""}
-                {f"• Debt Interest: {debt_rate:.1f}%<br>" if has_debt else ""}
-                {f"• Portfolio Return: {normal_result['portfolio_return']*100:.1f}%<br>" if has_debt else ""}
-                {f"• Cost Difference: {debt_analysis:+.1f}%<br><br>" if has_debt else ""}
+    # Historical Backtest
+    checkpoint("Historical backtest")
+    st.header("Historical Backtest")
+    
+    run_backtest = st.checkbox(
+        "Backtest against historical returns",
+        help="Run your plan from every start month of a monthly return series"
+    )
+    
+    if run_backtest:
+        backtest_source = st.radio(
+            "Return series", ["Bundled sample (synthetic, 2000-2024)", "Upload CSV"], horizontal=True
+        )
+        return_series = None
+        if backtest_source == "Upload CSV":
+            uploaded = st.file_uploader(
+                "Monthly returns CSV", type="csv",
+                help="Columns: month (YYYY-MM), mutual_funds, stocks, fd, bonds, aif as decimals (0.012 = 1.2%)"
+            )
+            if uploaded is not None:
+                try:
+                    return_series = load_uploaded_series(uploaded.getvalue())
+                except ValueError as error:
+                    st.error(f"Could not read return series: {error}")
+        else:
+            return_series = load_return_series()
+        
+        if return_series is not None:
+            try:
+                backtest = shared_result(
+                    rolling_backtest, return_series, initial_amount, time_horizon, monthly_investment, allocation,
+                    debt_emi, real_target
+                )
+            except ValueError as error:
+                st.warning(str(error))
+                backtest = None
+        
+            if backtest is not None:
+                col1, col2 = st.columns([2, 1])
+                with col1:
+                    st.subheader(f"Outcome Range over {backtest['n_paths']} Start Months")
+                    st.line_chart(backtest['percentiles'])
+                with col2:
+                    probability = backtest['goal_probability']
+                    color = "#22c55e" if probability >= 0.75 else "#f59e0b" if probability >= 0.5 else "#ef4444"
+                    st.markdown(create_metric_card("Windows Reaching Goal",
+                        f"{probability*100:.1f}%", color), unsafe_allow_html=True)
+                    st.markdown(create_metric_card("Median Outcome",
+                        f"₹{backtest['percentiles']['P50'].iloc[-1]:,.0f}", "#22c55e"), unsafe_allow_html=True)
+                    st.markdown(create_metric_card("Worst Window",
+                        f"₹{backtest['worst_windows']['Final Value'].iloc[0]:,.0f}", "#ef4444"),
+                        unsafe_allow_html=True)
                 
-                <strong>General Strategy:</strong><br>
-                • High-interest debt (>15%): Pay off first<br>
-                • Medium debt (8-15%): Balance both<br>
-                • Low-interest debt (<8%): Invest more<br>
-                • Consider tax implications
-            </div>
-            """, unsafe_allow_html=True)
+                st.subheader("Worst Start Months")
+                st.dataframe(
+                    backtest['worst_windows'].style.format({'Final Value': '₹{:,.0f}', 'Annualized Return (%)': '{:.2f}'}),
+                    hide_index=True
+                )
+            
+            if st.checkbox("Simulate with block bootstrap",
+                           help="Build random market paths by resampling blocks of consecutive historical months"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    block_months = st.select_slider("Block length (months)", [1, 3, 6, 12, 24, 36], value=12)
+                with col2:
+                    bootstrap_paths = st.select_slider(
+                        "Number of bootstrap paths", [10000, 25000, 50000], value=25000
+                    )
+                
+                def render_bootstrap(bootstrap):
+                    col1, col2 = st.columns([2, 1])
+                    with col1:
+                        st.line_chart(bootstrap['percentiles'])
+                    with col2:
+                        probability = bootstrap['goal_probability']
+                        color = "#22c55e" if probability >= 0.75 else "#f59e0b" if probability >= 0.5 else "#ef4444"
+                        st.markdown(create_metric_card("Probability of Reaching Goal",
+                            f"{probability*100:.1f}%", color), unsafe_allow_html=True)
+                        st.markdown(create_metric_card("Pessimistic Outcome (5th pct)",
+                            f"₹{bootstrap['percentiles']['P5'].iloc[-1]:,.0f}", "#ef4444"), unsafe_allow_html=True)
+                
+                heavy_panel(
+                    'bootstrap',
+                    (return_series.key, initial_amount, time_horizon, monthly_investment, tuple(allocation.items()),
+                     debt_emi, real_target, block_months, bootstrap_paths),
+                    simulate_bootstrap,
+                    (return_series, initial_amount, time_horizon, monthly_investment, allocation, debt_emi,
+                     real_target, bootstrap_paths, block_months),
+                    {'seed': 42, 'workers': os.cpu_count()},
+                    render_bootstrap, "Resampling historical paths...", deferred_panels, render_partial_percentiles
+                )
+    
+    # Learning Section
+    checkpoint("Learning")
+    st.header("Investment Education Hub")
+    
+    show_education_hub(results, time_horizon, has_debt, debt_rate)
     
     # Optimization Suggestions
+    checkpoint("Optimization suggestions")
     st.header("Portfolio Optimization Suggestions")
     
     col1, col2 = st.columns(2)
@@ -963,22 +1580,7 @@ def main():
         st.subheader("Allocation Recommendations")
         
         # Age-based allocation suggestion
-        user_age = st.number_input("Enter your age for personalized advice", min_value=18, max_value=80, value=35)
-        equity_percent = min(100 - user_age, 80)
-        debt_percent = 100 - equity_percent
-        
-        st.markdown(f"""
-        <div class="info-box">
-            <h4>Age-Based Allocation (Rule of Thumb)</h4>
-            <strong>Age {user_age} Suggestion:</strong><br>
-            • Equity (MF + Stocks + AIF): {equity_percent}%<br>
-            • Debt (FD + Bonds): {debt_percent}%<br><br>
-            
-            <strong>Your Current Allocation:</strong><br>
-            • Equity: {(mf_allocation + stocks_allocation + aif_allocation)}%<br>
-            • Debt: {(fd_allocation + bonds_allocation)}%
-        </div>
-        """, unsafe_allow_html=True)
+        show_age_allocation(mf_allocation + stocks_allocation + aif_allocation, fd_allocation + bonds_allocation)
     
     with col2:
         st.subheader("Timeline Optimization")
@@ -1009,86 +1611,78 @@ def main():
             </div>
             """, unsafe_allow_html=True)
     
+    # Allocation search over the five asset classes
+    checkpoint("Allocation search")
+    st.subheader("Allocation Search")
+    
+    max_risk_pct = st.slider(
+        "Maximum acceptable portfolio risk (%)",
+        min_value=2.0,
+        max_value=30.0,
+        value=float(min(max(round(normal_result['portfolio_risk'] * 200) / 2, 2.0), 30.0)),
+        step=0.5,
+        help="Only allocations at or below this normal-market risk are considered"
+    )
+    optimization = cached_optimize_allocation(
+        real_target, initial_amount, time_horizon, monthly_investment, debt_emi, 'normal', max_risk_pct / 100
+    )
+    best = optimization['candidates'].iloc[optimization['best_index']]
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("**Efficient Frontier (Normal Market)**")
+        frontier = optimization['frontier']
+        st.scatter_chart(pd.DataFrame({
+            'Risk (%)': frontier['portfolio_risk'] * 100,
+            'Expected Return (%)': frontier['portfolio_return'] * 100
+        }), x='Risk (%)', y='Expected Return (%)')
+    
+    with col2:
+        st.markdown("**Suggested vs Current Allocation**")
+        st.dataframe(pd.DataFrame({
+            'Current (%)': [mf_allocation, stocks_allocation, fd_allocation, bonds_allocation, aif_allocation],
+            'Suggested (%)': [round(optimization['best_allocation'][asset] * 100) for asset in allocation]
+        }, index=['Mutual Funds', 'Stocks', 'Fixed Deposits', 'Bonds', 'AIF']))
+        
+        if optimization['goal_reachable']:
+            st.markdown(f"""
+            <div class="success-message">
+                Fastest allocation within {max_risk_pct:.1f}% risk<br>
+                Goal in {best['time_to_goal']:.1f} years at {best['portfolio_return']*100:.1f}% return
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            st.markdown(f"""
+            <div class="warning-message">
+                No allocation within {max_risk_pct:.1f}% risk reaches the goal<br>
+                Highest projected value: ₹{best['future_value']:,.0f}
+            </div>
+            """, unsafe_allow_html=True)
+    if use_ledger:
+        st.caption(
+            "Allocations are ranked with the closed-form engine: goal times here assume a flat EMI for the "
+            "whole horizon, with no SIP step-up or debt payoff."
+        )
+    
     # Export Results
+    checkpoint("Export")
     st.header("Investment Report Generator")
     
-    if st.button("Generate Comprehensive Report", type="primary"):
-        report_data = {
-            'Investment Profile': {
-                'Strategy': investment_type,
-                'Initial Amount': f"₹{initial_amount:,}" if initial_amount > 0 else "₹0",
-                'Monthly SIP': f"₹{monthly_investment:,}" if monthly_investment > 0 else "₹0",
-                'Time Horizon': f"{time_horizon} years",
-                'Target Amount': f"₹{target_amount:,}",
-                'Inflation Adjusted Target': f"₹{real_target:,.0f}",
-                'Primary Goal': goal_type
-            },
-            'Debt Profile': {
-                'Has Debt': has_debt,
-                'Debt Amount': f"₹{debt_amount:,}" if has_debt else "None",
-                'Interest Rate': f"{debt_rate}%" if has_debt else "N/A",
-                'Monthly EMI': f"₹{debt_emi:,.0f}" if has_debt else "None",
-                'Effective Investment': f"₹{normal_result['effective_monthly_investment']:,.0f}/mo"
-            },
-            'Asset Allocation': {
-                'Mutual Funds': f"{mf_allocation}%",
-                'Stocks': f"{stocks_allocation}%",
-                'Fixed Deposits': f"{fd_allocation}%",
-                'Bonds': f"{bonds_allocation}%",
-                'AIF': f"{aif_allocation}%"
-            },
-            'Scenario Analysis': {
-                scenario: {
-                    'Future Value': f"₹{results[scenario]['future_value']:,.0f}",
-                    'Total Investment': f"₹{results[scenario]['total_investment']:,.0f}",
-                    'Total Gains': f"₹{results[scenario]['gains']:,.0f}",
-                    'Portfolio Return': f"{results[scenario]['portfolio_return']*100:.1f}%",
-                    'Portfolio Risk': f"{results[scenario]['portfolio_risk']*100:.1f}%",
-                    'Time-Adj Sharpe': f"{results[scenario]['time_adjusted_sharpe']:.2f}",
-                    'Time to Goal': f"{time_to_goals[scenario]:.1f} years" if time_to_goals[scenario] and time_to_goals[scenario] < 100 else "Not achievable"
-                } for scenario in scenarios
-            },
-            'Recommendations': {
-                'Goal Achievable': normal_result['future_value'] >= real_target,
-                'Best Scenario': min([(s, time_to_goals[s]) for s in scenarios if time_to_goals[s] and time_to_goals[s] < 100], key=lambda x: x[1], default=(None, None))[0],
-                'Risk Level': "Low" if normal_result['portfolio_risk'] < 0.1 else "Medium" if normal_result['portfolio_risk'] < 0.2 else "High",
-                'Debt Recommendation': "Pay off debt first" if (has_debt and debt_rate/100 > normal_result['portfolio_return']) else "Continue balanced approach"
-            }
-        }
-        
-        st.json(report_data)
-        
-        # Success message
-        st.markdown("""
-        <div class="success-message">
-            Report Generated Successfully!<br>
-            Copy the JSON data above to save your investment analysis
-        </div>
-        """, unsafe_allow_html=True)
+    show_report_generator(
+        investment_type, initial_amount, monthly_investment, time_horizon, target_amount, real_target,
+        goal_type, (mf_allocation, stocks_allocation, fd_allocation, bonds_allocation, aif_allocation),
+        results, time_to_goals, has_debt, debt_amount, debt_rate, debt_emi
+    )
     
     # Interactive Tips
+    checkpoint("Tips")
     st.header("Investment Tips")
     
-    tip_category = st.selectbox("Choose tip category:", [
-        "Risk Management", "Tax Planning", "Market Timing", "Rebalancing", "Emergency Planning"
-    ])
-    
-    tips = {
-        "Risk Management": f"Diversify across asset classes and review your risk tolerance annually. Your current portfolio risk varies from {results['bullish']['portfolio_risk']*100:.1f}% to {results['bearish']['portfolio_risk']*100:.1f}% across market scenarios.",
-        "Tax Planning": "Consider ELSS funds for tax saving under 80C. Debt funds held >3 years get indexation benefits.",
-        "Market Timing": "Time in the market beats timing the market. Your SIP approach helps average market volatility.",
-        "Rebalancing": "Rebalance your portfolio annually or when allocation deviates by >5% from target.",
-        "Emergency Planning": "Maintain 6-12 months of expenses in liquid funds before investing in growth assets."
-    }
-    
-    st.markdown(f"""
-    <div class="info-box">
-        <h4>{tip_category}</h4>
-        {tips[tip_category]}
-    </div>
-    """, unsafe_allow_html=True)
+    show_investment_tips(results)
     
     # Footer
+    checkpoint("Footer")
     st.markdown("---")
     st.markdown("""
     <div style="text-align: center; color: #6b7280; font-size: 0.9rem; padding: 2rem;">
@@ -1103,6 +1697,14 @@ def main():
         </div>
     </div>
     """, unsafe_allow_html=True)
+    
+    checkpoint("Deferred panels")
+    for fill in deferred_panels or []:
+        fill()
 
 if __name__ == "__main__":
-    main()
+    debug = st.query_params.get("debug") == "1"
+    with profiling(debug and st.session_state.get('profile_sections', False),
+                   cprofile=debug and st.session_state.get('profile_cprofile', False)) as profiler:
+        main()
+    show_debug_panel(profiler)
@@ -0,0 +1,248 @@
+"""Async HTTP JSON API over the planner core.
+
+A plain ASGI application, so any ASGI server can host it without a web
+framework; running the module serves it with uvicorn:
+
+    python api.py [--host 127.0.0.1] [--port 8000] [--workers 4]
+
+Every endpoint takes ``POST {"plans": [plan, ...]}`` and answers
+``{"results": [...]}`` in the same order. Plans use the batch planner's
+fields, plus the app's optional step-up and report fields. Every plan is
+checked and coerced once by report.parse_plan, and each endpoint evaluates
+those parsed inputs; a plan it rejects fails the request with a 400 naming
+the plan and the problem:
+
+    time_horizon, target_amount, mutual_funds, stocks, fd, bonds, aif (percent)
+    optional: initial_amount, monthly_investment, inflation_rate (default 4.8),
+              debt_emi, or debt_amount + debt_rate + debt_tenure to derive it,
+              sip_step_up, redirect_emi, investment_type, goal_type, reference
+
+    POST /v1/scenarios     scenario metrics and time to goal per plan
+    POST /v1/time-to-goal  inflation-adjusted target and time to goal per scenario
+    POST /v1/projection    value per scenario by year ("monthly": true for months)
+    POST /v1/report        the comprehensive report with raw numbers (report.PlanReport.to_dict);
+                           "format": "display" for the app's formatted strings instead
+    GET  /health
+
+Request bodies are decoded, evaluated and encoded in a process pool, so
+the event loop only moves bytes and never blocks on a large batch.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batch_planner import OPTIONAL_DEFAULTS, evaluate_plans
+from cashflow import uses_cashflow_ledger
+from investment_core import ASSET_KEYS, SCENARIO_KEYS
+from report import PlanReport, evaluate_inputs, inputs_report, parse_plan, projection_series, reports_to_json
+
+API_WORKERS_ENV = 'PLANNER_API_WORKERS'
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class RequestError(ValueError):
+    """A request the API rejects with the given HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def scenario_frame(plans, parsed):
+    """Batch planner results for the plans, evaluated on their parse_plan inputs"""
+    # Other plan fields pass through as in the batch planner
+    frame = pd.DataFrame(plans)
+    for field in ['time_horizon', 'target_amount'] + list(OPTIONAL_DEFAULTS):
+        frame[field] = [inputs[field] for inputs in parsed]
+    for index, asset in enumerate(ASSET_KEYS):
+        frame[asset] = [inputs['allocation_percent'][index] for inputs in parsed]
+    return evaluate_plans(frame)
+
+
+def scenarios_endpoint(request):
+    plans = _plans(request)
+    return scenario_frame(plans, _parse_plans(plans))
+
+
+def time_to_goal_endpoint(request):
+    plans = _plans(request)
+    output = scenario_frame(plans, _parse_plans(plans))
+    return output[['real_target'] + [f"time_to_goal_{scenario}" for scenario in SCENARIO_KEYS]]
+
+
+def projection_endpoint(request):
+    monthly = bool(request.get('monthly', False))
+    projections = []
+    for inputs in _parse_plans(_plans(request)):
+        ledgers = None
+        if uses_cashflow_ledger(inputs['debt_amount'], inputs['debt_emi'], inputs['debt_tenure'],
+                                inputs['sip_step_up']):
+            _, _, ledgers = evaluate_inputs(inputs)
+        table = projection_series(
+            inputs['initial_amount'], inputs['time_horizon'], inputs['monthly_investment'], inputs['allocation'],
+            inputs['debt_emi'], ledgers, monthly=monthly
+        )
+        projections.append({'year': table.index.tolist(), **{column: table[column].tolist() for column in table}})
+    return projections
+
+
+def report_endpoint(request):
+    reports = [inputs_report(inputs) for inputs in _parse_plans(_plans(request))]
+    if request.get('format', 'raw') == 'display':
+        return [report.to_display() for report in reports]
+    return reports
+
+
+ENDPOINTS = {
+    '/v1/scenarios': scenarios_endpoint,
+    '/v1/time-to-goal': time_to_goal_endpoint,
+    '/v1/projection': projection_endpoint,
+    '/v1/report': report_endpoint,
+}
+
+
+def _plans(request):
+    plans = request.get('plans') if isinstance(request, dict) else None
+    if not isinstance(plans, list) or not plans:
+        raise RequestError('Body must be a JSON object with a non-empty "plans" array')
+    return plans
+
+
+def _parse_plans(plans):
+    parsed = []
+    for index, plan in enumerate(plans):
+        try:
+            parsed.append(parse_plan(plan))
+        except ValueError as error:
+            raise RequestError(f"Plan {index}: {error}") from None
+    return parsed
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def handle_request(path, body):
+    """(status, JSON bytes) for a POST body; runs in the worker pool"""
+    try:
+        request = json.loads(body)
+        result = ENDPOINTS[path](request)
+    except RequestError as error:
+        return error.status, json.dumps({'error': str(error)}).encode()
+    except (ValueError, TypeError, KeyError) as error:
+        return 400, json.dumps({'error': f"Invalid request: {error}"}).encode()
+    if isinstance(result, pd.DataFrame):
+        # to_json writes NaN (e.g. an unreachable goal) as null
+        return 200, b'{"results":' + result.to_json(orient='records', double_precision=15).encode() + b'}'
+    if isinstance(result, list) and result and isinstance(result[0], PlanReport):
+        return 200, b'{"results":' + reports_to_json(result) + b'}'
+    return 200, json.dumps({'results': result}, ensure_ascii=False, default=_json_default).encode()
+
+
+def _warm_up():
+    return os.getpid()
+
+
+class PlannerAPI:
+    """ASGI application; ``workers`` = 0 evaluates on the default thread pool instead of processes"""
+
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = int(os.environ.get(API_WORKERS_ENV, os.cpu_count() or 1))
+        self.workers = workers
+        self._pool = None
+
+    def start(self):
+        if self._pool is None and self.workers > 0:
+            # spawn rather than fork: the server process runs threads
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            for _ in range(self.workers):
+                self._pool.submit(_warm_up)
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            status, body = await self._respond(scope, receive)
+            await send({
+                'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+            })
+            await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _respond(self, scope, receive):
+        path, method = scope['path'].rstrip('/') or '/', scope['method']
+        if path == '/health':
+            return 200, json.dumps({'status': 'ok', 'workers': self.workers}).encode()
+        if path not in ENDPOINTS:
+            return 404, b'{"error": "Not found"}'
+        if method != 'POST':
+            return 405, b'{"error": "Use POST"}'
+        try:
+            body = await self._read_body(receive)
+        except RequestError as error:
+            return error.status, json.dumps({'error': str(error)}).encode()
+        self.start()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, handle_request, path, body)
+
+    async def _read_body(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise RequestError("Client disconnected", 499)
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise RequestError(f"Body exceeds {MAX_BODY_BYTES // (1024 * 1024)} MB", 413)
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+
+app = PlannerAPI()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the planner JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Worker processes for evaluation (default: ${API_WORKERS_ENV} or the CPU count)")
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        print("Serving the API needs uvicorn: pip install uvicorn", file=sys.stderr)
+        return 1
+    uvicorn.run(PlannerAPI(args.workers), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Historical backtests and bootstrap simulation over monthly return series.
+
+Return series are CSV files with a ``month`` column (YYYY-MM) and one
+column of monthly returns per asset class in ASSET_KEYS, as decimals
+(0.012 is 1.2%). The first load of a file converts it to a column-major
+.npy cache; later loads memory-map that cache instead of reparsing the CSV.
+
+The bundled data/sample_monthly_returns.csv is a synthetic 25-year series
+generated from the scenario model with normal, bull and bear stretches. It
+is meant for demonstration and is not actual market history.
+"""
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+import monte_carlo
+from investment_core import ASSET_KEYS, allocation_to_vector, gather_simulation_chunks, summarize_simulation
+from profiling import profiled
+
+SAMPLE_RETURNS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sample_monthly_returns.csv')
+CACHE_DIR_ENV = 'PLANNER_CACHE_DIR'
+CACHE_FORMAT_VERSION = 1
+# Bootstrap chunks hold a few (paths x months) arrays at once
+BOOTSTRAP_CHUNK_SIZE = 10000
+
+
+class ReturnSeries:
+    """Monthly returns per asset class over consecutive months.
+
+    ``months`` is a datetime64[M] array and ``returns`` an (assets x months)
+    array in ASSET_KEYS order, memory-mapped when loaded from the cache.
+    ``key`` identifies the source file or upload when loaded through it.
+    """
+
+    def __init__(self, months, returns, key=None):
+        self.months = months
+        self.returns = returns
+        self.key = key
+
+    def __len__(self):
+        return len(self.months)
+
+    def portfolio_returns(self, allocation):
+        """Monthly returns of ``allocation`` rebalanced every month"""
+        return allocation_to_vector(allocation) @ self.returns
+
+
+def cache_dir():
+    """Directory for converted return series (PLANNER_CACHE_DIR overrides)"""
+    return os.environ.get(CACHE_DIR_ENV) or os.path.join(
+        os.path.expanduser('~'), '.cache', 'strategic_investment_teacher'
+    )
+
+
+def parse_return_csv(source):
+    """ReturnSeries from a CSV path or file-like object"""
+    frame = pd.read_csv(source)
+    missing = [column for column in ['month'] + ASSET_KEYS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    months = pd.to_datetime(frame['month'].astype(str)).to_numpy().astype('datetime64[M]')
+    order = np.argsort(months, kind='stable')
+    months = months[order]
+    if np.any(np.diff(months).astype(int) != 1):
+        raise ValueError("Return series must have exactly one row per consecutive month")
+    returns = frame[ASSET_KEYS].to_numpy(dtype=float)[order].T
+    if np.isnan(returns).any():
+        raise ValueError("Return series has missing values")
+    return ReturnSeries(months, np.ascontiguousarray(returns))
+
+
+def _load_cached(key, parse):
+    stem = os.path.join(cache_dir(), f"returns-v{CACHE_FORMAT_VERSION}-{key}")
+    months_path, returns_path = f"{stem}.months.npy", f"{stem}.returns.npy"
+    try:
+        return ReturnSeries(np.load(months_path), np.load(returns_path, mmap_mode='r'), key)
+    except (OSError, ValueError):
+        pass
+
+    series = parse()
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file
+        for path, array in ((months_path, series.months), (returns_path, series.returns)):
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as handle:
+                np.save(handle, array)
+            os.replace(temp_path, path)
+    except OSError:
+        # Read-only cache location: work from the parsed copy
+        series.key = key
+        return series
+    return ReturnSeries(series.months, np.load(returns_path, mmap_mode='r'), key)
+
+
+def load_return_series(path=SAMPLE_RETURNS_FILE):
+    """ReturnSeries for a CSV file, cached by path, size and modification time"""
+    stat = os.stat(path)
+    fingerprint = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return _load_cached(hashlib.sha1(fingerprint.encode()).hexdigest()[:16], lambda: parse_return_csv(path))
+
+
+def load_uploaded_series(data):
+    """ReturnSeries for CSV bytes (e.g. an upload), cached by content hash"""
+    return _load_cached(hashlib.sha1(data).hexdigest()[:16], lambda: parse_return_csv(io.BytesIO(data)))
+
+
+@profiled
+def rolling_backtest(series, amount, years, monthly_investment, allocation, debt_emi=0, target_amount=None,
+                     worst=5):
+    """Run the plan from every start month of the series in one pass.
+
+    As in calculate_investment_returns the SIP net of the EMI is invested
+    at the end of each month; the portfolio is rebalanced monthly. Returns
+    summarize_simulation's percentile fan and goal probability over all
+    windows, plus ``windows`` (one row per start month) and
+    ``worst_windows`` (the ``worst`` lowest final values).
+    """
+    months = int(years) * 12
+    if months > len(series):
+        raise ValueError(
+            f"A {years}-year horizon needs {months} months of returns; the series has {len(series)}"
+        )
+    # growth[t]: value at month t of 1 invested at month 0. With
+    # discounted[t] = sum(1 / growth[1..t]), a SIP started at s is worth
+    # growth[t] * (discounted[t] - discounted[s]) at t, so every window
+    # comes from two prefix arrays.
+    growth = np.r_[1.0, np.cumprod(1 + series.portfolio_returns(allocation))]
+    discounted = np.r_[0.0, np.cumsum(1 / growth[1:])]
+    starts = np.arange(len(series) - months + 1)
+    year_ends = starts[:, np.newaxis] + np.arange(12, months + 1, 12)
+    effective_monthly = max(0, monthly_investment - debt_emi)
+    values = growth[year_ends] * (
+        amount / growth[starts, np.newaxis]
+        + effective_monthly * (discounted[year_ends] - discounted[starts, np.newaxis])
+    )
+
+    summary = summarize_simulation(values, target_amount)
+    windows = pd.DataFrame({
+        'Start': series.months[starts].astype(str),
+        'End': series.months[starts + months - 1].astype(str),
+        'Final Value': values[:, -1],
+        'Annualized Return (%)': ((growth[starts + months] / growth[starts]) ** (1 / int(years)) - 1) * 100,
+    })
+    if target_amount is not None:
+        windows['Goal Reached'] = windows['Final Value'] >= target_amount
+    summary['windows'] = windows
+    summary['worst_windows'] = windows.nsmallest(worst, 'Final Value')
+    summary['total_investment'] = amount + monthly_investment * months
+    return summary
+
+
+@profiled
+def simulate_bootstrap(series, amount, years, monthly_investment, allocation, debt_emi=0, target_amount=None,
+                       n_paths=50000, block_months=12, seed=None, chunk_size=BOOTSTRAP_CHUNK_SIZE, workers=1,
+                       on_progress=None):
+    """Monte Carlo paths resampled from the series in blocks of whole months.
+
+    Every path is a circular block bootstrap of the historical months:
+    drawing all asset classes of a month together keeps their correlation,
+    and blocks of ``block_months`` keep autocorrelation within a block.
+    ``seed``, ``workers`` and ``on_progress`` behave as in
+    simulate_monte_carlo. Returns the dict from summarize_simulation.
+    """
+    if block_months < 1 or block_months > len(series):
+        raise ValueError(f"Block length must be between 1 and {len(series)} months")
+    monthly_returns = np.ascontiguousarray(series.portfolio_returns(allocation))
+    contribution = max(0, monthly_investment - debt_emi)
+    chunks = gather_simulation_chunks(
+        monte_carlo.iter_chunks(
+            monte_carlo.bootstrap_chunk, (int(years) * 12, amount, contribution, monthly_returns, block_months),
+            n_paths, seed, chunk_size, workers
+        ),
+        n_paths, chunk_size, target_amount, on_progress
+    )
+    summary = summarize_simulation(np.concatenate(chunks), target_amount)
+    if on_progress is not None:
+        on_progress(len(chunks), len(chunks), summary)
+    return summary
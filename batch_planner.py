@@ -0,0 +1,307 @@
+"""Command-line batch planner for bulk client plans.
+
+Streams a CSV or Parquet file of plans in chunks, runs the three-scenario
+analysis and time-to-goal for every row with the vectorized engines, and
+appends results to a CSV or Parquet output as each chunk finishes, so
+memory stays flat whatever the input size.
+
+    python batch_planner.py plans.csv results.parquet [--chunk-size 50000]
+
+Input columns (allocations in percent, as in the sidebar):
+    time_horizon, target_amount, mutual_funds, stocks, fd, bonds, aif
+Optional columns:
+    initial_amount, monthly_investment (default 0), inflation_rate (default 4.8),
+    debt_emi, or debt_amount + debt_rate + debt_tenure to derive the EMI,
+    sip_step_up (annual %, default 0), redirect_emi (default 1).
+Blank optional cells take their defaults. Rows with a blank or non-numeric
+required field, a non-numeric optional value, a horizon that is not a positive
+whole number of years or an allocation not totalling 100% get a ``status`` naming the problem and no
+results; valid rows have status "ok".
+Plans with an amortizing loan or a SIP step-up are evaluated on the monthly
+cashflow ledger, as in the app and the API; the rest use the vectorized
+closed form. Any other columns (e.g. a client id) are passed through unchanged;
+from CSV they are read as text, so a column's type does not change between
+chunks. If a run fails, the partial output file is removed.
+
+Extra scenarios can be evaluated alongside normal/bullish/bearish with
+--scenarios FILE.json (see ScenarioModel.with_scenarios_from_json).
+
+With --reports the output is instead the comprehensive report of every plan
+(report.PlanReport, standard scenarios) written to .parquet, .csv or .jsonl;
+plans may also set the API's optional fields, and a ``reference`` column is
+carried into each report.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from cashflow import evaluate_cashflow_plan_batch
+from investment_core import (
+    ALLOCATION_TOLERANCE,
+    ASSET_KEYS,
+    calculate_emi_batch,
+    calculate_investment_returns_batch,
+    calculate_time_to_goal_batch,
+    get_scenario_model,
+    inflation_adjusted_target,
+)
+
+REQUIRED_COLUMNS = ['time_horizon', 'target_amount'] + ASSET_KEYS
+OPTIONAL_DEFAULTS = {
+    'initial_amount': 0.0,
+    'monthly_investment': 0.0,
+    'inflation_rate': 4.8,
+    'debt_emi': 0.0,
+    'debt_amount': 0.0,
+    'debt_rate': 0.0,
+    'debt_tenure': 0.0,
+    'sip_step_up': 0.0,
+    'redirect_emi': 1.0,
+}
+PLAN_COLUMNS = REQUIRED_COLUMNS + list(OPTIONAL_DEFAULTS)
+SCENARIO_METRICS = ['future_value', 'gains', 'portfolio_return', 'portfolio_risk', 'time_adjusted_sharpe']
+
+
+def evaluate_plans(plans, model=None):
+    """Scenario analysis and time-to-goal for a DataFrame of plans"""
+    model = get_scenario_model() if model is None else model
+    missing = [column for column in REQUIRED_COLUMNS if column not in plans.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    # Blank optional cells take their defaults; any other value that is not
+    # a number, and a blank or non-numeric required field, fail the row
+    problems = {}
+    inputs = {}
+    for column, default in OPTIONAL_DEFAULTS.items():
+        if column not in plans.columns:
+            inputs[column] = np.full(len(plans), default)
+            continue
+        values, non_numeric = _numeric(plans[column])
+        problems[f"non-numeric {column}"] = non_numeric
+        inputs[column] = np.where(np.isnan(values), default, values)
+    required = {}
+    for column in REQUIRED_COLUMNS:
+        values, non_numeric = _numeric(plans[column])
+        problems[f"non-numeric {column}"] = non_numeric
+        problems[f"missing {column}"] = np.isnan(values) & ~non_numeric
+        required[column] = values
+    allocations = np.column_stack([required[asset] for asset in ASSET_KEYS]) / 100
+    problems['time_horizon must be a positive whole number of years'] = (
+        (required['time_horizon'] <= 0) | (required['time_horizon'] % 1 > 0)
+    )
+    problems['allocation must total 100%'] = np.abs(allocations.sum(axis=1) - 1) > ALLOCATION_TOLERANCE
+    status = _row_status(problems, len(plans))
+    valid = status == 'ok'
+    # Failed rows are computed on placeholder inputs and blanked below
+    years = np.where(valid, required['time_horizon'], 1).astype(np.int64)
+    allocations = np.where(valid[:, np.newaxis], allocations, 0.2)
+
+    derived_emi = calculate_emi_batch(inputs['debt_amount'], inputs['debt_rate'], inputs['debt_tenure'])
+    debt_emi = np.where(inputs['debt_emi'] > 0, inputs['debt_emi'], derived_emi)
+    real_target = inflation_adjusted_target(
+        np.where(valid, required['target_amount'], 0.0), inputs['inflation_rate'], years
+    )
+
+    # Plan columns are written as floats so every chunk shares one schema
+    output = plans.copy()
+    for column, values in required.items():
+        output[column] = values
+    for column in OPTIONAL_DEFAULTS:
+        if column in output.columns:
+            output[column] = inputs[column]
+    columns = {
+        'debt_emi': debt_emi,
+        'real_target': np.where(valid, real_target, np.nan),
+        'status': status,
+    }
+    for scenario_idx, scenario in enumerate(model.scenarios):
+        result = calculate_investment_returns_batch(
+            inputs['initial_amount'], years, inputs['monthly_investment'], allocations, scenario_idx, debt_emi,
+            model
+        )
+        if scenario_idx == 0:
+            columns['total_investment'] = np.where(valid, result['total_investment'], np.nan)
+            columns['effective_monthly_investment'] = np.where(valid, result['effective_monthly_investment'], np.nan)
+        for metric in SCENARIO_METRICS:
+            columns[f"{metric}_{scenario}"] = np.where(valid, result[metric], np.nan)
+        columns[f"time_to_goal_{scenario}"] = np.where(valid, calculate_time_to_goal_batch(
+            real_target, inputs['initial_amount'], inputs['monthly_investment'],
+            result['portfolio_return'], debt_emi
+        ), np.nan)
+    _apply_cashflow_ledger(columns, inputs, years, debt_emi, real_target, valid, model)
+    columns['goal_achievable'] = valid & (columns['future_value_normal'] >= real_target)
+
+    # Result columns are joined in one step; inserting them one at a time
+    # costs more than the calculations on small (e.g. API) batches
+    for name in [name for name in columns if name in output.columns]:
+        output[name] = columns.pop(name)
+    return pd.concat([output, pd.DataFrame(columns, index=output.index)], axis=1)
+
+
+def _numeric(column):
+    """Column as floats (NaN where blank or not a number), and where it held something non-numeric"""
+    values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=float)
+    return values, np.isnan(values) & column.notna().to_numpy()
+
+
+def _row_status(problems, n_rows):
+    """'ok', or the row's problems joined, from a dict of problem -> row mask"""
+    status = np.full(n_rows, 'ok', dtype=object)
+    failed = np.zeros(n_rows, dtype=bool)
+    for mask in problems.values():
+        failed |= mask
+    for row in np.flatnonzero(failed):
+        status[row] = '; '.join(problem for problem, mask in problems.items() if mask[row])
+    return status
+
+
+def _apply_cashflow_ledger(columns, inputs, years, debt_emi, real_target, valid, model):
+    """Overwrite the closed-form results of plans the app would run on the ledger"""
+    # The rows cashflow.uses_cashflow_ledger selects
+    rows = np.flatnonzero(valid & (
+        (inputs['sip_step_up'] > 0)
+        | ((debt_emi > 0) & ((inputs['debt_amount'] > 0) | (inputs['debt_tenure'] > 0)))
+    ))
+    if not len(rows):
+        return
+    # Return, risk and Sharpe ratios are the closed form's; the ledger
+    # changes the amounts invested, the values and the time to goal
+    for scenario_idx, scenario in enumerate(model.scenarios):
+        plans = evaluate_cashflow_plan_batch(
+            inputs['initial_amount'][rows], years[rows], inputs['monthly_investment'][rows],
+            columns[f"portfolio_return_{scenario}"][rows], real_target[rows], inputs['debt_amount'][rows],
+            inputs['debt_rate'][rows], debt_emi[rows], inputs['debt_tenure'][rows], inputs['sip_step_up'][rows],
+            inputs['redirect_emi'][rows] != 0
+        )
+        if scenario_idx == 0:
+            columns['total_investment'][rows] = plans['total_investment']
+            columns['effective_monthly_investment'][rows] = plans['effective_monthly_investment']
+        columns[f"future_value_{scenario}"][rows] = plans['future_value']
+        columns[f"gains_{scenario}"][rows] = plans['future_value'] - plans['total_investment']
+        columns[f"time_to_goal_{scenario}"][rows] = plans['time_to_goal']
+
+
+def iter_plan_chunks(path, chunk_size):
+    """Yield DataFrames of at most chunk_size plans from a CSV or Parquet file"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        # Type inference is per chunk: an id column holding 0..9 and then C10..
+        # would switch from int to str, so pass-through columns stay text
+        header = pd.read_csv(path, nrows=0).columns
+        text_columns = {column: str for column in header if column not in PLAN_COLUMNS}
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=text_columns)
+
+
+class ResultWriter:
+    """Append result chunks to a CSV or Parquet file as they are produced"""
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+        self._schema = None
+
+    def write(self, frame):
+        import pyarrow as pa
+
+        if self._writer is None:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            # A column blank throughout the first chunk has no type yet; text
+            # is what pass-through columns hold
+            self._schema = pa.schema([
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema
+            ], metadata=table.schema.metadata)
+            table = table.cast(self._schema)
+            if self.path.endswith('.parquet'):
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                import pyarrow.csv as pa_csv
+
+                self._writer = pa_csv.CSVWriter(self.path, self._schema)
+        else:
+            # Later chunks are converted to the file's schema (e.g. an int
+            # column of a chunk without blanks into float)
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def abort(self):
+        """Close and remove the partial output"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.remove(self.path)
+
+
+def run_batch(input_path, output_path, chunk_size=50000, model=None):
+    """Evaluate every plan in input_path into output_path; returns (rows, seconds)"""
+    start = time.perf_counter()
+    rows = 0
+    writer = ResultWriter(output_path)
+    try:
+        for chunk in iter_plan_chunks(input_path, chunk_size):
+            writer.write(evaluate_plans(chunk, model))
+            rows += len(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return rows, time.perf_counter() - start
+
+
+def run_reports(input_path, output_path, chunk_size=50000):
+    """Write the comprehensive report of every plan in input_path to output_path; returns (rows, seconds)"""
+    from report import ReportWriter, plan_report
+
+    start = time.perf_counter()
+    writer = ReportWriter(output_path, batch_size=chunk_size)
+    try:
+        for chunk in iter_plan_chunks(input_path, chunk_size):
+            writer.write(plan_report(plan) for plan in chunk.to_dict('records'))
+    finally:
+        writer.close()
+    return writer.count, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate client plans in bulk.")
+    parser.add_argument("input", help="CSV or Parquet file of plans")
+    parser.add_argument("output", help="CSV or Parquet file to write results to")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Plans processed per chunk")
+    parser.add_argument("--scenarios", help="JSON file of extra scenarios to evaluate")
+    parser.add_argument("--reports", action="store_true",
+                        help="Write the full report per plan (.parquet, .csv or .jsonl output)")
+    args = parser.parse_args(argv)
+
+    if args.reports:
+        if args.scenarios:
+            parser.error("--reports covers the standard scenarios only; drop --scenarios")
+        rows, seconds = run_reports(args.input, args.output, args.chunk_size)
+        rate = rows / seconds if seconds > 0 else float('inf')
+        print(f"Wrote {rows:,} reports in {seconds:.2f}s ({rate:,.0f} rows/sec) -> {args.output}", file=sys.stderr)
+        return 0
+
+    model = get_scenario_model()
+    if args.scenarios:
+        model = model.with_scenarios_from_json(args.scenarios)
+    rows, seconds = run_batch(args.input, args.output, args.chunk_size, model)
+    rate = rows / seconds if seconds > 0 else float('inf')
+    print(f"Processed {rows:,} plans in {seconds:.2f}s ({rate:,.0f} rows/sec) -> {args.output}",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
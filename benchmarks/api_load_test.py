@@ -0,0 +1,118 @@
+"""Load test for the planner JSON API.
+
+Sends a fixed number of requests with a pool of concurrent clients and
+reports throughput and p50/p90/p99 latency. With ``--serve`` it first
+starts a local instance (python api.py) on the given port and stops it
+afterwards; otherwise it targets an already running server.
+
+    python benchmarks/api_load_test.py --serve [--endpoint /v1/scenarios]
+        [--plans 100] [--requests 500] [--concurrency 16] [--workers 4]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_plans(n_plans):
+    """Plans cycling through the sidebar presets, horizons and amounts"""
+    presets = [(20, 10, 40, 25, 5), (40, 25, 15, 15, 5), (50, 35, 5, 5, 5), (40, 40, 0, 5, 15)]
+    plans = []
+    for i in range(n_plans):
+        mutual_funds, stocks, fd, bonds, aif = presets[i % len(presets)]
+        plans.append({
+            'time_horizon': 5 + i % 26, 'target_amount': 1000000 + 50000 * (i % 40),
+            'mutual_funds': mutual_funds, 'stocks': stocks, 'fd': fd, 'bonds': bonds, 'aif': aif,
+            'initial_amount': 50000 * (i % 3), 'monthly_investment': 5000 + 500 * (i % 10),
+        })
+    return plans
+
+
+def wait_until_healthy(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"API at {url} did not become healthy within {timeout}s")
+
+
+def run_load(url, payload, n_requests, concurrency):
+    """Latencies in milliseconds of successful requests, and the error count"""
+    local = threading.local()
+
+    def send(_):
+        # One keep-alive session per client thread
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.post(url, json=payload, timeout=120)
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        outcomes = list(pool.map(send, range(n_requests)))
+    latencies = [latency for latency, status in outcomes if status == 200]
+    return latencies, len(outcomes) - len(latencies)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--serve", action="store_true", help="Start a local API instance for the test")
+    parser.add_argument("--workers", type=int, help="Worker processes of the local instance")
+    parser.add_argument("--endpoint", default="/v1/scenarios")
+    parser.add_argument("--plans", type=int, default=100, help="Plans per request")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests sent first")
+    args = parser.parse_args()
+
+    url = f"http://{args.host}:{args.port}"
+    server = None
+    if args.serve:
+        command = [sys.executable, os.path.join(REPO_ROOT, "api.py"), "--host", args.host, "--port", str(args.port)]
+        if args.workers is not None:
+            command += ["--workers", str(args.workers)]
+        server = subprocess.Popen(command, cwd=REPO_ROOT)
+    try:
+        wait_until_healthy(url)
+        payload = {'plans': sample_plans(args.plans)}
+        run_load(url + args.endpoint, payload, args.warmup, args.concurrency)
+        start = time.perf_counter()
+        latencies, errors = run_load(url + args.endpoint, payload, args.requests, args.concurrency)
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print(f"{args.endpoint}: {args.requests} requests of {args.plans} plans, concurrency {args.concurrency}")
+    print(f"throughput {args.requests / elapsed:,.1f} req/s ({args.requests * args.plans / elapsed:,.0f} plans/s), "
+          f"{errors} errors")
+    if latencies:
+        print(f"latency p50 {percentile(latencies, 50):.1f} ms, p90 {percentile(latencies, 90):.1f} ms, "
+              f"p99 {percentile(latencies, 99):.1f} ms, max {max(latencies):.1f} ms, "
+              f"mean {statistics.fmean(latencies):.1f} ms")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Benchmarks of the JSON API, called in-process through its ASGI interface."""
+import asyncio
+import json
+
+import pytest
+
+import api
+from api_load_test import sample_plans
+
+
+def _post(app, path, payload):
+    messages = [{'type': 'http.request', 'body': json.dumps(payload).encode(), 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app({'type': 'http', 'method': 'POST', 'path': path, 'headers': []}, receive, send))
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+@pytest.fixture
+def thread_api():
+    # Thread-pool dispatch keeps process start-up out of the timings
+    return api.PlannerAPI(workers=0)
+
+
+def test_scenarios_1000_plans(benchmark, thread_api):
+    status, body = benchmark(_post, thread_api, '/v1/scenarios', {'plans': sample_plans(1000)})
+    assert status == 200 and len(body['results']) == 1000
+
+
+def test_projection_100_plans(benchmark, thread_api):
+    status, body = benchmark(_post, thread_api, '/v1/projection', {'plans': sample_plans(100)})
+    assert status == 200 and len(body['results'][0]['normal']) == 5
+
+
+def test_report_100_plans(benchmark, thread_api):
+    status, body = benchmark(_post, thread_api, '/v1/report', {'plans': sample_plans(100)})
+    assert status == 200 and len(body['results']) == 100
+
+
+def test_report_matches_app_structure(thread_api):
+    from report import build_report_data, evaluate_inputs, parse_plan
+
+    plan = sample_plans(2)[1]
+    status, body = _post(thread_api, '/v1/report', {'plans': [plan], 'format': 'display'})
+    inputs = parse_plan(plan)
+    results, time_to_goals, _ = evaluate_inputs(inputs)
+    expected = build_report_data(
+        None, inputs['initial_amount'], inputs['monthly_investment'], inputs['time_horizon'],
+        inputs['target_amount'], inputs['real_target'], None, inputs['allocation_percent'], results, time_to_goals
+    )
+    assert status == 200 and body['results'] == [expected]
+
+
+def test_raw_report_numbers(thread_api):
+    from report import plan_report
+
+    plan = dict(sample_plans(2)[1], reference='client-7')
+    status, body = _post(thread_api, '/v1/report', {'plans': [plan]})
+    expected = plan_report(plan)
+    result = body['results'][0]
+    assert status == 200 and result['reference'] == 'client-7'
+    assert result['scenario_analysis']['normal']['future_value'] == expected.scenarios['normal'].future_value
@@ -0,0 +1,35 @@
+"""End-to-end benchmarks of the Streamlit page, rendered headlessly."""
+import pytest
+
+from conftest import APP_PATH
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+
+def _render(query=None):
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    for key, value in (query or {}).items():
+        app.query_params[key] = value
+    app.run()
+    assert not app.exception
+    return app
+
+
+def test_full_page_render(benchmark):
+    benchmark.pedantic(_render, rounds=5, iterations=1, warmup_rounds=1)
+
+
+def test_page_rerun_with_warm_cache(benchmark):
+    app = _render()
+    benchmark.pedantic(app.run, rounds=10, iterations=1)
+    assert not app.exception
+
+
+def test_report_generation(benchmark):
+    app = _render()
+
+    def generate_report():
+        next(b for b in app.button if b.label == "Generate Comprehensive Report").click().run()
+        assert app.json
+
+    benchmark.pedantic(generate_report, rounds=5, iterations=1)
@@ -0,0 +1,311 @@
+"""Benchmarks for the headless calculation core."""
+import numpy as np
+import pytest
+
+import investment_core as core
+
+
+def test_investment_returns_scalar(benchmark, balanced_allocation):
+    result = benchmark(core.calculate_investment_returns, 50000, 10, 5000, balanced_allocation, 'normal', 0)
+    assert result['future_value'] > 0
+
+
+def _untimed():
+    return 1
+
+
+def test_profiled_wrapper_disabled(benchmark):
+    # Per-call cost of @profiled with no profiling() block open
+    from profiling import profiled
+
+    assert benchmark(profiled(_untimed)) == 1
+
+
+def test_profiled_wrapper_while_profiling(benchmark):
+    from profiling import profiled, profiling
+
+    with profiling() as profiler:
+        assert benchmark(profiled(_untimed)) == 1
+    assert profiler.timings['_untimed'][0] >= 1
+
+
+def test_preset_table_investment_returns(benchmark):
+    from preset_tables import PresetTables
+
+    tables = PresetTables()
+    result = benchmark(tables.investment_returns, 'Balanced', 50000, 10, 5000, 'normal', 0)
+    assert result['future_value'] > 0
+
+
+def test_preset_table_projection_monthly(benchmark):
+    from preset_tables import PresetTables
+
+    tables = PresetTables()
+    table = benchmark(tables.projection_table, 'Aggressive', 50000, 30, 5000, 1000, monthly=True)
+    assert table.shape == (360, 3)
+
+
+def test_preset_table_time_to_goal(benchmark):
+    from preset_tables import PresetTables
+
+    tables = PresetTables()
+    portfolio_return = tables.investment_returns('Conservative', 50000, 1, 5000)['portfolio_return']
+    assert benchmark(tables.time_to_goal, 5000000, 50000, 5000, portfolio_return) > 0
+
+
+def test_investment_returns_batch_100k(benchmark, plan_batch):
+    result = benchmark(
+        core.calculate_investment_returns_batch,
+        plan_batch['amounts'], plan_batch['years'], plan_batch['monthly_investments'],
+        plan_batch['allocations'], plan_batch['scenario_idx'], plan_batch['debt_emis']
+    )
+    assert result['future_value'].shape == (100000,)
+
+
+def test_time_to_goal_lump_sum(benchmark):
+    assert benchmark(core.calculate_time_to_goal, 1600000, 100000, 0, 0.12) > 0
+
+
+def test_time_to_goal_sip(benchmark):
+    assert benchmark(core.calculate_time_to_goal, 1600000, 0, 5000, 0.12) > 0
+
+
+def test_time_to_goal_hybrid(benchmark):
+    assert benchmark(core.calculate_time_to_goal, 1600000, 50000, 5000, 0.12, 1000) > 0
+
+
+def test_time_to_goal_batch_100k(benchmark, plan_batch):
+    targets = np.full(100000, 1600000.0)
+    returns = np.linspace(0.02, 0.2, 100000)
+    years = benchmark(
+        core.calculate_time_to_goal_batch,
+        targets, plan_batch['amounts'], plan_batch['monthly_investments'], returns, plan_batch['debt_emis']
+    )
+    assert years.shape == (100000,)
+
+
+def test_projection_table_yearly(benchmark, balanced_allocation):
+    table = benchmark(core.build_projection_table, 50000, 30, 5000, balanced_allocation, 1000)
+    assert table.shape == (30, 3)
+
+
+def test_projection_table_monthly(benchmark, balanced_allocation):
+    table = benchmark(core.build_projection_table, 50000, 30, 5000, balanced_allocation, 1000, monthly=True)
+    assert table.shape == (360, 3)
+
+
+def test_sensitivity_sweep_150k_cells(benchmark):
+    sweep = benchmark(
+        core.sensitivity_sweep, 1000000, 50000, 5000, np.linspace(0.02, 0.2, 100), np.arange(3.0, 8.05, 0.1),
+        np.arange(1, 31), 1000
+    )
+    assert sweep['shortfall'].shape == (100, 51, 30)
+
+
+def test_monte_carlo_100k_paths_30_years(benchmark, balanced_allocation):
+    summary = benchmark.pedantic(
+        core.simulate_monte_carlo,
+        args=(50000, 30, 5000, balanced_allocation, 'normal', 0, 5000000, 100000),
+        kwargs={'seed': 1}, rounds=3, iterations=1
+    )
+    assert summary['n_paths'] == 100000
+
+
+def test_regime_switching_20k_paths_30_years(benchmark, balanced_allocation):
+    summary = benchmark.pedantic(
+        core.simulate_regime_switching,
+        args=(50000, 30, 5000, balanced_allocation, 0, 5000000),
+        kwargs={'n_paths': 20000, 'seed': 1}, rounds=3, iterations=1
+    )
+    assert summary['regime_occupancy'].shape == (30, 3)
+
+
+def test_batch_planner_50k_rows(benchmark, plan_batch):
+    import pandas as pd
+
+    import batch_planner
+
+    plans = pd.DataFrame(plan_batch['allocations'][:50000] * 100, columns=core.ASSET_KEYS)
+    plans['initial_amount'] = plan_batch['amounts'][:50000]
+    plans['monthly_investment'] = plan_batch['monthly_investments'][:50000]
+    plans['time_horizon'] = plan_batch['years'][:50000]
+    plans['target_amount'] = 1000000.0
+    output = benchmark(batch_planner.evaluate_plans, plans)
+    assert len(output) == 50000
+
+
+def test_optimize_allocation_5pct_grid(benchmark):
+    import optimizer
+
+    result = benchmark(optimizer.optimize_allocation, 1600000, 50000, 10, 5000, 0, 'normal', max_risk=0.15)
+    assert len(result['candidates']) == 10626
+    if benchmark.enabled:
+        # Interactive budget; there are no timings under --benchmark-disable
+        assert benchmark.stats.stats.median < 0.2
+
+
+def test_cashflow_plan_with_amortizing_debt(benchmark, balanced_allocation):
+    import cashflow
+
+    plan = benchmark(
+        cashflow.evaluate_cashflow_plan, 50000, 30, 20000, balanced_allocation, 'normal', 5000000,
+        500000, 10, 10624, 5, sip_step_up=5
+    )
+    assert len(plan['ledger']) == 360
+    assert plan['result']['debt_payoff_month'] == 60
+
+
+def test_rolling_backtest_sample_series(benchmark, balanced_allocation):
+    import backtest
+
+    series = backtest.load_return_series()
+    summary = benchmark(
+        backtest.rolling_backtest, series, 50000, 10, 5000, balanced_allocation, 1000, 1000000
+    )
+    assert summary['n_paths'] == len(series) - 119
+
+
+def test_load_return_series_cached(benchmark):
+    import backtest
+
+    backtest.load_return_series()
+    series = benchmark(backtest.load_return_series)
+    assert isinstance(series.returns, np.memmap)
+
+
+def test_block_bootstrap_50k_paths_30_years(benchmark, balanced_allocation):
+    import backtest
+
+    series = backtest.load_return_series()
+    summary = benchmark.pedantic(
+        backtest.simulate_bootstrap,
+        args=(series, 50000, 30, 5000, balanced_allocation, 0, 5000000, 50000),
+        kwargs={'seed': 1}, rounds=3, iterations=1
+    )
+    assert summary['n_paths'] == 50000
+
+
+def test_shared_result_cache_hit(benchmark, balanced_allocation):
+    from result_cache import SharedResultCache, plan_key
+
+    cache = SharedResultCache()
+    args = (50000, 30, 5000, balanced_allocation, 'normal', 0, 5000000, 20000)
+
+    def lookup():
+        return cache.get_or_compute(
+            plan_key('simulate_monte_carlo', *args, seed=42), core.simulate_monte_carlo, *args, seed=42
+        )
+
+    lookup()
+    summary = benchmark(lookup)
+    assert summary['n_paths'] == 20000
+    assert cache.statistics()['misses'] == 1
+
+
+@pytest.fixture(scope='module')
+def sample_reports():
+    from api_load_test import sample_plans
+    from report import plan_report
+
+    return [plan_report(plan) for plan in sample_plans(10000)]
+
+
+def test_reports_to_json_10k(benchmark, sample_reports):
+    from report import reports_to_json
+
+    data = benchmark(reports_to_json, sample_reports)
+    assert data.startswith(b'[{')
+
+
+def test_reports_to_parquet_10k(benchmark, sample_reports):
+    from io import BytesIO
+
+    import pyarrow.parquet as pq
+
+    from report import reports_to_parquet
+
+    data = benchmark(reports_to_parquet, sample_reports)
+    assert pq.read_metadata(BytesIO(data)).num_rows == 10000
+
+
+def test_write_reports_streaming_10k(benchmark, sample_reports, tmp_path):
+    from report import write_reports
+
+    path = str(tmp_path / 'reports.parquet')
+    count = benchmark(write_reports, sample_reports, path, batch_size=2000)
+    assert count == 10000
+
+
+@pytest.fixture(scope='module')
+def million_results():
+    """calculate_investment_returns_batch over 1M random plans"""
+    rng = np.random.default_rng(0)
+    n = 1000000
+    return core.calculate_investment_returns_batch(
+        rng.choice([0.0, 50000.0, 100000.0], n), rng.integers(1, 31, n), rng.choice([0.0, 5000.0, 10000.0], n),
+        rng.dirichlet(np.ones(5), size=n), rng.integers(0, 3, n), rng.choice([0.0, 2000.0], n)
+    )
+
+
+def _as_dicts(columns):
+    return [dict(zip(core.RESULT_FIELDS, row)) for row in zip(*columns)]
+
+
+def _as_slots(columns):
+    return [core.InvestmentResult(*row) for row in zip(*columns)]
+
+
+def _traced_bytes(build, *args):
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        held = build(*args)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del held
+    return size
+
+
+def test_1m_results_memory(benchmark, million_results):
+    # Per-result memory of 1M results held as dicts, __slots__ objects and
+    # columns (in extra_info); the floats are created up front so only the
+    # containers count. The timing is the columnar row adapter.
+    columns = [million_results[field].tolist() for field in core.RESULT_FIELDS]
+    sizes = {
+        'dict': _traced_bytes(_as_dicts, columns),
+        'slots': _traced_bytes(_as_slots, columns),
+        'columnar': million_results.nbytes,
+    }
+    benchmark.extra_info.update({f"bytes_per_result_{kind}": size / 1000000 for kind, size in sizes.items()})
+    assert benchmark(million_results.row, 500000)['future_value'] == million_results.future_value[500000]
+    assert sizes['columnar'] < sizes['slots'] < sizes['dict'] / 2
+
+
+def test_1m_results_build_dicts(benchmark, million_results):
+    columns = [million_results[field].tolist() for field in core.RESULT_FIELDS]
+    results = benchmark.pedantic(_as_dicts, args=(columns,), rounds=3, iterations=1)
+    assert len(results) == 1000000
+
+
+def test_1m_results_build_slots(benchmark, million_results):
+    columns = [million_results[field].tolist() for field in core.RESULT_FIELDS]
+    results = benchmark.pedantic(_as_slots, args=(columns,), rounds=3, iterations=1)
+    assert len(results) == 1000000
+
+
+def test_1m_results_read_dicts(benchmark, million_results):
+    results = _as_dicts([million_results[field].tolist() for field in core.RESULT_FIELDS])
+    total = benchmark.pedantic(lambda: sum(result['future_value'] for result in results), rounds=3, iterations=1)
+    assert total > 0
+
+
+def test_1m_results_read_slots(benchmark, million_results):
+    results = _as_slots([million_results[field].tolist() for field in core.RESULT_FIELDS])
+    total = benchmark.pedantic(lambda: sum(result.future_value for result in results), rounds=3, iterations=1)
+    assert total > 0
+
+
+def test_1m_results_read_columnar(benchmark, million_results):
+    assert benchmark(lambda: million_results.future_value.sum()) > 0
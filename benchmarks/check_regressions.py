@@ -0,0 +1,39 @@
+"""Regression gate for the benchmark suite.
+
+Runs the benchmarks and compares them with a baseline stored in
+benchmarks/.baselines (the most recent one by default). Exits non-zero
+when any benchmark's median is more than the threshold slower.
+
+    python benchmarks/check_regressions.py [--threshold 25] [--baseline 0001]
+        [-- extra pytest arguments, e.g. -k preset]
+
+Baselines are machine specific: store one on the machine that runs the
+gate with ``python -m pytest --benchmark-save=baseline``.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--threshold", type=float, default=25.0,
+                        help="allowed median regression in percent")
+    parser.add_argument("--baseline", help="id of the stored baseline (default: the most recent)")
+    parser.add_argument("pytest_args", nargs="*", help="extra arguments passed on to pytest")
+    args = parser.parse_args()
+
+    compare = "--benchmark-compare" + (f"={args.baseline}" if args.baseline else "")
+    command = [
+        sys.executable, "-m", "pytest", "benchmarks", compare,
+        f"--benchmark-compare-fail=median:{args.threshold:g}%", *args.pytest_args
+    ]
+    print(" ".join(command[1:]))
+    return subprocess.run(command, cwd=REPO_ROOT).returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Shared fixtures for the performance benchmark suite.
+
+Run from the repository root (settings live in pytest.ini):
+
+    python -m pytest                                   # run all benchmarks
+    python -m pytest --benchmark-save=baseline         # store a new baseline
+    python benchmarks/check_regressions.py             # regression gate
+
+The gate compares against the most recent stored baseline in
+benchmarks/.baselines and fails on any median regression above 25%
+(--threshold to change it). Baselines are machine specific; re-save one
+when changing hardware.
+"""
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+APP_PATH = os.path.join(REPO_ROOT, "Strategic_Investment_Teacher.py")
+
+
+@pytest.fixture
+def balanced_allocation():
+    return {'mutual_funds': 0.40, 'stocks': 0.25, 'fd': 0.15, 'bonds': 0.15, 'aif': 0.05}
+
+
+@pytest.fixture
+def plan_batch():
+    """100k random plans as arrays for the vectorized engines"""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    n = 100000
+    allocations = rng.dirichlet(np.ones(5), size=n)
+    return {
+        'amounts': rng.choice([0.0, 50000.0, 100000.0], n),
+        'years': rng.integers(1, 31, n),
+        'monthly_investments': rng.choice([0.0, 5000.0, 10000.0], n),
+        'allocations': allocations,
+        'scenario_idx': rng.integers(0, 3, n),
+        'debt_emis': rng.choice([0.0, 2000.0], n),
+    }
@@ -0,0 +1,59 @@
+"""Import-time benchmark for the headless financial core.
+
+Runs ``import investment_core`` in fresh interpreters and reports the
+median wall time of the import itself (interpreter startup excluded).
+Exits non-zero when the median exceeds the budget.
+
+    python benchmarks/import_time.py [--runs 20] [--budget-ms 50]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = (
+    "import sys, time; sys.path.insert(0, {root!r}); "
+    "start = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - start) * 1000); "
+    "print(','.join(m for m in ('numpy', 'pandas', 'streamlit') if m in sys.modules))"
+)
+
+
+def measure(module, runs):
+    """Import times in milliseconds and any heavy modules pulled in"""
+    timings = []
+    heavy = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(root=REPO_ROOT, module=module)],
+            capture_output=True, text=True, check=True
+        ).stdout.split("\n")
+        timings.append(float(output[0]))
+        heavy.update(name for name in output[1].split(",") if name)
+    return timings, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--module", default="investment_core")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    timings, heavy = measure(args.module, args.runs)
+    median = statistics.median(timings)
+    print(f"import {args.module}: median {median:.2f} ms, "
+          f"min {min(timings):.2f} ms, max {max(timings):.2f} ms over {args.runs} runs")
+    if heavy:
+        print(f"heavy modules imported eagerly: {', '.join(sorted(heavy))}")
+    if median > args.budget_ms or heavy:
+        print(f"FAIL: budget is {args.budget_ms:.0f} ms with no eager heavy imports")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""Month-by-month cashflow ledger with debt amortization.
+
+The closed-form engine deducts a flat EMI for the whole horizon. The ledger
+instead amortizes the loan, stops the EMI at payoff (optionally redirecting
+it into the SIP), and applies annual SIP step-ups. Every column is computed
+as a whole-array operation over the months, so a 30-year ledger takes a couple of
+milliseconds. evaluate_cashflow_plan_batch runs many plans the same way on
+(plans, months) arrays, without building a ledger DataFrame per plan.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from investment_core import (
+    MAX_GOAL_MONTHS,
+    RESULT_FIELDS,
+    SCENARIO_KEYS,
+    InvestmentResult,
+    calculate_investment_returns,
+    compound_factor_array,
+    get_scenario_model,
+)
+from profiling import profiled
+
+# Outstanding balance, as a fraction of the principal, treated as repaid
+BALANCE_TOLERANCE = 1e-6
+# Plans per block in evaluate_cashflow_plan_batch; each block holds a dozen
+# (plans, MAX_GOAL_MONTHS) float arrays, about 5 MB each
+CASHFLOW_BLOCK_SIZE = 512
+
+
+def _debt_schedule(months, debt_amount, debt_rate, debt_emi, debt_tenure):
+    """EMI paid, interest, principal and closing balance as arrays over months 1..months.
+
+    The loan inputs are scalars, or (n, 1) columns giving (n, months) arrays
+    with a row per plan.
+    """
+    month = np.arange(1, months + 1)
+    debt_amount, debt_rate, debt_emi, debt_tenure = (
+        np.asarray(value, dtype=float) for value in (debt_amount, debt_rate, debt_emi, debt_tenure)
+    )
+    monthly_rate = debt_rate / (12 * 100)
+    # Amortizing loan: closed-form outstanding balance after each EMI.
+    # Rounding leaves a residue of about 1e-9 after the last EMI; below the
+    # tolerance the loan counts as repaid, so no stray EMI follows the payoff
+    growth = compound_factor_array(1 + monthly_rate, month)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        balance = np.where(
+            monthly_rate > 0,
+            debt_amount * growth - debt_emi * (growth - 1) / monthly_rate,
+            debt_amount - debt_emi * month
+        )
+    balance = np.where(balance > BALANCE_TOLERANCE * debt_amount, balance, 0.0)
+    opening = np.concatenate([np.broadcast_to(debt_amount, balance.shape[:-1] + (1,)), balance[..., :-1]], axis=-1)
+    interest = opening * monthly_rate
+    emi_paid = np.where(opening > 0, np.minimum(debt_emi, opening + interest), 0.0)
+    principal = emi_paid - interest * (opening > 0)
+
+    # EMI without a loan balance: paid for the tenure, or the whole horizon
+    amortizing = (debt_amount > 0) & (debt_emi > 0)
+    tenure_months = np.where(debt_tenure > 0, debt_tenure * 12, months)
+    fixed_emi = np.where(month <= tenure_months, debt_emi, 0.0)
+    return (
+        np.where(amortizing, emi_paid, fixed_emi),
+        np.where(amortizing, interest, 0.0),
+        np.where(amortizing, principal, 0.0),
+        np.where(amortizing, balance, 0.0),
+    )
+
+
+def _cashflow_columns(amount, months, monthly_investment, portfolio_return, debt_amount, debt_rate,
+                      debt_emi, debt_tenure, sip_step_up, redirect_emi):
+    """Ledger columns as arrays over months 1..months.
+
+    Plan inputs are scalars, or (n, 1) columns for a row per plan; Month and
+    Year stay one-dimensional.
+    """
+    month = np.arange(1, months + 1)
+    sip = monthly_investment * compound_factor_array(1 + np.asarray(sip_step_up) / 100, (month - 1) // 12)
+    emi_paid, interest, principal, balance = _debt_schedule(months, debt_amount, debt_rate, debt_emi, debt_tenure)
+
+    # Without redirection the freed-up EMI is not invested after payoff
+    deducted = np.where(redirect_emi, emi_paid, np.asarray(debt_emi, dtype=float))
+    contribution = np.maximum(0.0, sip - deducted)
+
+    monthly_return = np.asarray(portfolio_return) / 12
+    growth = compound_factor_array(1 + monthly_return, month)
+    sip_value = growth * np.cumsum(contribution / growth, axis=-1)
+    lump_value = amount * compound_factor_array(1 + np.asarray(portfolio_return), month / 12)
+
+    return {
+        'Month': month,
+        'Year': (month - 1) // 12 + 1,
+        'SIP Budget': sip,
+        'EMI Paid': emi_paid,
+        'Interest': interest,
+        'Principal': principal,
+        'Debt Balance': balance,
+        'Invested': contribution,
+        'Lump Sum Value': lump_value,
+        'SIP Value': sip_value,
+        'Portfolio Value': lump_value + sip_value,
+    }
+
+
+def build_cashflow_ledger(amount, years, monthly_investment, allocation, scenario='normal',
+                          debt_amount=0, debt_rate=0, debt_emi=0, debt_tenure=0,
+                          sip_step_up=0, redirect_emi=True, model=None):
+    """Full month-by-month ledger as a DataFrame indexed by month.
+
+    ``sip_step_up`` is the annual SIP increase in percent. As in
+    calculate_investment_returns the EMI is paid out of the monthly budget;
+    with ``redirect_emi`` the whole budget is invested once the debt is paid.
+    """
+    model = get_scenario_model() if model is None else model
+    portfolio_return = model.portfolio_metrics(
+        [allocation.get(asset, 0) for asset in model.assets], model.index(scenario)
+    )[0]
+    columns = _cashflow_columns(
+        amount, int(round(years * 12)), monthly_investment, portfolio_return, debt_amount, debt_rate,
+        debt_emi, debt_tenure, sip_step_up, redirect_emi
+    )
+    return pd.DataFrame(columns).set_index('Month')
+
+
+class LedgerResult(InvestmentResult):
+    """InvestmentResult of a ledger, with the loan's interest and payoff month (None if never paid off)"""
+    __slots__ = ('total_interest_paid', 'debt_payoff_month')
+    _fields = RESULT_FIELDS + __slots__
+
+    def __init__(self, *values):
+        super().__init__(*values[:len(RESULT_FIELDS)])
+        self.total_interest_paid, self.debt_payoff_month = values[len(RESULT_FIELDS):]
+
+
+def summarize_ledger(ledger, amount, portfolio_metrics):
+    """LedgerResult summarizing a ledger, with the fields of calculate_investment_returns"""
+    years = len(ledger) / 12
+    future_value = float(ledger['Portfolio Value'].iloc[-1])
+    total_investment = amount + float(ledger['SIP Budget'].to_numpy().sum())
+    if (ledger['Principal'] > 0).any():
+        # Amortizing loan: repaid in the month whose EMI clears the balance
+        cleared = ledger['Debt Balance'] == 0
+        payoff_month = int(cleared.idxmax()) if cleared.any() else None
+    else:
+        # EMI for a fixed tenure: the last month it is paid, if it stops
+        stopped = (ledger['EMI Paid'] == 0) & (ledger['EMI Paid'].cumsum() > 0)
+        payoff_month = int(stopped.idxmax()) - 1 if stopped.any() else None
+    sharpe = portfolio_metrics['sharpe_ratio']
+    return LedgerResult(
+        total_investment, future_value, future_value - total_investment, portfolio_metrics['portfolio_return'],
+        portfolio_metrics['portfolio_risk'], portfolio_metrics['portfolio_beta'], sharpe,
+        sharpe * math.sqrt(years), float(ledger['Invested'].iloc[0]), float(ledger['EMI Paid'].to_numpy().sum()),
+        float(ledger['Interest'].sum()), payoff_month
+    )
+
+
+@profiled
+def evaluate_cashflow_plan(amount, years, monthly_investment, allocation, scenario='normal',
+                           target_amount=None, debt_amount=0, debt_rate=0, debt_emi=0, debt_tenure=0,
+                           sip_step_up=0, redirect_emi=True, model=None):
+    """Ledger-based result, time to goal and ledger for one scenario.
+
+    The ledger is run out to MAX_GOAL_MONTHS once, so the time to goal
+    (month resolution, None beyond 100 years) comes from the same pass.
+    """
+    model = get_scenario_model() if model is None else model
+    metrics = calculate_investment_returns(amount, 1, monthly_investment, allocation, scenario, debt_emi, model)
+    horizon_months = int(round(years * 12))
+    columns = _cashflow_columns(
+        amount, max(horizon_months, MAX_GOAL_MONTHS - 1), monthly_investment, metrics['portfolio_return'],
+        debt_amount, debt_rate, debt_emi, debt_tenure, sip_step_up, redirect_emi
+    )
+    ledger = pd.DataFrame({name: values[:horizon_months] for name, values in columns.items()}).set_index('Month')
+
+    time_to_goal = None
+    if target_amount is not None:
+        if amount >= target_amount:
+            time_to_goal = 0
+        elif metrics['portfolio_return'] > 0:
+            reached = columns['Portfolio Value'] >= target_amount
+            if reached.any():
+                time_to_goal = float(columns['Month'][reached.argmax()]) / 12
+    return {
+        'result': summarize_ledger(ledger, amount, metrics),
+        'time_to_goal': time_to_goal if time_to_goal is None or time_to_goal < 100 else None,
+        'ledger': ledger,
+    }
+
+
+def _first_month_reaching(values, targets):
+    """First month (1-based) each row of ledger values reaches its target, 0 if it never does"""
+    reached = values >= targets[:, np.newaxis]
+    return np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, 0)
+
+
+@profiled
+def evaluate_cashflow_plan_batch(amounts, years, monthly_investments, portfolio_returns, target_amounts,
+                                 debt_amounts=0, debt_rates=0, debt_emis=0, debt_tenures=0, sip_step_ups=0,
+                                 redirect_emis=True, block_size=CASHFLOW_BLOCK_SIZE):
+    """evaluate_cashflow_plan's figures for many plans at once.
+
+    Inputs broadcast to one value per plan; ``portfolio_returns`` are the
+    plans' annual returns under the scenario (e.g. from
+    calculate_investment_returns_batch). Plans run through the ledger
+    ``block_size`` at a time as (plans, months) arrays. Returns a dict of
+    arrays, matching evaluate_cashflow_plan exactly: ``total_investment``,
+    ``future_value``, ``effective_monthly_investment``, ``total_debt_paid``
+    and ``time_to_goal`` (NaN where it gives None).
+    """
+    (amounts, years, monthly_investments, portfolio_returns, target_amounts, debt_amounts, debt_rates, debt_emis,
+     debt_tenures, sip_step_ups) = (np.atleast_1d(values) for values in np.broadcast_arrays(*(
+        np.asarray(values, dtype=float) for values in (
+            amounts, years, monthly_investments, portfolio_returns, target_amounts, debt_amounts, debt_rates,
+            debt_emis, debt_tenures, sip_step_ups
+        )
+    )))
+    redirect_emis = np.broadcast_to(np.asarray(redirect_emis, dtype=bool), amounts.shape)
+    horizons = np.rint(years * 12).astype(np.int64)
+    output = {name: np.empty(amounts.shape) for name in
+              ['total_investment', 'future_value', 'effective_monthly_investment', 'total_debt_paid', 'time_to_goal']}
+
+    def ledger(plans, months):
+        rows = [values[plans, np.newaxis] for values in (
+            amounts, monthly_investments, portfolio_returns, debt_amounts, debt_rates, debt_emis, debt_tenures,
+            sip_step_ups, redirect_emis
+        )]
+        return _cashflow_columns(rows[0], months, *rows[1:])
+
+    for start in range(0, len(amounts), block_size):
+        block = np.arange(start, min(start + block_size, len(amounts)))
+        horizon = horizons[block]
+        columns = ledger(block, int(horizon.max()))
+        output['future_value'][block] = columns['Portfolio Value'][np.arange(len(block)), horizon - 1]
+        output['effective_monthly_investment'][block] = columns['Invested'][:, 0]
+        # Sums over each plan's own horizon, reduced as summarize_ledger does
+        for months in np.unique(horizon):
+            plans = np.flatnonzero(horizon == months)
+            output['total_investment'][block[plans]] = amounts[block[plans]] + \
+                columns['SIP Budget'][plans, :months].sum(axis=1)
+            output['total_debt_paid'][block[plans]] = columns['EMI Paid'][plans, :months].sum(axis=1)
+
+        # A ledger's early months do not depend on its length, so only plans
+        # short of their target by the block's longest horizon are run on
+        # to MAX_GOAL_MONTHS for the time to goal
+        targets = target_amounts[block]
+        reached_month = _first_month_reaching(columns['Portfolio Value'], targets)
+        pending = np.flatnonzero((reached_month == 0) & (portfolio_returns[block] > 0) & (amounts[block] < targets))
+        if len(pending) and len(columns['Month']) < MAX_GOAL_MONTHS - 1:
+            reached_month[pending] = _first_month_reaching(
+                ledger(block[pending], MAX_GOAL_MONTHS - 1)['Portfolio Value'], targets[pending]
+            )
+        time_to_goal = np.where(reached_month > 0, reached_month / 12, np.nan)
+        time_to_goal = np.where(portfolio_returns[block] > 0, time_to_goal, np.nan)
+        time_to_goal = np.where(amounts[block] >= targets, 0.0, time_to_goal)
+        output['time_to_goal'][block] = np.where(time_to_goal < 100, time_to_goal, np.nan)
+    return output
+
+
+def _years_to_reach(values, targets, amount, portfolio_return):
+    """Years until a ledger's portfolio values first reach each target, as evaluate_cashflow_plan finds them"""
+    reached = np.searchsorted(np.maximum.accumulate(values), targets)
+    years = np.where(reached < len(values), (reached + 1) / 12, np.nan)
+    if portfolio_return <= 0:
+        years = np.full(targets.shape, np.nan)
+    years = np.where(amount >= targets, 0.0, years)
+    return np.where(years < 100, years, np.nan)
+
+
+@profiled
+def cashflow_goal_seek(target_amounts, amount, years, monthly_investment, allocation, debt_amount=0, debt_rate=0,
+                       debt_emi=0, debt_tenure=0, sip_step_up=0, redirect_emi=True, scenarios=None, model=None):
+    """goal_seek for plans evaluated on the ledger.
+
+    Same arguments and result as investment_core.goal_seek plus the ledger
+    inputs, so the advice agrees with evaluate_cashflow_plan:
+
+    - ``monthly_investment``: first-year SIP budget needed with the given
+      lump sum; it steps up yearly and the EMI is still paid out of it
+    - ``lump_sum``: lump sum needed today alongside the given SIP
+    - ``years``: months until the ledger reaches the target, in years
+      (NaN if over 100 years)
+
+    The invested amount, max(0, SIP - EMI), is piecewise linear in the SIP,
+    so the SIP is solved exactly between the months' breakpoints.
+    """
+    model = get_scenario_model() if model is None else model
+    scenarios = SCENARIO_KEYS if scenarios is None else list(scenarios)
+    targets, years = np.broadcast_arrays(np.asarray(target_amounts, dtype=float), np.asarray(years))
+    horizons = np.rint(years * 12).astype(int)
+    months = max(int(horizons.max()), MAX_GOAL_MONTHS - 1)
+    month = np.arange(1, months + 1)
+    step_up = compound_factor_array(1 + sip_step_up / 100, (month - 1) // 12)
+    emi_paid = _debt_schedule(months, debt_amount, debt_rate, debt_emi, debt_tenure)[0]
+    deducted = emi_paid if redirect_emi else np.full(months, float(debt_emi))
+
+    solutions = {}
+    for scenario in scenarios:
+        portfolio_return = calculate_investment_returns(
+            amount, 1, monthly_investment, allocation, scenario, debt_emi, model
+        )['portfolio_return']
+        columns = _cashflow_columns(
+            amount, months, monthly_investment, portfolio_return, debt_amount, debt_rate, debt_emi, debt_tenure,
+            sip_step_up, redirect_emi
+        )
+        growth = compound_factor_array(1 + portfolio_return / 12, month)
+        required_sip = np.empty(targets.shape)
+        lump_sum = np.empty(targets.shape)
+        for horizon in np.unique(horizons):
+            cells = horizons == horizon
+            lump_factor = compound_factor_array(1 + portfolio_return, horizon / 12)
+            # Month k invests max(0, sip * step_up[k] - deducted[k]), so it
+            # joins once the SIP passes deducted[k] / step_up[k]
+            breakpoints = deducted[:horizon] / step_up[:horizon]
+            order = np.argsort(breakpoints, kind='stable')
+            slope = np.cumsum((step_up[:horizon] / growth[:horizon])[order])
+            offset = np.cumsum((deducted[:horizon] / growth[:horizon])[order])
+            # Discounted amount invested with the SIP at each breakpoint; it
+            # rises with the SIP, so each target falls in one linear segment
+            at_breakpoints = breakpoints[order] * np.r_[0.0, slope[:-1]] - np.r_[0.0, offset[:-1]]
+            needed = (targets[cells] - amount * lump_factor) / growth[horizon - 1]
+            segment = np.clip(np.searchsorted(at_breakpoints, needed) - 1, 0, horizon - 1)
+            required_sip[cells] = np.where(needed > 0, (needed + offset[segment]) / slope[segment], 0.0)
+            lump_sum[cells] = np.maximum(0.0, (targets[cells] - columns['SIP Value'][horizon - 1]) / lump_factor)
+        solutions[scenario] = {'monthly_investment': required_sip, 'lump_sum': lump_sum,
+                               'years': _years_to_reach(columns['Portfolio Value'], targets, amount, portfolio_return)}
+    return solutions
+
+
+def uses_cashflow_ledger(debt_amount=0, debt_emi=0, debt_tenure=0, sip_step_up=0):
+    """Whether the ledger differs from the flat-EMI closed form for these inputs"""
+    return sip_step_up > 0 or (debt_emi > 0 and (debt_amount > 0 or debt_tenure > 0))
+
+
+def ledger_projection_table(ledgers, labels=None, monthly=False):
+    """Portfolio value per scenario ledger, shaped like build_projection_table"""
+    labels = list(ledgers) if labels is None else list(labels)
+    values = {label: ledger['Portfolio Value'] for label, ledger in zip(labels, ledgers.values())}
+    table = pd.DataFrame(values)
+    if monthly:
+        table.index = pd.Index(table.index / 12, name='Year')
+    else:
+        table = table[table.index % 12 == 0]
+        table.index = pd.Index(table.index // 12, name='Year')
+    return table
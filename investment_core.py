@@ -0,0 +1,865 @@
+"""Headless financial core of the Strategic Investment Planner.
+
+Importable without Streamlit (batch jobs, tests, APIs). NumPy and pandas
+are only imported inside the functions that need them, so importing this
+module stays cheap; the scalar functions use the standard library alone.
+"""
+import math
+import os
+from collections.abc import Mapping
+
+from profiling import profiled
+
+# Asset and scenario ordering shared by the scalar and batch engines
+ASSET_KEYS = ['mutual_funds', 'stocks', 'fd', 'bonds', 'aif']
+SCENARIO_KEYS = ['normal', 'bullish', 'bearish']
+
+ASSET_RETURNS = {
+    'normal': {
+        'mutual_funds': 0.12, 'stocks': 0.15, 'fd': 0.06, 'bonds': 0.07, 'aif': 0.18
+    },
+    'bullish': {
+        'mutual_funds': 0.18, 'stocks': 0.25, 'fd': 0.06, 'bonds': 0.07, 'aif': 0.28
+    },
+    'bearish': {
+        'mutual_funds': 0.04, 'stocks': 0.02, 'fd': 0.06, 'bonds': 0.07, 'aif': 0.08
+    }
+}
+
+# Base risk levels
+BASE_ASSET_RISKS = {
+    'mutual_funds': 0.18, 'stocks': 0.25, 'fd': 0.02, 'bonds': 0.05, 'aif': 0.30
+}
+
+ASSET_BETAS = {
+    'mutual_funds': 0.85, 'stocks': 1.2, 'fd': 0.0, 'bonds': 0.1, 'aif': 1.5
+}
+
+RISK_FREE_RATE = 0.07
+
+# Sidebar allocation presets as whole percentages in ASSET_KEYS order
+PRESET_ALLOCATIONS = {
+    'Conservative': (20, 10, 40, 25, 5),
+    'Balanced': (40, 25, 15, 15, 5),
+    'Aggressive': (50, 35, 5, 5, 5),
+    'Ultra Aggressive': (40, 40, 0, 5, 15),
+}
+
+# How far (as a fraction of the portfolio) an allocation total may miss 100%
+# from rounding and still count as fully allocated
+ALLOCATION_TOLERANCE = 1e-5
+
+# Fields of an investment result, in the order the engines produce them
+RESULT_FIELDS = ('total_investment', 'future_value', 'gains', 'portfolio_return', 'portfolio_risk', 'portfolio_beta',
+                 'sharpe_ratio', 'time_adjusted_sharpe', 'effective_monthly_investment', 'total_debt_paid')
+
+class InvestmentResult(Mapping):
+    """Result of calculate_investment_returns as __slots__ attributes.
+
+    Several of these are held per page run and millions per batch export, so
+    they carry no per-instance dict. They still read like the result dicts
+    they replace: ``result['future_value']``, ``dict(result)``, ``in`` and
+    equality with dicts all work; attribute access is the faster path.
+    """
+    __slots__ = RESULT_FIELDS
+    _fields = RESULT_FIELDS
+
+    def __init__(self, total_investment, future_value, gains, portfolio_return, portfolio_risk, portfolio_beta,
+                 sharpe_ratio, time_adjusted_sharpe, effective_monthly_investment, total_debt_paid):
+        self.total_investment = total_investment
+        self.future_value = future_value
+        self.gains = gains
+        self.portfolio_return = portfolio_return
+        self.portfolio_risk = portfolio_risk
+        self.portfolio_beta = portfolio_beta
+        self.sharpe_ratio = sharpe_ratio
+        self.time_adjusted_sharpe = time_adjusted_sharpe
+        self.effective_monthly_investment = effective_monthly_investment
+        self.total_debt_paid = total_debt_paid
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, field) for field in self._fields)
+
+    def __repr__(self):
+        values = ', '.join(f"{field}={getattr(self, field)!r}" for field in self._fields)
+        return f"{type(self).__name__}({values})"
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self._fields}
+
+class InvestmentResults(Mapping):
+    """Result of calculate_investment_returns_batch: one array per RESULT_FIELDS entry.
+
+    Reads like the dict of arrays it replaces (``results['future_value']``).
+    ``shape`` is the broadcast plan shape; row() gives one InvestmentResult,
+    to_frame() a DataFrame and to_records() a NumPy structured array.
+    """
+    __slots__ = RESULT_FIELDS
+    _fields = RESULT_FIELDS
+
+    def __init__(self, *columns):
+        for field, column in zip(self._fields, columns, strict=True):
+            setattr(self, field, column)
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, field) for field in self._fields)
+
+    @property
+    def shape(self):
+        return self.future_value.shape
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, field).nbytes for field in self._fields)
+
+    def row(self, index):
+        """The plan at ``index`` as an InvestmentResult of Python floats"""
+        return InvestmentResult(*(getattr(self, field)[index].item() for field in self._fields))
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame({field: getattr(self, field).ravel() for field in self._fields})
+
+    def to_records(self):
+        import numpy as np
+
+        records = np.empty(self.shape, dtype=[(field, np.float64) for field in self._fields])
+        for field in self._fields:
+            records[field] = getattr(self, field)
+        return records
+
+def compound_factor(base, periods):
+    """base ** periods, using repeated squaring for whole-number periods.
+
+    Shared by the scalar and batch engines so both round identically; libm
+    pow and NumPy's vectorized pow can disagree in the last bit.
+    """
+    if periods < 0 or periods != int(periods):
+        return base ** periods
+    periods = int(periods)
+    result = 1.0
+    while periods:
+        if periods & 1:
+            result *= base
+        base *= base
+        periods >>= 1
+    return result
+
+def compound_factor_array(base, periods):
+    """Vectorized compound_factor, bit-identical to it element by element"""
+    import numpy as np
+
+    base, periods = np.asarray(base, dtype=float), np.asarray(periods)
+    whole = (periods >= 0) & (periods == np.floor(periods))
+    remaining = np.where(whole, periods, 0).astype(np.int64)
+    result = np.ones(np.broadcast_shapes(base.shape, periods.shape))
+    # The squares vary only with the base and the bits only with the periods
+    # (e.g. per plan and per month), so neither is broadcast to the full shape
+    square = base
+    while remaining.any():
+        np.multiply(result, square, out=result, where=(remaining & 1).astype(bool))
+        square = square * square
+        remaining >>= 1
+    if not whole.all():
+        result = np.where(whole, result, base ** periods.astype(float))
+    return result
+
+SCENARIO_RISK_MULTIPLIERS = {
+    'normal': {
+        'mutual_funds': 1.0, 'stocks': 1.0, 'fd': 1.0, 'bonds': 1.0, 'aif': 1.0
+    },
+    'bullish': {
+        'mutual_funds': 0.7, 'stocks': 0.8, 'fd': 1.0, 'bonds': 0.9, 'aif': 0.8
+    },
+    'bearish': {
+        'mutual_funds': 1.4, 'stocks': 1.6, 'fd': 1.0, 'bonds': 1.2, 'aif': 1.8
+    }
+}
+
+# Optional JSON file of extra scenarios, loaded into the default model
+SCENARIOS_FILE_ENV = 'PLANNER_SCENARIOS_FILE'
+
+class ScenarioModel:
+    """Immutable scenario parameters compiled into NumPy arrays.
+
+    ``returns`` and ``risks`` are (assets x scenarios) arrays, ``betas`` is
+    per asset. Custom scenarios are added with ``with_scenario`` (which
+    returns a new model) or from a JSON file via ``from_json``.
+    """
+
+    def __init__(self, scenario_returns, risk_multipliers, base_risks=BASE_ASSET_RISKS,
+                 betas=ASSET_BETAS, assets=ASSET_KEYS):
+        import numpy as np
+
+        self.assets = tuple(assets)
+        self.scenarios = tuple(scenario_returns)
+        missing = [name for name in self.scenarios if name not in risk_multipliers]
+        if missing:
+            raise ValueError(f"Missing risk multipliers for scenarios: {', '.join(missing)}")
+        self._definition = {
+            name: {'returns': dict(scenario_returns[name]), 'risk_multipliers': dict(risk_multipliers[name])}
+            for name in self.scenarios
+        }
+        self._base_risks = dict(base_risks)
+        self._betas = dict(betas)
+
+        self.returns = np.array([[scenario_returns[s][a] for s in self.scenarios] for a in self.assets])
+        self.risk_multipliers = np.array([[risk_multipliers[s][a] for s in self.scenarios] for a in self.assets])
+        self.risks = np.array([[base_risks[a]] for a in self.assets]) * self.risk_multipliers
+        self.betas = np.array([betas[a] for a in self.assets])
+        # (scenarios x assets x [return, risk, beta]) for one-shot portfolio metrics
+        self.metric_tables = np.stack(
+            [self.returns.T, self.risks.T, np.broadcast_to(self.betas, self.risks.T.shape)], axis=-1
+        )
+        # The same rows as Python floats for the scalar engine
+        self._scalar_rows = {
+            name: tuple(tuple(float(v) for v in row) for row in self.metric_tables[i])
+            for i, name in enumerate(self.scenarios)
+        }
+        for array in (self.returns, self.risk_multipliers, self.risks, self.betas, self.metric_tables):
+            array.setflags(write=False)
+
+    def index(self, scenario):
+        """Column index of a scenario name"""
+        try:
+            return self.scenarios.index(scenario)
+        except ValueError:
+            raise KeyError(f"Unknown scenario: {scenario!r}") from None
+
+    def indices(self, scenarios):
+        """Column indices for a sequence of scenario names"""
+        return [self.index(scenario) for scenario in scenarios]
+
+    def scalar_rows(self, scenario):
+        """Per-asset (return, risk, beta) tuples for one scenario"""
+        return self._scalar_rows[scenario]
+
+    def asset_risk_multipliers(self, scenario):
+        """Risk multipliers for one scenario as an asset dict"""
+        return dict(self._definition[scenario]['risk_multipliers'])
+
+    def portfolio_metrics(self, weights, scenario_idx=0):
+        """Portfolio (return, risk, beta) as a weights x (assets x metrics) product.
+
+        ``weights`` is (..., assets) and ``scenario_idx`` broadcasts against its
+        leading dimensions. Returns an array of shape (..., 3). The product is
+        accumulated in asset order, so it matches the scalar engine bit for bit.
+        """
+        import numpy as np
+
+        weights = np.asarray(weights, dtype=float)
+        tables = self.metric_tables[np.asarray(scenario_idx)]
+        total = weights[..., 0, np.newaxis] * tables[..., 0, :]
+        for j in range(1, len(self.assets)):
+            total = total + weights[..., j, np.newaxis] * tables[..., j, :]
+        return total
+
+    def with_scenario(self, name, returns, risk_multipliers):
+        """New model with a scenario added (or replaced)"""
+        scenario_returns = {s: d['returns'] for s, d in self._definition.items()}
+        multipliers = {s: d['risk_multipliers'] for s, d in self._definition.items()}
+        scenario_returns[name] = returns
+        multipliers[name] = risk_multipliers
+        return ScenarioModel(scenario_returns, multipliers, self._base_risks, self._betas, self.assets)
+
+    def with_scenarios_from_json(self, path):
+        """New model with the scenarios defined in a JSON file added.
+
+        The file maps scenario names to {"returns": {...}, "risk_multipliers": {...}},
+        both keyed by asset.
+        """
+        import json
+
+        with open(path) as f:
+            definitions = json.load(f)
+        model = self
+        for name, definition in definitions.items():
+            model = model.with_scenario(name, definition['returns'], definition['risk_multipliers'])
+        return model
+
+_scenario_model = None
+
+def get_scenario_model():
+    """The process-wide scenario model, compiled on first use"""
+    global _scenario_model
+    if _scenario_model is None:
+        model = ScenarioModel(ASSET_RETURNS, SCENARIO_RISK_MULTIPLIERS)
+        scenarios_file = os.environ.get(SCENARIOS_FILE_ENV)
+        if scenarios_file:
+            model = model.with_scenarios_from_json(scenarios_file)
+        _scenario_model = model
+    return _scenario_model
+
+def register_scenario(name, returns, risk_multipliers):
+    """Add a custom scenario to the process-wide model"""
+    global _scenario_model
+    _scenario_model = get_scenario_model().with_scenario(name, returns, risk_multipliers)
+    return _scenario_model
+
+def calculate_scenario_risk_multipliers(scenario):
+    """Calculate risk multipliers based on market scenarios"""
+    return get_scenario_model().asset_risk_multipliers(scenario)
+
+# Not @profiled: called per scenario and per table cell, it is timed by the
+# callers' sections instead
+def calculate_investment_returns(amount, years, monthly_investment, allocation, scenario='normal', debt_emi=0,
+                                 model=None):
+    """Enhanced calculation with scenario-based risk and debt obligations"""
+    
+    # Scenario-scaled asset returns, risks and betas, compiled once
+    model = get_scenario_model() if model is None else model
+    portfolio_return = portfolio_risk = portfolio_beta = 0
+    for asset, (asset_return, asset_risk, asset_beta) in zip(model.assets, model.scalar_rows(scenario)):
+        weight = allocation.get(asset, 0)
+        portfolio_return += weight * asset_return
+        portfolio_risk += weight * asset_risk
+        portfolio_beta += weight * asset_beta
+    
+    # Calculate future value
+    months = years * 12
+    monthly_return = portfolio_return / 12
+    
+    # Adjust for debt EMI impact
+    effective_monthly_investment = max(0, monthly_investment - debt_emi)
+    
+    # Future value of lump sum
+    fv_lumpsum = amount * compound_factor(1 + portfolio_return, years)
+    
+    # Future value of monthly investments (adjusted for debt)
+    if effective_monthly_investment > 0:
+        fv_monthly = effective_monthly_investment * ((compound_factor(1 + monthly_return, months) - 1) / monthly_return)
+    else:
+        fv_monthly = 0
+    
+    total_future_value = fv_lumpsum + fv_monthly
+    total_investment = amount + (monthly_investment * months)
+    total_debt_paid = debt_emi * months
+    
+    # Calculate time-adjusted Sharpe ratio
+    excess_return = portfolio_return - RISK_FREE_RATE
+    annualized_sharpe = excess_return / portfolio_risk if portfolio_risk > 0 else 0
+    
+    # Time-adjusted Sharpe ratio
+    time_adjusted_sharpe = annualized_sharpe * math.sqrt(years)
+    
+    return InvestmentResult(
+        total_investment, total_future_value, total_future_value - total_investment, portfolio_return,
+        portfolio_risk, portfolio_beta, annualized_sharpe, time_adjusted_sharpe, effective_monthly_investment,
+        total_debt_paid
+    )
+
+def allocation_to_vector(allocation):
+    """Convert an allocation dict into a weight vector ordered by ASSET_KEYS"""
+    import numpy as np
+
+    return np.array([allocation.get(asset, 0.0) for asset in ASSET_KEYS], dtype=float)
+
+@profiled
+def calculate_investment_returns_batch(amounts, years, monthly_investments, allocations, scenario_idx=0, debt_emis=0,
+                                       model=None):
+    """Vectorized calculate_investment_returns over many plans in one pass.
+
+    All plan inputs broadcast against each other. ``allocations`` is an
+    (n, 5) weight matrix in ASSET_KEYS order and ``scenario_idx`` indexes the
+    scenario model's scenarios (SCENARIO_KEYS by default). Returns an
+    InvestmentResults holding an array per result field; values match the
+    scalar function exactly.
+    """
+    import numpy as np
+
+    model = get_scenario_model() if model is None else model
+    allocations = np.atleast_2d(np.asarray(allocations, dtype=float))
+    metrics = model.portfolio_metrics(allocations, np.asarray(scenario_idx, dtype=np.intp))
+    (portfolio_return, portfolio_risk, portfolio_beta,
+     amounts, years, monthly_investments, debt_emis) = np.broadcast_arrays(
+        metrics[..., 0], metrics[..., 1], metrics[..., 2],
+        np.asarray(amounts, dtype=float),
+        np.asarray(years),
+        np.asarray(monthly_investments, dtype=float),
+        np.asarray(debt_emis, dtype=float),
+    )
+
+    months = years * 12
+    monthly_return = portfolio_return / 12
+    effective_monthly_investment = np.maximum(0, monthly_investments - debt_emis)
+
+    fv_lumpsum = amounts * compound_factor_array(1 + portfolio_return, years)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fv_monthly = np.where(
+            effective_monthly_investment > 0,
+            effective_monthly_investment * ((compound_factor_array(1 + monthly_return, months) - 1) / monthly_return),
+            0.0
+        )
+        annualized_sharpe = np.where(
+            portfolio_risk > 0, (portfolio_return - RISK_FREE_RATE) / portfolio_risk, 0.0
+        )
+
+    total_future_value = fv_lumpsum + fv_monthly
+    total_investment = amounts + (monthly_investments * months)
+
+    return InvestmentResults(
+        total_investment, total_future_value, total_future_value - total_investment, portfolio_return,
+        portfolio_risk, portfolio_beta, annualized_sharpe, annualized_sharpe * np.sqrt(years),
+        effective_monthly_investment, debt_emis * months
+    )
+
+@profiled
+def build_projection_table(amount, years, monthly_investment, allocation, debt_emi=0,
+                           scenarios=None, labels=None, monthly=False, model=None):
+    """Year-by-year (or month-by-month) future value for every scenario.
+
+    The whole trajectory is computed in one broadcasted pass over a
+    (periods x scenarios) grid rather than one calculate_investment_returns
+    call per year; yearly points equal the scalar results exactly.
+    """
+    import numpy as np
+    import pandas as pd
+
+    model = get_scenario_model() if model is None else model
+    scenarios = SCENARIO_KEYS if scenarios is None else list(scenarios)
+    labels = scenarios if labels is None else list(labels)
+    scenario_idx = np.array(model.indices(scenarios))
+
+    rates = calculate_investment_returns_batch(
+        amount, 1, monthly_investment, allocation_to_vector(allocation), scenario_idx, debt_emi, model
+    )
+    portfolio_return = rates['portfolio_return'][np.newaxis, :]
+    effective_monthly = rates['effective_monthly_investment'][np.newaxis, :]
+    monthly_return = portfolio_return / 12
+
+    if monthly:
+        months = np.arange(1, years * 12 + 1)
+        index = pd.Index(months / 12, name='Year')
+    else:
+        months = np.arange(1, years + 1) * 12
+        index = pd.Index(months // 12, name='Year')
+    months = months[:, np.newaxis]
+
+    fv_lumpsum = amount * compound_factor_array(1 + portfolio_return, months / 12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fv_monthly = np.where(
+            effective_monthly > 0,
+            effective_monthly * ((compound_factor_array(1 + monthly_return, months) - 1) / monthly_return),
+            0.0
+        )
+
+    return pd.DataFrame(fv_lumpsum + fv_monthly, index=index, columns=labels)
+
+# Longest horizon the time-to-goal solvers search (100 years)
+MAX_GOAL_MONTHS = 1200
+
+def _hybrid_future_value(initial_amount, effective_monthly, portfolio_return, months):
+    """Future value of a lump sum plus SIP after a number of months"""
+    monthly_return = portfolio_return / 12
+    fv_lump = initial_amount * (1 + portfolio_return) ** (months/12)
+    fv_sip = effective_monthly * (((1 + monthly_return) ** months - 1) / monthly_return)
+    return fv_lump + fv_sip
+
+# Not @profiled, like calculate_investment_returns
+def calculate_time_to_goal(target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi=0):
+    """Calculate time needed to reach goal considering debt obligations"""
+    effective_monthly = max(0, monthly_investment - debt_emi)
+    
+    if portfolio_return <= 0 or (initial_amount <= 0 and effective_monthly <= 0):
+        return None
+    
+    if initial_amount >= target_amount:
+        return 0
+    
+    if effective_monthly <= 0:
+        # Only lump sum
+        years_needed = math.log(target_amount / initial_amount) / math.log(1 + portfolio_return)
+    else:
+        # Combined lump sum and SIP
+        monthly_return = portfolio_return / 12
+        if initial_amount > 0:
+            # Future value grows monotonically with time, so bisect for the
+            # first month that reaches the target (month-level resolution)
+            low, high = 1, MAX_GOAL_MONTHS - 1
+            if _hybrid_future_value(initial_amount, effective_monthly, portfolio_return, high) < target_amount:
+                years_needed = None
+            else:
+                while low < high:
+                    mid = (low + high) // 2
+                    if _hybrid_future_value(initial_amount, effective_monthly, portfolio_return, mid) >= target_amount:
+                        high = mid
+                    else:
+                        low = mid + 1
+                years_needed = low / 12
+        else:
+            # Only SIP
+            months_needed = math.log(1 + (target_amount * monthly_return) / effective_monthly) / math.log(1 + monthly_return)
+            years_needed = months_needed / 12
+    
+    return years_needed if years_needed and years_needed < 100 else None
+
+@profiled
+def calculate_time_to_goal_batch(target_amounts, initial_amounts, monthly_investments, portfolio_returns, debt_emis=0):
+    """Vectorized calculate_time_to_goal for many targets/plans at once.
+
+    Inputs broadcast against each other. Returns an array of years with NaN
+    wherever the scalar function would return None.
+    """
+    import numpy as np
+
+    targets, initial, monthly, returns, emis = np.broadcast_arrays(
+        np.asarray(target_amounts, dtype=float),
+        np.asarray(initial_amounts, dtype=float),
+        np.asarray(monthly_investments, dtype=float),
+        np.asarray(portfolio_returns, dtype=float),
+        np.asarray(debt_emis, dtype=float),
+    )
+    effective = np.maximum(0, monthly - emis)
+    years = np.full(targets.shape, np.nan)
+
+    solvable = (returns > 0) & ((initial > 0) | (effective > 0))
+    reached = solvable & (initial >= targets)
+    pending = solvable & ~reached
+    lump_only = pending & (effective <= 0)
+    sip_only = pending & (effective > 0) & (initial <= 0)
+    hybrid = pending & (effective > 0) & (initial > 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        years[lump_only] = (
+            np.log(targets[lump_only] / initial[lump_only]) / np.log(1 + returns[lump_only])
+        )
+        monthly_return = returns[sip_only] / 12
+        years[sip_only] = np.log(
+            1 + (targets[sip_only] * monthly_return) / effective[sip_only]
+        ) / np.log(1 + monthly_return) / 12
+
+    if hybrid.any():
+        args = (initial[hybrid], effective[hybrid], returns[hybrid])
+        goal = targets[hybrid]
+        low = np.ones(goal.shape, dtype=np.int64)
+        high = np.full(goal.shape, MAX_GOAL_MONTHS - 1, dtype=np.int64)
+        attainable = _hybrid_future_value(*args, high) >= goal
+        while (low < high).any():
+            mid = (low + high) // 2
+            hit = _hybrid_future_value(*args, mid) >= goal
+            high = np.where(hit, mid, high)
+            low = np.where(hit, low, mid + 1)
+        years[hybrid] = np.where(attainable, low / 12, np.nan)
+
+    years[(years <= 0) | (years >= 100)] = np.nan
+    years[reached] = 0.0
+    return years
+
+def _growth_factors(portfolio_return, years):
+    """Lump-sum and monthly-annuity growth factors, as the return engines compute them"""
+    import numpy as np
+
+    months = np.asarray(years) * 12
+    monthly_return = np.asarray(portfolio_return, dtype=float) / 12
+    lump = compound_factor_array(1 + portfolio_return, years)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(
+            monthly_return != 0,
+            (compound_factor_array(1 + monthly_return, months) - 1) / monthly_return,
+            months
+        )
+    return lump, annuity
+
+@profiled
+def goal_seek(target_amounts, amount, years, monthly_investment, allocation, debt_emi=0,
+              scenarios=None, model=None):
+    """Exactly solve for what it takes to reach the target under each scenario.
+
+    ``target_amounts`` and ``years`` broadcast, so targets[:, None] against
+    horizons[None, :] fills a sensitivity table in one call. For each
+    scenario returns a dict of arrays:
+
+    - ``monthly_investment``: SIP needed with the given lump sum (the EMI is
+      still deducted from it, as in calculate_investment_returns)
+    - ``lump_sum``: lump sum needed today alongside the given SIP
+    - ``years``: horizon needed with the current plan (NaN if over 100 years)
+    """
+    import numpy as np
+
+    model = get_scenario_model() if model is None else model
+    scenarios = SCENARIO_KEYS if scenarios is None else list(scenarios)
+    targets, years = np.broadcast_arrays(np.asarray(target_amounts, dtype=float), np.asarray(years))
+    metrics = model.portfolio_metrics(allocation_to_vector(allocation), model.indices(scenarios))
+    effective_monthly = max(0, monthly_investment - debt_emi)
+
+    solutions = {}
+    for scenario, portfolio_return in zip(scenarios, metrics[:, 0]):
+        lump, annuity = _growth_factors(portfolio_return, years)
+        needed_effective = (targets - amount * lump) / annuity
+        solutions[scenario] = {
+            'monthly_investment': np.where(needed_effective > 0, needed_effective + debt_emi, 0.0),
+            'lump_sum': np.maximum(0.0, (targets - effective_monthly * annuity) / lump),
+            'years': calculate_time_to_goal_batch(
+                targets, amount, monthly_investment, portfolio_return, debt_emi
+            ),
+        }
+    return solutions
+
+@profiled
+def sensitivity_sweep(target_amount, amount, monthly_investment, portfolio_returns, inflation_rates, horizons,
+                      debt_emi=0):
+    """Future value and goal shortfall over a return x inflation x horizon grid.
+
+    The three axes are broadcast against each other in one pass, so every
+    array in the result has shape (returns, inflation rates, horizons); pass
+    a single value on any axis for a 2-D sweep. ``target_amount`` is in
+    today's money and inflation rates are in percent. Future values equal
+    calculate_investment_returns for the same portfolio return; the
+    shortfall is what is missing from the inflation-adjusted target.
+    """
+    import numpy as np
+
+    returns = np.atleast_1d(np.asarray(portfolio_returns, dtype=float))[:, np.newaxis, np.newaxis]
+    inflation = np.atleast_1d(np.asarray(inflation_rates, dtype=float))[np.newaxis, :, np.newaxis]
+    years = np.atleast_1d(np.asarray(horizons))[np.newaxis, np.newaxis, :]
+
+    lump, annuity = _growth_factors(returns, years)
+    future_value = amount * lump + max(0, monthly_investment - debt_emi) * annuity
+    real_target = inflation_adjusted_target(target_amount, inflation, years)
+    shape = np.broadcast_shapes(future_value.shape, real_target.shape)
+    return {
+        'future_value': np.broadcast_to(future_value, shape),
+        'real_target': np.broadcast_to(real_target, shape),
+        'shortfall': np.maximum(0.0, real_target - future_value),
+    }
+
+# Correlation between asset classes used by the Monte Carlo engine
+ASSET_CORRELATIONS = [
+    # mf    stocks fd    bonds aif
+    [1.00, 0.85, 0.00, 0.10, 0.60],
+    [0.85, 1.00, 0.00, 0.05, 0.65],
+    [0.00, 0.00, 1.00, 0.30, 0.00],
+    [0.10, 0.05, 0.30, 1.00, 0.05],
+    [0.60, 0.65, 0.00, 0.05, 1.00],
+]
+
+MC_CHUNK_SIZE = 25000
+MC_PERCENTILES = (5, 25, 50, 75, 95)
+
+def monthly_return_distribution(allocation, scenario='normal', model=None):
+    """Mean and volatility of the portfolio's monthly return in a scenario.
+
+    Asset returns are jointly normal with ASSET_CORRELATIONS and scenario-scaled
+    risks; with monthly rebalancing the portfolio return is then normal with
+    variance w' Cov w, so paths can draw it directly instead of per asset.
+    """
+    import numpy as np
+
+    model = get_scenario_model() if model is None else model
+    weights = allocation_to_vector(allocation)
+    scenario_idx = model.index(scenario)
+    monthly_means = model.returns[:, scenario_idx] / 12
+    monthly_vols = model.risks[:, scenario_idx] / np.sqrt(12)
+    covariance = np.array(ASSET_CORRELATIONS) * np.outer(monthly_vols, monthly_vols)
+    return float(weights @ monthly_means), float(np.sqrt(weights @ covariance @ weights))
+
+def summarize_simulation(year_end_values, target_amount=None, percentiles=MC_PERCENTILES):
+    """Percentile fan and goal probability for simulated year-end values"""
+    import numpy as np
+    import pandas as pd
+
+    fan = np.percentile(year_end_values, percentiles, axis=0).T
+    final_values = year_end_values[:, -1]
+    return {
+        'percentiles': pd.DataFrame(
+            fan,
+            index=pd.Index(np.arange(1, year_end_values.shape[1] + 1), name='Year'),
+            columns=[f"P{p}" for p in percentiles]
+        ),
+        'goal_probability': (
+            float(np.mean(final_values >= target_amount)) if target_amount is not None else None
+        ),
+        'mean_final_value': float(final_values.mean()),
+        'n_paths': int(year_end_values.shape[0])
+    }
+
+def gather_simulation_chunks(chunks, n_paths, chunk_size, target_amount=None, on_progress=None,
+                             year_end=lambda result: result):
+    """Chunk results in index order from (index, result) pairs arriving in any order.
+
+    If given, ``on_progress(done, total, partial_summary)`` is called as
+    each chunk but the last arrives, summarizing the ``year_end`` values of
+    the chunks so far; callers report the final summary themselves.
+    """
+    import numpy as np
+
+    total_chunks = len(range(0, n_paths, chunk_size))
+    results = {}
+    for index, result in chunks:
+        results[index] = result
+        if on_progress is not None and len(results) < total_chunks:
+            on_progress(len(results), total_chunks, summarize_simulation(
+                np.concatenate([year_end(chunk) for chunk in results.values()]), target_amount
+            ))
+    return [results[index] for index in sorted(results)]
+
+@profiled
+def simulate_monte_carlo(amount, years, monthly_investment, allocation, scenario='normal', debt_emi=0,
+                         target_amount=None, n_paths=100000, seed=None, chunk_size=MC_CHUNK_SIZE,
+                         workers=1, on_progress=None):
+    """Monte Carlo simulation of a plan with SIP and EMI cashflows.
+
+    Paths are simulated in seeded chunks of ``chunk_size`` (bounding memory;
+    only year-end values are kept), optionally across ``workers`` processes.
+    Results depend only on ``seed``, not on the worker count. If given,
+    ``on_progress(done, total, partial_summary)`` is called as chunks finish.
+    Returns the dict from summarize_simulation.
+    """
+    import numpy as np
+    import monte_carlo
+
+    mean, vol = monthly_return_distribution(allocation, scenario)
+    contribution = max(0, monthly_investment - debt_emi)
+    chunks = gather_simulation_chunks(
+        monte_carlo.iter_simulation_chunks(
+            n_paths, years * 12, amount, contribution, mean, vol, seed, chunk_size, workers
+        ),
+        n_paths, chunk_size, target_amount, on_progress
+    )
+    summary = summarize_simulation(np.concatenate(chunks), target_amount)
+    if on_progress is not None:
+        total_chunks = len(chunks)
+        on_progress(total_chunks, total_chunks, summary)
+    return summary
+
+# Monthly regime transition probabilities (rows: from, columns: to) in
+# SCENARIO_KEYS order; regimes persist for about 1-2 years on average
+DEFAULT_TRANSITION_MATRIX = [
+    # normal bullish bearish
+    [0.95, 0.03, 0.02],
+    [0.06, 0.93, 0.01],
+    [0.08, 0.02, 0.90],
+]
+
+def stationary_distribution(transition):
+    """Long-run share of time spent in each regime of a transition matrix"""
+    import numpy as np
+
+    transition = np.asarray(transition, dtype=float)
+    n = len(transition)
+    # Solve pi (P - I) = 0 with sum(pi) = 1
+    system = np.vstack([(transition - np.eye(n)).T, np.ones(n)])
+    return np.linalg.lstsq(system, np.r_[np.zeros(n), 1.0], rcond=None)[0]
+
+@profiled
+def simulate_regime_switching(amount, years, monthly_investment, allocation, debt_emi=0, target_amount=None,
+                              transition=None, regimes=None, initial_regime=None, n_paths=20000, goal_years=50,
+                              seed=None, chunk_size=MC_CHUNK_SIZE, workers=1, on_progress=None):
+    """Monte Carlo simulation where the market moves between scenario regimes.
+
+    Each path follows a Markov chain over ``regimes`` (SCENARIO_KEYS by
+    default) with the monthly ``transition`` matrix, drawing every month's
+    return from the current regime's scenario returns and risks. Paths
+    start in ``initial_regime`` or, by default, a regime drawn from the
+    chain's long-run distribution. Returns the dict from
+    summarize_simulation plus:
+
+    - ``goal_years``: years until each path first reaches the target (NaN
+      if not within ``goal_years``) and their ``time_to_goal`` percentiles
+    - ``regime_occupancy``: share of path-months in each regime per year
+    - ``time_in_regime``: share of all path-months in each regime
+
+    ``seed``, ``workers`` and ``on_progress`` behave as in simulate_monte_carlo.
+    """
+    import numpy as np
+    import pandas as pd
+    import monte_carlo
+
+    model = get_scenario_model()
+    regimes = SCENARIO_KEYS if regimes is None else list(regimes)
+    transition = np.asarray(DEFAULT_TRANSITION_MATRIX if transition is None else transition, dtype=float)
+    if transition.shape != (len(regimes), len(regimes)):
+        raise ValueError(f"Transition matrix must be {len(regimes)}x{len(regimes)}")
+    if (transition < 0).any() or not np.allclose(transition.sum(axis=1), 1.0):
+        raise ValueError("Transition matrix rows must be probabilities that sum to 1")
+    if initial_regime is None:
+        initial_probabilities = stationary_distribution(transition)
+    else:
+        initial_probabilities = np.eye(len(regimes))[regimes.index(initial_regime)]
+
+    distributions = np.array([monthly_return_distribution(allocation, regime, model) for regime in regimes])
+    months = years * 12
+    goal_months = max(months, goal_years * 12) if target_amount is not None else months
+    chunks = gather_simulation_chunks(
+        monte_carlo.iter_chunks(
+            monte_carlo.regime_chunk,
+            (months, goal_months, amount, max(0, monthly_investment - debt_emi), distributions[:, 0],
+             distributions[:, 1], transition, initial_probabilities, target_amount),
+            n_paths, seed, chunk_size, workers
+        ),
+        n_paths, chunk_size, target_amount, on_progress, year_end=lambda chunk: chunk[0]
+    )
+    year_end, goal_month, occupancy = zip(*chunks)
+
+    summary = summarize_simulation(np.concatenate(year_end), target_amount)
+    goal_years_needed = np.concatenate(goal_month) / 12
+    occupancy = sum(occupancy) / n_paths
+    summary['goal_years'] = goal_years_needed
+    summary['time_to_goal'] = pd.Series(
+        np.nanpercentile(goal_years_needed, MC_PERCENTILES) if not np.isnan(goal_years_needed).all()
+        else np.full(len(MC_PERCENTILES), np.nan),
+        index=[f"P{p}" for p in MC_PERCENTILES]
+    )
+    summary['regime_occupancy'] = pd.DataFrame(
+        occupancy.reshape(years, 12, -1).mean(axis=1),
+        index=pd.Index(np.arange(1, years + 1), name='Year'), columns=regimes
+    )
+    summary['time_in_regime'] = pd.Series(occupancy.mean(axis=0), index=regimes)
+    if on_progress is not None:
+        on_progress(len(chunks), len(chunks), summary)
+    return summary
+
+def inflation_adjusted_target(target_amount, inflation_rate, years):
+    """Target amount in future money; inflation_rate is in percent"""
+    return target_amount * ((1 + inflation_rate/100) ** years)
+
+def calculate_emi(principal, annual_rate, tenure_years):
+    """Monthly EMI for a loan; annual_rate is in percent"""
+    monthly_rate = annual_rate / (12 * 100)
+    num_payments = tenure_years * 12
+    if monthly_rate > 0:
+        return principal * (monthly_rate * (1 + monthly_rate) ** num_payments) / ((1 + monthly_rate) ** num_payments - 1)
+    return principal / num_payments
+
+def calculate_emi_batch(principals, annual_rates, tenure_years):
+    """Vectorized calculate_emi; zero where there is no loan"""
+    import numpy as np
+
+    principals, annual_rates, tenure_years = np.broadcast_arrays(
+        np.asarray(principals, dtype=float),
+        np.asarray(annual_rates, dtype=float),
+        np.asarray(tenure_years, dtype=float),
+    )
+    monthly_rate = annual_rates / (12 * 100)
+    num_payments = tenure_years * 12
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = (1 + monthly_rate) ** num_payments
+        emi = np.where(
+            monthly_rate > 0,
+            principals * (monthly_rate * growth) / (growth - 1),
+            principals / num_payments
+        )
+    return np.where((principals > 0) & (num_payments > 0), emi, 0.0)
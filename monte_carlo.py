@@ -0,0 +1,170 @@
+"""Monte Carlo path simulation kernels.
+
+Kept free of Streamlit and of the app module so that process-pool workers
+can import them cheaply.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def chunk_plan(n_paths, chunk_size, seed=None):
+    """Split a run into (seed_sequence, n_paths) chunks.
+
+    Seeds are spawned per chunk rather than per worker, so a given seed
+    produces identical paths whatever the worker count.
+    """
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(seeds, sizes))
+
+
+def simulate_chunk(seed_sequence, n_paths, months, amount, contribution, mean, vol):
+    """Simulate wealth paths month by month; returns year-end values (paths x years)"""
+    rng = np.random.default_rng(seed_sequence)
+    wealth = np.full(n_paths, float(amount))
+    year_end = np.empty((n_paths, months // 12))
+    shocks = np.empty(n_paths)
+    for month in range(1, months + 1):
+        rng.standard_normal(out=shocks)
+        wealth *= 1 + mean + vol * shocks
+        wealth += contribution
+        if month % 12 == 0:
+            year_end[:, month // 12 - 1] = wealth
+    return year_end
+
+
+def regime_chunk(seed_sequence, n_paths, months, goal_months, amount, contribution, means, vols, transition,
+                 initial_probabilities, target_amount):
+    """Simulate paths that switch between market regimes month by month.
+
+    The regime follows a Markov chain with the given ``transition`` matrix
+    (rows: from, columns: to), and each month's return is drawn from the
+    current regime's ``means``/``vols``. Paths run for ``goal_months`` to
+    time the goal. Returns (year-end values over the first ``months``,
+    month the goal was first reached or NaN, regime counts per month).
+    """
+    rng = np.random.default_rng(seed_sequence)
+    n_regimes = len(means)
+    # Inverse-CDF sampling: the next regime is the number of cumulative
+    # row probabilities at or below a uniform draw
+    cumulative = np.cumsum(transition, axis=1)[:, :-1].T.copy()
+    regime = np.searchsorted(np.cumsum(initial_probabilities)[:-1], rng.random(n_paths), side='right')
+    wealth = np.full(n_paths, float(amount))
+    year_end = np.empty((n_paths, months // 12))
+    goal_month = np.full(n_paths, np.nan)
+    if target_amount is not None:
+        goal_month[wealth >= target_amount] = 0
+    occupancy = np.empty((months, n_regimes), dtype=np.int64)
+
+    def step(regime, wealth):
+        wealth = wealth * (1 + means[regime] + vols[regime] * rng.standard_normal(len(wealth))) + contribution
+        draws = rng.random(len(regime))
+        next_regime = np.zeros(len(regime), dtype=np.intp)
+        for boundary in cumulative:
+            next_regime += draws >= boundary[regime]
+        return next_regime, wealth
+
+    for month in range(1, months + 1):
+        occupancy[month - 1] = np.bincount(regime, minlength=n_regimes)
+        regime, wealth = step(regime, wealth)
+        if month % 12 == 0:
+            year_end[:, month // 12 - 1] = wealth
+        if target_amount is not None:
+            goal_month[np.isnan(goal_month) & (wealth >= target_amount)] = month
+
+    # Past the horizon only paths still short of the goal are simulated
+    if target_amount is not None:
+        active = np.flatnonzero(np.isnan(goal_month))
+        regime, wealth = regime[active], wealth[active]
+        for month in range(months + 1, goal_months + 1):
+            if not len(active):
+                break
+            regime, wealth = step(regime, wealth)
+            reached = wealth >= target_amount
+            if reached.any():
+                goal_month[active[reached]] = month
+                active, regime, wealth = active[~reached], regime[~reached], wealth[~reached]
+    return year_end, goal_month, occupancy
+
+
+def bootstrap_chunk(seed_sequence, n_paths, months, amount, contribution, monthly_returns, block_months):
+    """Circular block bootstrap of a monthly return series; returns year-end values (paths x years).
+
+    Each path strings together randomly started blocks of ``block_months``
+    consecutive historical months, gathered with one fancy-indexing step.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    n_blocks = -(-months // block_months)
+    starts = rng.integers(0, len(monthly_returns), size=(n_paths, n_blocks, 1))
+    months_idx = (starts + np.arange(block_months)).reshape(n_paths, -1)[:, :months] % len(monthly_returns)
+    growth = np.cumprod(1 + monthly_returns[months_idx], axis=1)
+    # Wealth after month t is growth[t] * (amount + contribution * sum(1 / growth[1..t]))
+    discounted = np.cumsum(np.reciprocal(growth), axis=1)
+    return growth[:, 11::12] * (amount + contribution * discounted[:, 11::12])
+
+
+def shared_pool(workers):
+    """The process pool shared by every simulation, created on first use.
+
+    Workers are spawned rather than forked: the app and the API call in from
+    threads, and forking a multi-threaded process can deadlock the child.
+    The pool has at least ``workers`` processes (default: the CPU count).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            size = max(workers, os.cpu_count() or 1)
+            _pool = ProcessPoolExecutor(size, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def iter_chunks(kernel, args, n_paths, seed=None, chunk_size=25000, workers=1):
+    """Yield (chunk_index, kernel(seed_sequence, size, *args)) as each chunk finishes.
+
+    With ``workers`` > 1 (None: the CPU count) and more than one chunk, the
+    chunks run on the shared process pool, at most ``workers`` at a time,
+    and are yielded in completion order; otherwise they run serially in
+    order in this process. If the consumer stops early the chunks not yet
+    started are cancelled rather than waited for.
+    """
+    plan = chunk_plan(n_paths, chunk_size, seed)
+    workers = min((os.cpu_count() or 1) if workers is None else workers, len(plan))
+    if workers <= 1:
+        for index, (seed_sequence, size) in enumerate(plan):
+            yield index, kernel(seed_sequence, size, *args)
+        return
+
+    pool = shared_pool(workers)
+    queued = iter(enumerate(plan))
+    running = {}
+
+    def submit_next():
+        for index, (seed_sequence, size) in queued:
+            running[pool.submit(kernel, seed_sequence, size, *args)] = index
+            return
+
+    for _ in range(workers):
+        submit_next()
+    try:
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                submit_next()
+                yield index, future.result()
+    finally:
+        for future in running:
+            future.cancel()
+
+
+def iter_simulation_chunks(n_paths, months, amount, contribution, mean, vol,
+                           seed=None, chunk_size=25000, workers=1):
+    """Yield (chunk_index, year_end_values) of simulate_chunk as each chunk finishes"""
+    return iter_chunks(simulate_chunk, (months, amount, contribution, mean, vol), n_paths, seed, chunk_size, workers)
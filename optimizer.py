@@ -0,0 +1,92 @@
+"""Allocation search over the five asset classes.
+
+Every allocation on a fixed grid (5% steps gives 10,626 portfolios) is
+scored in one vectorized pass with the batch engines, which is fast enough
+to run on every page rerun.
+"""
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from investment_core import (
+    ASSET_KEYS,
+    calculate_investment_returns_batch,
+    calculate_time_to_goal_batch,
+    get_scenario_model,
+)
+from profiling import profiled
+
+
+@lru_cache(maxsize=8)
+def allocation_grid(step=0.05, n_assets=len(ASSET_KEYS)):
+    """All weight vectors on a grid of ``step`` that sum to 1 (read-only array)"""
+    units = int(round(1 / step))
+    # Stars and bars: choose the n_assets - 1 cut points among units + n_assets - 1 slots
+    cuts = np.array(list(combinations(range(units + n_assets - 1), n_assets - 1)))
+    bounds = np.column_stack([
+        np.full(len(cuts), -1), cuts, np.full(len(cuts), units + n_assets - 1)
+    ])
+    grid = (np.diff(bounds, axis=1) - 1) / units
+    grid.setflags(write=False)
+    return grid
+
+
+def efficient_frontier(risks, returns):
+    """Indices of non-dominated portfolios, ordered by increasing risk"""
+    order = np.lexsort((-returns, risks))
+    best_so_far = np.maximum.accumulate(returns[order])
+    improves = np.r_[True, returns[order][1:] > best_so_far[:-1]]
+    return order[improves]
+
+
+@profiled
+def optimize_allocation(target_amount, amount, years, monthly_investment, debt_emi=0,
+                        scenario='normal', step=0.05, max_risk=None, model=None):
+    """Search allocations for the fastest route to ``target_amount``.
+
+    Scores every grid allocation (return, risk, time-adjusted Sharpe,
+    future value, time to goal) under ``scenario`` and returns a dict with
+    the scored ``candidates``, the efficient ``frontier``, the allocation
+    minimizing time to goal among those within ``max_risk`` as
+    ``best_allocation`` (falling back to the highest future value when no
+    allocation reaches the goal) and the ``max_sharpe_allocation``.
+    """
+    model = get_scenario_model() if model is None else model
+    grid = allocation_grid(step)
+    scenario_idx = model.index(scenario)
+    results = calculate_investment_returns_batch(
+        amount, years, monthly_investment, grid, scenario_idx, debt_emi, model
+    )
+    time_to_goal = calculate_time_to_goal_batch(
+        target_amount, amount, monthly_investment, results['portfolio_return'], debt_emi
+    )
+
+    candidates = pd.DataFrame(np.round(grid * 100, 6), columns=ASSET_KEYS)
+    candidates['portfolio_return'] = results['portfolio_return']
+    candidates['portfolio_risk'] = results['portfolio_risk']
+    candidates['time_adjusted_sharpe'] = results['time_adjusted_sharpe']
+    candidates['future_value'] = results['future_value']
+    candidates['time_to_goal'] = time_to_goal
+
+    eligible = np.ones(len(grid), dtype=bool) if max_risk is None else results['portfolio_risk'] <= max_risk
+    if not eligible.any():
+        eligible = results['portfolio_risk'] <= results['portfolio_risk'].min()
+    eligible_idx = np.flatnonzero(eligible)
+    reachable = eligible_idx[~np.isnan(time_to_goal[eligible_idx])]
+    if len(reachable):
+        # Fastest to goal; ties broken by lower risk
+        best = reachable[np.lexsort((results['portfolio_risk'][reachable], time_to_goal[reachable]))[0]]
+    else:
+        best = eligible_idx[np.argmax(results['future_value'][eligible_idx])]
+    max_sharpe = eligible_idx[np.argmax(results['sharpe_ratio'][eligible_idx])]
+
+    return {
+        'candidates': candidates,
+        'frontier': candidates.iloc[efficient_frontier(results['portfolio_risk'], results['portfolio_return'])],
+        'best_allocation': dict(zip(ASSET_KEYS, grid[best].tolist())),
+        'best_index': int(best),
+        'goal_reachable': bool(len(reachable)),
+        'max_sharpe_allocation': dict(zip(ASSET_KEYS, grid[max_sharpe].tolist())),
+    }
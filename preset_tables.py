@@ -0,0 +1,146 @@
+"""Precomputed growth factors for the sidebar allocation presets.
+
+The presets, the scenarios and the whole-year horizons the sidebar offers
+are fixed, so their lump-sum and annuity growth factors can be computed
+once per process. A preset plan's future value, projection series and time
+to goal then reduce to table lookups and a multiply-add. Every table is
+filled with the same operations as the scalar and batch engines, so the
+lookups return exactly the values those engines compute.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from investment_core import (
+    ASSET_KEYS,
+    MAX_GOAL_MONTHS,
+    PRESET_ALLOCATIONS,
+    RISK_FREE_RATE,
+    InvestmentResult,
+    calculate_time_to_goal,
+    compound_factor_array,
+    get_scenario_model,
+)
+
+
+class PresetTables:
+    """Growth factors per preset x scenario x month.
+
+    ``lump[p, s, m]`` and ``annuity[p, s, m]`` are the factors
+    calculate_investment_returns and build_projection_table apply after
+    ``m`` months (m = 0 .. 12 * max_years). ``metrics[p, s]`` holds the
+    portfolio (return, risk, beta).
+    """
+
+    def __init__(self, presets=PRESET_ALLOCATIONS, max_years=30, model=None):
+        self.model = get_scenario_model() if model is None else model
+        self.presets = tuple(presets)
+        self.scenarios = self.model.scenarios
+        self.max_years = max_years
+        weights = np.array([presets[name] for name in self.presets], dtype=float) / 100
+        self.allocations = {name: dict(zip(ASSET_KEYS, row.tolist())) for name, row in zip(self.presets, weights)}
+        self._preset_index = {tuple(row.tolist()): i for i, row in enumerate(weights)}
+
+        self.metrics = self.model.portfolio_metrics(weights[:, np.newaxis, :], np.arange(len(self.scenarios)))
+        portfolio_return = self.metrics[..., 0, np.newaxis]
+        monthly_return = portfolio_return / 12
+        months = np.arange(max_years * 12 + 1)
+        self.lump = compound_factor_array(1 + portfolio_return, months / 12)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.annuity = np.where(
+                monthly_return != 0, (compound_factor_array(1 + monthly_return, months) - 1) / monthly_return, months
+            )
+        for array in (self.metrics, self.lump, self.annuity):
+            array.setflags(write=False)
+        # Scalar rows for the (preset, scenario) lookups of single plans
+        self._scalar_metrics = self.metrics.tolist()
+        self._lump_rows = self.lump.tolist()
+        self._annuity_rows = self.annuity.tolist()
+        # The time-to-goal search evaluates ** like calculate_time_to_goal;
+        # NumPy's vectorized pow can differ from it in the last bit
+        self._goal_tables = {}
+        for portfolio_return in {row[0] for rows in self._scalar_metrics for row in rows}:
+            monthly_return = portfolio_return / 12
+            self._goal_tables[portfolio_return] = (
+                [(1 + portfolio_return) ** (month / 12) for month in range(MAX_GOAL_MONTHS)],
+                [((1 + monthly_return) ** month - 1) / monthly_return for month in range(MAX_GOAL_MONTHS)],
+            )
+
+    def preset_for(self, allocation, years=None):
+        """Name of the preset ``allocation`` is, or None (also when ``years`` is off the table)"""
+        if self.model is not get_scenario_model():
+            return None
+        if years is not None and (years != int(years) or not 1 <= years <= self.max_years):
+            return None
+        index = self._preset_index.get(tuple(float(allocation.get(asset, 0)) for asset in ASSET_KEYS))
+        return None if index is None else self.presets[index]
+
+    def investment_returns(self, preset, amount, years, monthly_investment, scenario='normal', debt_emi=0):
+        """calculate_investment_returns for a preset plan, from the tables"""
+        p, s = self.presets.index(preset), self.model.index(scenario)
+        portfolio_return, portfolio_risk, portfolio_beta = self._scalar_metrics[p][s]
+        months = years * 12
+        effective_monthly_investment = max(0, monthly_investment - debt_emi)
+        fv_lumpsum = amount * self._lump_rows[p][s][months]
+        if effective_monthly_investment > 0:
+            fv_monthly = effective_monthly_investment * self._annuity_rows[p][s][months]
+        else:
+            fv_monthly = 0
+        total_future_value = fv_lumpsum + fv_monthly
+        total_investment = amount + (monthly_investment * months)
+        annualized_sharpe = (portfolio_return - RISK_FREE_RATE) / portfolio_risk if portfolio_risk > 0 else 0
+        return InvestmentResult(
+            total_investment, total_future_value, total_future_value - total_investment, portfolio_return,
+            portfolio_risk, portfolio_beta, annualized_sharpe, annualized_sharpe * math.sqrt(years),
+            effective_monthly_investment, debt_emi * months
+        )
+
+    def projection_table(self, preset, amount, years, monthly_investment, debt_emi=0, scenarios=None, labels=None,
+                         monthly=False):
+        """build_projection_table for a preset plan, from the tables"""
+        scenarios = self.scenarios if scenarios is None else list(scenarios)
+        labels = scenarios if labels is None else list(labels)
+        p, scenario_idx = self.presets.index(preset), self.model.indices(scenarios)
+        if monthly:
+            months = np.arange(1, years * 12 + 1)
+            index = pd.Index(months / 12, name='Year')
+        else:
+            months = np.arange(1, years + 1) * 12
+            index = pd.Index(months // 12, name='Year')
+        lump = self.lump[p][scenario_idx][:, months].T
+        effective_monthly = max(0.0, float(monthly_investment - debt_emi))
+        values = amount * lump
+        if effective_monthly > 0:
+            values = values + effective_monthly * self.annuity[p][scenario_idx][:, months].T
+        return pd.DataFrame(values, index=index, columns=labels)
+
+    def has_goal_table(self, portfolio_return):
+        """Whether time_to_goal has month tables for this portfolio return"""
+        return portfolio_return in self._goal_tables
+
+    def time_to_goal(self, target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi=0):
+        """calculate_time_to_goal with the hybrid month search done as a table lookup.
+
+        Only preset portfolio returns have tables; other plans, and the
+        closed-form lump-sum and SIP-only cases, go to calculate_time_to_goal.
+        """
+        effective_monthly = max(0, monthly_investment - debt_emi)
+        if (portfolio_return not in self._goal_tables or portfolio_return <= 0 or initial_amount <= 0
+                or effective_monthly <= 0 or initial_amount >= target_amount):
+            return calculate_time_to_goal(target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi)
+        lump, annuity = self._goal_tables[portfolio_return]
+        # The same bisection for the first month reaching the target, with
+        # the growth factors looked up instead of recomputed
+        low, high = 1, MAX_GOAL_MONTHS - 1
+        if initial_amount * lump[high] + effective_monthly * annuity[high] < target_amount:
+            return None
+        while low < high:
+            mid = (low + high) // 2
+            if initial_amount * lump[mid] + effective_monthly * annuity[mid] >= target_amount:
+                high = mid
+            else:
+                low = mid + 1
+        years_needed = low / 12
+        return years_needed if years_needed < 100 else None
+
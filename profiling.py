@@ -0,0 +1,166 @@
+"""Opt-in section timing and cProfile capture.
+
+Code is instrumented with ``section(name)`` blocks, ``checkpoint(name)``
+markers for long sequential functions, and the ``@profiled`` decorator.
+Nothing is recorded unless a ``profiling()`` block is active on the
+current thread. While no block is active anywhere, the instrumentation
+costs one module global check per call, so core functions can stay
+instrumented permanently; the cheapest scalar engines are still left
+undecorated and timed by their callers' sections.
+
+    with profiling(cprofile=True) as profiler:
+        main()
+    profiler.to_json(), profiler.cprofile_dump()
+"""
+import contextlib
+import functools
+import threading
+import time
+
+_active = threading.local()
+_DISABLED = contextlib.nullcontext()
+# Number of profiling() blocks open on any thread; the fast path skips the
+# thread-local lookup while it is zero
+_open_blocks = 0
+_open_blocks_lock = threading.Lock()
+
+
+class Profiler:
+    """Call count and wall time per nested section path"""
+
+    def __init__(self, cprofile=False):
+        self.timings = {}
+        self.elapsed = None
+        self.cprofile_error = None
+        self._stack = []
+        self._lap = None
+        self._profile = None
+        if cprofile:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+
+    def _record(self, path, seconds):
+        timing = self.timings.setdefault(path, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+
+    @contextlib.contextmanager
+    def section(self, name):
+        depth = len(self._stack)
+        self._stack.append(name)
+        path = " / ".join(self._stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Checkpoints opened inside the block end with it
+            if self._lap is not None and self._lap[0] > depth:
+                self.end_checkpoint()
+            self._record(path, time.perf_counter() - start)
+            del self._stack[depth:]
+
+    def checkpoint(self, name):
+        """End the previous checkpoint section (if any) and start ``name``"""
+        self.end_checkpoint()
+        self._stack.append(name)
+        self._lap = (len(self._stack), " / ".join(self._stack), time.perf_counter())
+
+    def end_checkpoint(self):
+        if self._lap is not None:
+            depth, path, start = self._lap
+            self._record(path, time.perf_counter() - start)
+            del self._stack[depth - 1:]
+            self._lap = None
+
+    def to_dict(self):
+        """Sections in first-seen order with calls and total/mean/max milliseconds"""
+        return {
+            'elapsed_ms': None if self.elapsed is None else self.elapsed * 1000,
+            'sections': [
+                {'section': path, 'calls': calls, 'total_ms': total * 1000,
+                 'mean_ms': total * 1000 / calls, 'max_ms': longest * 1000}
+                for path, (calls, total, longest) in self.timings.items()
+            ],
+        }
+
+    def to_json(self):
+        import json
+
+        return json.dumps(self.to_dict(), indent=2)
+
+    def cprofile_dump(self):
+        """cProfile statistics in the .prof format read by pstats and snakeviz, or None"""
+        if self._profile is None or self.cprofile_error is not None:
+            return None
+        import marshal
+
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
+
+
+@contextlib.contextmanager
+def profiling(enabled=True, cprofile=False):
+    """Record sections on this thread for the duration of the block; yields the Profiler or None"""
+    if not enabled:
+        yield None
+        return
+    global _open_blocks
+    profiler = Profiler(cprofile)
+    previous = getattr(_active, 'profiler', None)
+    _active.profiler = profiler
+    with _open_blocks_lock:
+        _open_blocks += 1
+    if profiler._profile is not None:
+        try:
+            profiler._profile.enable()
+        except ValueError as error:
+            # Only one cProfile may run at a time on some Python versions
+            profiler.cprofile_error = str(error)
+    start = time.perf_counter()
+    try:
+        yield profiler
+    finally:
+        profiler.end_checkpoint()
+        profiler.elapsed = time.perf_counter() - start
+        if profiler._profile is not None and profiler.cprofile_error is None:
+            profiler._profile.disable()
+        _active.profiler = previous
+        with _open_blocks_lock:
+            _open_blocks -= 1
+
+
+def active_profiler():
+    return getattr(_active, 'profiler', None)
+
+
+def section(name):
+    """Context manager timing a block under ``name`` when profiling is active"""
+    profiler = getattr(_active, 'profiler', None) if _open_blocks else None
+    return _DISABLED if profiler is None else profiler.section(name)
+
+
+def checkpoint(name):
+    """Start timing the next sequential section of a long function"""
+    profiler = getattr(_active, 'profiler', None) if _open_blocks else None
+    if profiler is not None:
+        profiler.checkpoint(name)
+
+
+def profiled(function=None, *, name=None):
+    """Decorator timing every call as a section (named after the function)"""
+    def decorate(function):
+        label = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _open_blocks:
+                return function(*args, **kwargs)
+            profiler = getattr(_active, 'profiler', None)
+            if profiler is None:
+                return function(*args, **kwargs)
+            with profiler.section(label):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate if function is None else decorate(function)
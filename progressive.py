@@ -0,0 +1,59 @@
+"""Background computation with streamed progress.
+
+A task runs a slow function on a daemon thread and passes its
+``on_progress(done, total, partial)`` reports through a queue. The worker
+never touches Streamlit; the script thread drains the queue and draws the
+partial results, so the rest of the page can render while it computes.
+"""
+import queue
+import threading
+
+
+class TaskCancelled(Exception):
+    """Raised inside a cancelled task at its next progress report"""
+
+
+class BackgroundTask:
+    """Run ``function(*args, on_progress=..., **kwargs)`` on a worker thread"""
+
+    def __init__(self, function, *args, **kwargs):
+        self.result = None
+        self._updates = queue.Queue()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(function, args, kwargs), daemon=True)
+        self._thread.start()
+
+    def _report(self, done, total, partial):
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+        self._updates.put(('progress', (done, total, partial)))
+
+    def _run(self, function, args, kwargs):
+        try:
+            result = function(*args, on_progress=self._report, **kwargs)
+        except TaskCancelled:
+            self._updates.put(('cancelled', None))
+        except Exception as error:
+            self._updates.put(('error', error))
+        else:
+            self._updates.put(('done', result))
+
+    def cancel(self):
+        """Stop the task at its next progress report"""
+        self._cancelled.set()
+
+    def iter_progress(self):
+        """Yield (done, total, partial) reports until the task finishes.
+
+        Afterwards ``result`` holds the return value; an exception raised by
+        the task is re-raised here.
+        """
+        while True:
+            kind, payload = self._updates.get()
+            if kind == 'progress':
+                yield payload
+            elif kind == 'error':
+                raise payload
+            else:
+                self.result = payload
+                return
@@ -0,0 +1,428 @@
+"""Plan evaluation and the comprehensive report, shared by the app, the API and bulk exports.
+
+evaluate_plan runs the per-scenario analysis the way the app's main
+calculations do (the month-by-month ledger for amortizing debt or SIP
+step-ups, the closed form otherwise). build_report turns it into a
+PlanReport holding raw numbers; to_display() gives the formatted view shown
+by "Generate Comprehensive Report", while to_dict() and to_record() feed
+the JSON, CSV and Parquet serializers. ReportWriter streams any number of
+reports to disk in fixed-size batches.
+
+JSON is encoded with orjson when it is installed, else the json module.
+"""
+import io
+import json
+import math
+from collections import namedtuple
+from numbers import Real
+
+from cashflow import evaluate_cashflow_plan, ledger_projection_table, uses_cashflow_ledger
+from investment_core import (
+    ALLOCATION_TOLERANCE,
+    ASSET_KEYS,
+    SCENARIO_KEYS,
+    build_projection_table,
+    calculate_emi,
+    calculate_investment_returns,
+    calculate_time_to_goal,
+    inflation_adjusted_target,
+)
+
+ALLOCATION_LABELS = {
+    'mutual_funds': 'Mutual Funds', 'stocks': 'Stocks', 'fd': 'Fixed Deposits', 'bonds': 'Bonds', 'aif': 'AIF'
+}
+# Reports buffered per batch by ReportWriter
+REPORT_BATCH_SIZE = 10000
+
+PLAN_DEFAULTS = {
+    'initial_amount': 0,
+    'monthly_investment': 0,
+    'inflation_rate': 4.8,
+    'debt_emi': 0,
+    'debt_amount': 0,
+    'debt_rate': 0,
+    'debt_tenure': 0,
+    'sip_step_up': 0,
+    'redirect_emi': True,
+}
+# Free-text fields carried into the report as given
+PLAN_LABELS = ['investment_type', 'goal_type', 'reference']
+
+
+def _whole(value):
+    # JSON and CSV numbers arrive as floats or ints; the report formats
+    # 50000 and 50000.0 differently, so whole amounts are kept as ints
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def _blank(value):
+    return value is None or value != value
+
+
+def _number(plan, field):
+    value = plan[field]
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"{field} must be a number, got {value!r}") from None
+    if isinstance(value, bool) or not isinstance(value, Real) or not math.isfinite(value):
+        raise ValueError(f"{field} must be a number, got {value!r}")
+    return _whole(value)
+
+
+def parse_plan(plan):
+    """Inputs of one plan dict (the batch planner's fields) with defaults applied and the EMI derived.
+
+    Numbers may also be given as numeric strings; missing or NaN optional
+    fields take their defaults. Raises ValueError for a missing required
+    field, a value that is not a number, a horizon that is not a positive
+    whole number of years or an allocation not totalling 100%. Every API
+    endpoint evaluates plans through this, as the batch planner's row
+    checks do for files.
+    """
+    if not isinstance(plan, dict):
+        raise ValueError("Every plan must be an object of plan fields")
+    missing = [field for field in ['time_horizon', 'target_amount'] + ASSET_KEYS if _blank(plan.get(field))]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    inputs = {}
+    for field, default in PLAN_DEFAULTS.items():
+        value = plan.get(field)
+        if _blank(value):
+            inputs[field] = default
+        elif isinstance(default, bool) and isinstance(value, bool):
+            inputs[field] = value
+        else:
+            inputs[field] = _number(plan, field)
+    inputs['redirect_emi'] = bool(inputs['redirect_emi'])
+    for field in PLAN_LABELS:
+        inputs[field] = None if _blank(plan.get(field)) else plan[field]
+    time_horizon = _number(plan, 'time_horizon')
+    if time_horizon <= 0 or time_horizon != int(time_horizon):
+        raise ValueError(f"time_horizon must be a positive whole number of years, got {plan['time_horizon']}")
+    inputs['time_horizon'] = int(time_horizon)
+    inputs['target_amount'] = _number(plan, 'target_amount')
+    inputs['allocation_percent'] = tuple(_number(plan, asset) for asset in ASSET_KEYS)
+    total = sum(inputs['allocation_percent'])
+    if abs(total / 100 - 1) > ALLOCATION_TOLERANCE:
+        raise ValueError(f"Allocation must total 100%, got {total}%")
+    inputs['allocation'] = {asset: percent / 100 for asset, percent in zip(ASSET_KEYS, inputs['allocation_percent'])}
+    if not inputs['debt_emi'] and inputs['debt_amount'] > 0 and inputs['debt_tenure'] > 0:
+        inputs['debt_emi'] = calculate_emi(inputs['debt_amount'], inputs['debt_rate'], inputs['debt_tenure'])
+    inputs['real_target'] = inflation_adjusted_target(
+        inputs['target_amount'], inputs['inflation_rate'], inputs['time_horizon']
+    )
+    return inputs
+
+
+def evaluate_inputs(inputs):
+    """evaluate_plan for the output of parse_plan"""
+    return evaluate_plan(
+        inputs['initial_amount'], inputs['time_horizon'], inputs['monthly_investment'], inputs['allocation'],
+        inputs['real_target'], inputs['debt_amount'], inputs['debt_rate'], inputs['debt_emi'],
+        inputs['debt_tenure'], inputs['sip_step_up'], inputs['redirect_emi']
+    )
+
+
+def evaluate_plan(initial_amount, time_horizon, monthly_investment, allocation, real_target, debt_amount=0,
+                  debt_rate=0, debt_emi=0, debt_tenure=0, sip_step_up=0, redirect_emi=True, scenarios=None):
+    """Results, time to goal and ledger (None without one) per scenario, as three dicts"""
+    scenarios = SCENARIO_KEYS if scenarios is None else list(scenarios)
+    use_ledger = uses_cashflow_ledger(debt_amount, debt_emi, debt_tenure, sip_step_up)
+    results, time_to_goals, ledgers = {}, {}, {}
+    for scenario in scenarios:
+        if use_ledger:
+            plan = evaluate_cashflow_plan(
+                initial_amount, time_horizon, monthly_investment, allocation, scenario, real_target,
+                debt_amount, debt_rate, debt_emi, debt_tenure, sip_step_up, redirect_emi
+            )
+            results[scenario], time_to_goals[scenario], ledgers[scenario] = (
+                plan['result'], plan['time_to_goal'], plan['ledger']
+            )
+            continue
+        results[scenario] = calculate_investment_returns(
+            initial_amount, time_horizon, monthly_investment, allocation, scenario, debt_emi
+        )
+        time_to_goals[scenario] = calculate_time_to_goal(
+            real_target, initial_amount, monthly_investment, results[scenario]['portfolio_return'], debt_emi
+        )
+        ledgers[scenario] = None
+    return results, time_to_goals, ledgers
+
+
+def projection_series(initial_amount, time_horizon, monthly_investment, allocation, debt_emi=0, ledgers=None,
+                      scenarios=None, monthly=False):
+    """Projected value per scenario over the horizon, from the ledgers when the plan has them"""
+    scenarios = SCENARIO_KEYS if scenarios is None else list(scenarios)
+    if ledgers and all(ledgers.get(scenario) is not None for scenario in scenarios):
+        return ledger_projection_table({scenario: ledgers[scenario] for scenario in scenarios}, monthly=monthly)
+    return build_projection_table(
+        initial_amount, time_horizon, monthly_investment, allocation, debt_emi, scenarios, monthly=monthly
+    )
+
+
+SCENARIO_METRICS = ('future_value', 'total_investment', 'gains', 'portfolio_return', 'portfolio_risk',
+                    'time_adjusted_sharpe')
+
+ScenarioReport = namedtuple('ScenarioReport', SCENARIO_METRICS + ('time_to_goal',))
+ScenarioReport.__doc__ = "Raw figures for one scenario; time_to_goal is in years, None if over 100"
+
+
+class PlanReport(namedtuple('PlanReport', [
+    'investment_type', 'goal_type', 'initial_amount', 'monthly_investment', 'time_horizon', 'target_amount',
+    'real_target', 'has_debt', 'debt_amount', 'debt_rate', 'debt_emi', 'effective_monthly_investment',
+    'allocation_percent', 'scenarios', 'goal_achievable', 'best_scenario', 'risk_level', 'debt_recommendation',
+    'reference',
+])):
+    """The comprehensive report with raw numbers.
+
+    Amounts are in rupees, rates and returns are decimals except
+    ``debt_rate`` (percent, as entered), and ``allocation_percent`` holds
+    whole percentages in ASSET_KEYS order. ``scenarios`` maps each scenario
+    to its ScenarioReport. ``reference`` is an optional caller identifier
+    carried through bulk exports.
+    """
+    __slots__ = ()
+
+    def to_dict(self):
+        """Nested JSON-ready dict of raw values"""
+        return {
+            'reference': self.reference,
+            'investment_profile': {
+                'strategy': self.investment_type,
+                'initial_amount': self.initial_amount,
+                'monthly_investment': self.monthly_investment,
+                'time_horizon': self.time_horizon,
+                'target_amount': self.target_amount,
+                'inflation_adjusted_target': self.real_target,
+                'primary_goal': self.goal_type,
+            },
+            'debt_profile': {
+                'has_debt': self.has_debt,
+                'debt_amount': self.debt_amount,
+                'interest_rate': self.debt_rate,
+                'monthly_emi': self.debt_emi,
+                'effective_monthly_investment': self.effective_monthly_investment,
+            },
+            'asset_allocation': dict(zip(ASSET_KEYS, self.allocation_percent)),
+            'scenario_analysis': {scenario: figures._asdict() for scenario, figures in self.scenarios.items()},
+            'recommendations': {
+                'goal_achievable': self.goal_achievable,
+                'best_scenario': self.best_scenario,
+                'risk_level': self.risk_level,
+                'debt_recommendation': self.debt_recommendation,
+            },
+        }
+
+    def to_record(self):
+        """One flat row: plan fields, allocation_<asset> and <metric>_<scenario> columns"""
+        record = {field: getattr(self, field) for field in _RECORD_PLAN_FIELDS}
+        record.update((f"allocation_{asset}", percent) for asset, percent in zip(ASSET_KEYS, self.allocation_percent))
+        for scenario, figures in self.scenarios.items():
+            record.update((f"{metric}_{scenario}", value) for metric, value in zip(figures._fields, figures))
+        return record
+
+    def to_display(self):
+        """The report as nested dicts of display strings, as shown in the app"""
+        return {
+            'Investment Profile': {
+                'Strategy': self.investment_type,
+                'Initial Amount': f"₹{self.initial_amount:,}" if self.initial_amount > 0 else "₹0",
+                'Monthly SIP': f"₹{self.monthly_investment:,}" if self.monthly_investment > 0 else "₹0",
+                'Time Horizon': f"{self.time_horizon} years",
+                'Target Amount': f"₹{self.target_amount:,}",
+                'Inflation Adjusted Target': f"₹{self.real_target:,.0f}",
+                'Primary Goal': self.goal_type
+            },
+            'Debt Profile': {
+                'Has Debt': self.has_debt,
+                'Debt Amount': f"₹{self.debt_amount:,}" if self.has_debt else "None",
+                'Interest Rate': f"{self.debt_rate}%" if self.has_debt else "N/A",
+                'Monthly EMI': f"₹{self.debt_emi:,.0f}" if self.has_debt else "None",
+                'Effective Investment': f"₹{self.effective_monthly_investment:,.0f}/mo"
+            },
+            'Asset Allocation': {
+                ALLOCATION_LABELS[asset]: f"{percent}%" for asset, percent in zip(ASSET_KEYS, self.allocation_percent)
+            },
+            'Scenario Analysis': {
+                scenario: {
+                    'Future Value': f"₹{figures.future_value:,.0f}",
+                    'Total Investment': f"₹{figures.total_investment:,.0f}",
+                    'Total Gains': f"₹{figures.gains:,.0f}",
+                    'Portfolio Return': f"{figures.portfolio_return*100:.1f}%",
+                    'Portfolio Risk': f"{figures.portfolio_risk*100:.1f}%",
+                    'Time-Adj Sharpe': f"{figures.time_adjusted_sharpe:.2f}",
+                    'Time to Goal': f"{figures.time_to_goal:.1f} years" if figures.time_to_goal else "Not achievable"
+                } for scenario, figures in self.scenarios.items()
+            },
+            'Recommendations': {
+                'Goal Achievable': self.goal_achievable,
+                'Best Scenario': self.best_scenario,
+                'Risk Level': self.risk_level,
+                'Debt Recommendation': self.debt_recommendation
+            }
+        }
+
+
+_RECORD_PLAN_FIELDS = [field for field in PlanReport._fields if field not in ('allocation_percent', 'scenarios')]
+
+
+def build_report(investment_type, initial_amount, monthly_investment, time_horizon, target_amount, real_target,
+                 goal_type, allocation_percent, results, time_to_goals, has_debt=False, debt_amount=0, debt_rate=0,
+                 debt_emi=0, reference=None):
+    """PlanReport from the per-scenario ``results`` and ``time_to_goals`` of evaluate_plan"""
+    scenarios = {}
+    for scenario, result in results.items():
+        time_to_goal = time_to_goals[scenario]
+        scenarios[scenario] = ScenarioReport(
+            *(float(result[metric]) for metric in SCENARIO_METRICS),
+            float(time_to_goal) if time_to_goal and time_to_goal < 100 else None
+        )
+    normal_result = results['normal']
+    reachable = [(s, figures.time_to_goal) for s, figures in scenarios.items() if figures.time_to_goal]
+    return PlanReport(
+        investment_type, goal_type, initial_amount, monthly_investment, time_horizon, target_amount,
+        float(real_target), bool(has_debt), debt_amount, debt_rate, float(debt_emi),
+        float(normal_result['effective_monthly_investment']), tuple(allocation_percent), scenarios,
+        bool(normal_result['future_value'] >= real_target),
+        min(reachable, key=lambda x: x[1], default=(None, None))[0],
+        "Low" if normal_result['portfolio_risk'] < 0.1 else "Medium" if normal_result['portfolio_risk'] < 0.2 else "High",
+        "Pay off debt first" if (has_debt and debt_rate/100 > normal_result['portfolio_return']) else "Continue balanced approach",
+        reference
+    )
+
+
+def build_report_data(*args, **kwargs):
+    """build_report(...).to_display(): the report as the app displays it"""
+    return build_report(*args, **kwargs).to_display()
+
+
+def plan_report(plan):
+    """PlanReport for one plan dict (see parse_plan)"""
+    return inputs_report(parse_plan(plan))
+
+
+def inputs_report(inputs):
+    """PlanReport for the output of parse_plan"""
+    results, time_to_goals, _ = evaluate_inputs(inputs)
+    return build_report(
+        inputs['investment_type'], inputs['initial_amount'], inputs['monthly_investment'], inputs['time_horizon'],
+        inputs['target_amount'], inputs['real_target'], inputs['goal_type'], inputs['allocation_percent'],
+        results, time_to_goals, inputs['debt_amount'] > 0 or inputs['debt_emi'] > 0, inputs['debt_amount'],
+        inputs['debt_rate'], inputs['debt_emi'], inputs['reference']
+    )
+
+
+def _dumps(value):
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(value, ensure_ascii=False).encode()
+    return orjson.dumps(value)
+
+
+def report_schema(scenarios=SCENARIO_KEYS):
+    """Arrow schema of PlanReport.to_record() rows"""
+    import pyarrow as pa
+
+    fields = [
+        ('investment_type', pa.string()), ('goal_type', pa.string()), ('initial_amount', pa.float64()),
+        ('monthly_investment', pa.float64()), ('time_horizon', pa.int32()), ('target_amount', pa.float64()),
+        ('real_target', pa.float64()), ('has_debt', pa.bool_()), ('debt_amount', pa.float64()),
+        ('debt_rate', pa.float64()), ('debt_emi', pa.float64()), ('effective_monthly_investment', pa.float64()),
+        ('goal_achievable', pa.bool_()), ('best_scenario', pa.string()), ('risk_level', pa.string()),
+        ('debt_recommendation', pa.string()), ('reference', pa.string()),
+    ]
+    fields += [(f"allocation_{asset}", pa.float64()) for asset in ASSET_KEYS]
+    fields += [(f"{metric}_{scenario}", pa.float64()) for scenario in scenarios for metric in ScenarioReport._fields]
+    return pa.schema(fields)
+
+
+def reports_to_table(reports, scenarios=SCENARIO_KEYS):
+    """Arrow table with one row per report"""
+    import pyarrow as pa
+
+    records = [report.to_record() for report in reports]
+    for record in records:
+        if record['reference'] is not None:
+            record['reference'] = str(record['reference'])
+    return pa.Table.from_pylist(records, schema=report_schema(scenarios))
+
+
+def reports_to_json(reports):
+    """UTF-8 JSON array of PlanReport.to_dict()"""
+    return _dumps([report.to_dict() for report in reports])
+
+
+def reports_to_csv(reports, scenarios=SCENARIO_KEYS):
+    """CSV bytes with one row per report"""
+    import pyarrow.csv as pa_csv
+
+    sink = io.BytesIO()
+    pa_csv.write_csv(reports_to_table(reports, scenarios), sink)
+    return sink.getvalue()
+
+
+def reports_to_parquet(reports, scenarios=SCENARIO_KEYS):
+    """Parquet file bytes with one row per report"""
+    import pyarrow.parquet as pq
+
+    sink = io.BytesIO()
+    pq.write_table(reports_to_table(reports, scenarios), sink)
+    return sink.getvalue()
+
+
+class ReportWriter:
+    """Stream reports to a .parquet, .csv or .jsonl file in batches of ``batch_size``"""
+
+    def __init__(self, path, scenarios=SCENARIO_KEYS, batch_size=REPORT_BATCH_SIZE):
+        self.path = path
+        self.scenarios = scenarios
+        self.batch_size = batch_size
+        self.count = 0
+        self._pending = []
+        self._writer = None
+
+    def write(self, reports):
+        for report in reports:
+            self._pending.append(report)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        if self.path.endswith('.jsonl'):
+            if self._writer is None:
+                self._writer = open(self.path, 'wb')
+            self._writer.write(b''.join(_dumps(report.to_dict()) + b'\n' for report in self._pending))
+        else:
+            table = reports_to_table(self._pending, self.scenarios)
+            if self._writer is None:
+                if self.path.endswith('.parquet'):
+                    import pyarrow.parquet as pq
+
+                    self._writer = pq.ParquetWriter(self.path, table.schema)
+                else:
+                    import pyarrow.csv as pa_csv
+
+                    self._writer = pa_csv.CSVWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        self.count += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def write_reports(reports, path, scenarios=SCENARIO_KEYS, batch_size=REPORT_BATCH_SIZE):
+    """Write an iterable of reports to path (.parquet, .csv or .jsonl); returns the count"""
+    writer = ReportWriter(path, scenarios, batch_size)
+    try:
+        writer.write(reports)
+    finally:
+        writer.close()
+    return writer.count
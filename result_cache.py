@@ -0,0 +1,147 @@
+"""Process-wide cache of plan results shared by all sessions.
+
+Streamlit serves every session from the same process, so a result cached
+here is computed once per server rather than once per session. The cache is
+thread-safe, bounded (least recently used entries are evicted first), and
+entries expire after a TTL. Concurrent requests for a key that is still
+being computed wait for that computation instead of repeating it.
+
+Keys come from plan_key, which canonicalizes the plan inputs so equal
+plans share an entry whatever the argument types or dict order.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from numbers import Number
+
+import numpy as np
+
+
+def _canonical(value):
+    if value is None or isinstance(value, (bool, str, bytes)):
+        return value
+    if isinstance(value, Number):
+        # 50000, 50000.0 and np.float64(50000) are the same plan input
+        value = float(value)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, dict):
+        return ('dict',) + tuple(sorted((str(key), _canonical(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical(item) for item in value)
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return ('ndarray', array.shape, array.dtype.str, hashlib.sha1(array.tobytes()).hexdigest())
+    if getattr(value, 'key', None) is not None:
+        # Loaded data sets (e.g. backtest.ReturnSeries) carry a content key
+        return (type(value).__name__, value.key)
+    raise TypeError(f"Cannot build a cache key from {type(value).__name__}")
+
+
+def plan_key(name, *args, **kwargs):
+    """Hashable key for calling ``name`` with these inputs"""
+    return (name, _canonical(args), _canonical(kwargs))
+
+
+class SharedResultCache:
+    """Thread-safe LRU cache with a TTL and hit/miss metrics"""
+
+    def __init__(self, max_entries=256, ttl=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, stored_at, compute_seconds)
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._metrics = dict.fromkeys(
+            ['hits', 'misses', 'coalesced', 'evictions', 'expirations', 'errors', 'seconds_saved'], 0
+        )
+
+    def _lookup(self, key):
+        """(found, entry); expires stale entries. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if self.ttl is not None and self._clock() - entry[1] > self.ttl:
+            del self._entries[key]
+            self._metrics['expirations'] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry
+
+    def _hit(self, entry):
+        self._metrics['hits'] += 1
+        self._metrics['seconds_saved'] += entry[2]
+        return entry[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key)[0]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Cached value for ``key`` (counted as a hit), or ``default``"""
+        with self._lock:
+            found, entry = self._lookup(key)
+            return self._hit(entry) if found else default
+
+    def put(self, key, value, compute_seconds=0.0):
+        with self._lock:
+            self._entries[key] = (value, self._clock(), compute_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+
+    def get_or_compute(self, key, function, *args, **kwargs):
+        """Cached value for ``key``, computing ``function(*args, **kwargs)`` once on a miss.
+
+        If another thread is already computing ``key`` this waits for it. A
+        failed computation is not cached: its error goes to the caller that
+        ran it, and waiting callers retry.
+        """
+        while True:
+            with self._lock:
+                found, entry = self._lookup(key)
+                if found:
+                    return self._hit(entry)
+                done = self._in_flight.get(key)
+                if done is None:
+                    done = self._in_flight[key] = threading.Event()
+                    break
+                self._metrics['coalesced'] += 1
+            done.wait()
+
+        try:
+            start = time.perf_counter()
+            value = function(*args, **kwargs)
+            seconds = time.perf_counter() - start
+        except BaseException:
+            with self._lock:
+                self._metrics['errors'] += 1
+            raise
+        else:
+            self.put(key, value, seconds)
+            with self._lock:
+                self._metrics['misses'] += 1
+            return value
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def statistics(self):
+        """Entry count, limits and counters; misses count computations"""
+        with self._lock:
+            stats = dict(self._metrics, entries=len(self._entries), max_entries=self.max_entries, ttl=self.ttl,
+                         in_flight=len(self._in_flight))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else None
+        return stats
@@ -0,0 +1,57 @@
+"""Correctness tests for the JSON API request handling."""
+import json
+
+import pandas as pd
+import pytest
+
+import api
+from batch_planner import evaluate_plans
+
+PLAN = {'time_horizon': 10, 'target_amount': 3000000, 'mutual_funds': 40, 'stocks': 25, 'fd': 15, 'bonds': 15,
+        'aif': 5, 'initial_amount': 50000, 'monthly_investment': 20000}
+
+
+def _post(path, payload):
+    status, body = api.handle_request(path, json.dumps(payload).encode())
+    return status, json.loads(body)
+
+
+def test_scenarios_match_the_batch_planner_for_ledger_plans():
+    plan = dict(PLAN, debt_amount=500000, debt_rate=10, debt_tenure=5)
+    status, body = _post('/v1/scenarios', {'plans': [plan]})
+    expected = evaluate_plans(pd.DataFrame([plan])).iloc[0]
+    assert status == 200
+    assert body['results'][0]['future_value_normal'] == expected['future_value_normal']
+    assert body['results'][0]['time_to_goal_normal'] == expected['time_to_goal_normal']
+
+
+ENDPOINTS = ['/v1/scenarios', '/v1/time-to-goal', '/v1/report', '/v1/projection']
+
+
+@pytest.mark.parametrize('cells, error', [
+    ({'time_horizon': 0}, 'time_horizon must be a positive whole number of years'),
+    ({'time_horizon': -5}, 'time_horizon must be a positive whole number of years'),
+    ({'time_horizon': 10.5}, 'time_horizon must be a positive whole number of years'),
+    ({'initial_amount': 'abc'}, "initial_amount must be a number, got 'abc'"),
+    ({'target_amount': [1]}, 'target_amount must be a number'),
+    ({'stocks': 35}, 'Allocation must total 100%'),
+])
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_invalid_plans_are_rejected_alike_by_every_endpoint(path, cells, error):
+    status, body = _post(path, {'plans': [PLAN, dict(PLAN, **cells)]})
+    assert status == 400
+    assert body['error'].startswith(f"Plan 1: {error}")
+
+
+def test_endpoints_evaluate_the_same_parsed_plan():
+    # Numeric strings and a float horizon are coerced once, the same way for every endpoint
+    plan = dict(PLAN, time_horizon=10.0, initial_amount='50000', stocks=24.9999999, bonds=15.0000001)
+    _, scenarios = _post('/v1/scenarios', {'plans': [plan]})
+    _, report = _post('/v1/report', {'plans': [plan]})
+    _, projection = _post('/v1/projection', {'plans': [plan]})
+    _, reference = _post('/v1/scenarios', {'plans': [PLAN]})
+    future_value = scenarios['results'][0]['future_value_normal']
+    assert scenarios['results'][0]['status'] == 'ok'
+    assert future_value == pytest.approx(reference['results'][0]['future_value_normal'], rel=1e-9)
+    assert report['results'][0]['scenario_analysis']['normal']['future_value'] == future_value
+    assert projection['results'][0]['normal'][-1] == pytest.approx(future_value, rel=1e-12)
@@ -0,0 +1,108 @@
+"""Correctness tests for the vectorized batch planner."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch_planner
+from batch_planner import evaluate_plans
+from investment_core import SCENARIO_KEYS
+from report import evaluate_inputs, parse_plan
+
+PLAN = {'time_horizon': 10, 'target_amount': 3000000, 'mutual_funds': 40, 'stocks': 25, 'fd': 15, 'bonds': 15,
+        'aif': 5, 'initial_amount': 50000, 'monthly_investment': 20000}
+
+
+@pytest.mark.parametrize('extra', [
+    {'debt_amount': 500000, 'debt_rate': 10, 'debt_tenure': 5},
+    {'sip_step_up': 10},
+    {'debt_amount': 500000, 'debt_rate': 12.5, 'debt_tenure': 7, 'sip_step_up': 5, 'redirect_emi': False},
+])
+def test_ledger_plans_match_the_app(extra):
+    plan = dict(PLAN, **extra)
+    row = evaluate_plans(pd.DataFrame([plan])).iloc[0]
+    results, time_to_goals, _ = evaluate_inputs(parse_plan(plan))
+    for scenario in SCENARIO_KEYS:
+        assert row[f"future_value_{scenario}"] == results[scenario]['future_value']
+        expected_time = np.nan if time_to_goals[scenario] is None else time_to_goals[scenario]
+        np.testing.assert_equal(row[f"time_to_goal_{scenario}"], expected_time)
+    assert row['total_investment'] == results['normal']['total_investment']
+    assert row['goal_achievable'] == (results['normal']['future_value'] >= row['real_target'])
+
+
+def test_closed_form_plans_match_the_app():
+    row = evaluate_plans(pd.DataFrame([dict(PLAN, debt_emi=3000)])).iloc[0]
+    results, time_to_goals, _ = evaluate_inputs(parse_plan(dict(PLAN, debt_emi=3000)))
+    for scenario in SCENARIO_KEYS:
+        assert row[f"future_value_{scenario}"] == results[scenario]['future_value']
+        assert row[f"time_to_goal_{scenario}"] == time_to_goals[scenario]
+
+
+def test_blank_optional_cells_take_their_defaults():
+    csv = ("time_horizon,target_amount,mutual_funds,stocks,fd,bonds,aif,initial_amount,monthly_investment,debt_emi\n"
+           "10,3000000,40,25,15,15,5,50000,,\n"
+           "10,3000000,40,25,15,15,5,50000,0,0\n")
+    output = evaluate_plans(pd.read_csv(io.StringIO(csv)))
+    assert (output['status'] == 'ok').all()
+    assert not output['future_value_normal'].isna().any()
+    assert output['future_value_normal'][0] == output['future_value_normal'][1]
+    assert output['monthly_investment'][0] == 0
+
+
+@pytest.mark.parametrize('cells, status', [
+    ({'time_horizon': None}, 'missing time_horizon'),
+    ({'target_amount': 'abc'}, 'non-numeric target_amount'),
+    ({'monthly_investment': 'x'}, 'non-numeric monthly_investment'),
+    ({'time_horizon': 0}, 'time_horizon must be a positive whole number of years'),
+    ({'time_horizon': 10.5}, 'time_horizon must be a positive whole number of years'),
+    ({'stocks': 35}, 'allocation must total 100%'),
+])
+def test_invalid_rows_are_flagged(cells, status):
+    output = evaluate_plans(pd.DataFrame([PLAN, dict(PLAN, **cells)]))
+    assert output['status'].tolist() == ['ok', status]
+    assert output.loc[0, 'future_value_normal'] > 0
+    assert output.loc[1, ['future_value_normal', 'time_to_goal_normal', 'real_target']].isna().all()
+    assert not output.loc[1, 'goal_achievable']
+
+
+def _mixed_id_plans(path):
+    # Ids 0..9 then C10..C24: the first 10-row chunk alone would infer ints
+    plans = pd.DataFrame([dict(PLAN, client_id=str(i) if i < 10 else f"C{i}") for i in range(25)])
+    if path.endswith('.parquet'):
+        plans.to_parquet(path, index=False)
+    else:
+        plans.to_csv(path, index=False)
+
+
+@pytest.mark.parametrize('output_name', ['results.parquet', 'results.csv'])
+@pytest.mark.parametrize('input_name', ['plans.csv', 'plans.parquet'])
+def test_pass_through_ids_of_mixed_types_across_chunks(tmp_path, input_name, output_name):
+    input_path, output_path = str(tmp_path / input_name), str(tmp_path / output_name)
+    _mixed_id_plans(input_path)
+    rows, _ = batch_planner.run_batch(input_path, output_path, chunk_size=10)
+    if output_path.endswith('.parquet'):
+        output = pd.read_parquet(output_path)
+    else:
+        output = pd.read_csv(output_path, dtype={'client_id': str})
+    assert rows == 25
+    assert output['client_id'].tolist() == [str(i) if i < 10 else f"C{i}" for i in range(25)]
+    assert (output['status'] == 'ok').all()
+
+
+def test_failed_run_removes_the_partial_output(tmp_path, monkeypatch):
+    input_path, output_path = str(tmp_path / 'plans.csv'), tmp_path / 'results.parquet'
+    _mixed_id_plans(input_path)
+    evaluate = batch_planner.evaluate_plans
+    chunks = []
+
+    def failing_on_second_chunk(chunk, model=None):
+        chunks.append(chunk)
+        if len(chunks) == 2:
+            raise RuntimeError('boom')
+        return evaluate(chunk, model)
+
+    monkeypatch.setattr(batch_planner, 'evaluate_plans', failing_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        batch_planner.run_batch(input_path, str(output_path), chunk_size=10)
+    assert not output_path.exists()
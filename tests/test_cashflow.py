@@ -0,0 +1,110 @@
+"""Correctness tests for the month-by-month cashflow ledger."""
+import numpy as np
+import pytest
+
+import cashflow
+from investment_core import ASSET_KEYS, calculate_emi, calculate_investment_returns
+
+BALANCED = {'mutual_funds': 0.40, 'stocks': 0.25, 'fd': 0.15, 'bonds': 0.15, 'aif': 0.05}
+
+
+def _plan(years, debt_amount, debt_rate, debt_tenure):
+    emi = calculate_emi(debt_amount, debt_rate, debt_tenure)
+    return cashflow.evaluate_cashflow_plan(
+        50000, years, 20000, BALANCED, 'normal', 5000000, debt_amount, debt_rate, emi, debt_tenure
+    )
+
+
+@pytest.mark.parametrize('debt_rate, debt_tenure', [(10, 5), (12.5, 7), (0, 5)])
+def test_exact_tenure_loan_is_repaid_in_its_last_month(debt_rate, debt_tenure):
+    plan = _plan(10, 500000, debt_rate, debt_tenure)
+    ledger = plan['ledger']
+    assert plan['result']['debt_payoff_month'] == debt_tenure * 12
+    assert ledger.loc[debt_tenure * 12, 'Debt Balance'] == 0
+    # No residual EMI after the payoff month
+    assert (ledger.loc[ledger.index > debt_tenure * 12, 'EMI Paid'] == 0).all()
+    assert plan['result']['total_debt_paid'] == pytest.approx(calculate_emi(500000, debt_rate, debt_tenure)
+                                                              * debt_tenure * 12)
+
+
+def test_loan_ending_at_the_horizon_is_repaid():
+    plan = _plan(5, 500000, 10, 5)
+    assert len(plan['ledger']) == 60
+    assert plan['result']['debt_payoff_month'] == 60
+
+
+def test_loan_outlasting_the_horizon_is_not_repaid():
+    plan = _plan(4, 500000, 10, 5)
+    assert plan['result']['debt_payoff_month'] is None
+    assert plan['ledger']['Debt Balance'].iloc[-1] > 0
+
+
+def test_fixed_tenure_emi_without_balance():
+    plan = cashflow.evaluate_cashflow_plan(50000, 10, 20000, BALANCED, 'normal', None, 0, 0, 8000, 3)
+    assert plan['result']['debt_payoff_month'] == 36
+    assert plan['result']['total_debt_paid'] == 8000 * 36
+
+
+@pytest.mark.parametrize('sip_step_up, debt_amount, redirect_emi', [(10, 0, True), (5, 500000, True), (5, 500000, False)])
+def test_cashflow_goal_seek_agrees_with_the_ledger(sip_step_up, debt_amount, redirect_emi):
+    debt = dict(debt_amount=debt_amount, debt_rate=10, debt_emi=calculate_emi(debt_amount, 10, 5),
+                debt_tenure=5, sip_step_up=sip_step_up, redirect_emi=redirect_emi)
+    targets = np.array([3000000.0, 20000000.0])[:, np.newaxis]
+    horizons = np.array([5, 10])[np.newaxis, :]
+    solution = cashflow.cashflow_goal_seek(targets, 50000, horizons, 12000, BALANCED, **debt,
+                                           scenarios=['normal'])['normal']
+    for i, target in enumerate(targets[:, 0]):
+        for j, years in enumerate(horizons[0]):
+            with_sip = cashflow.evaluate_cashflow_plan(
+                50000, years, solution['monthly_investment'][i, j], BALANCED, 'normal', target, **debt
+            )
+            with_lump = cashflow.evaluate_cashflow_plan(
+                solution['lump_sum'][i, j], years, 12000, BALANCED, 'normal', target, **debt
+            )
+            unchanged = cashflow.evaluate_cashflow_plan(50000, years, 12000, BALANCED, 'normal', target, **debt)
+            assert with_sip['result']['future_value'] == pytest.approx(target, rel=1e-12)
+            if solution['lump_sum'][i, j] > 0:
+                assert with_lump['result']['future_value'] == pytest.approx(target, rel=1e-12)
+            else:
+                assert with_lump['result']['future_value'] >= target
+            assert solution['years'][i, j] == unchanged['time_to_goal']
+
+
+def test_batch_matches_the_scalar_ledger_bit_for_bit():
+    rng = np.random.default_rng(3)
+    n = 120
+    amounts = rng.choice([0.0, 50000.0, 100000.0], n)
+    years = rng.choice([1, 5, 10, 30, 101], n)
+    monthly_investments = rng.choice([0.0, 5000.0, 20000.0], n)
+    allocations = rng.dirichlet(np.ones(5), size=n)
+    targets = rng.choice([1e5, 3e6, 5e7], n)
+    debt_amounts = rng.choice([0.0, 500000.0, 1234567.5], n)
+    debt_rates = rng.choice([0.0, 8.5, 12.5], n)
+    debt_tenures = rng.choice([0, 3, 7, 25], n)
+    # Exact-tenure EMIs for loans, fixed EMIs with or without a loan balance
+    debt_emis = np.where(
+        (debt_amounts > 0) & (debt_tenures > 0) & (rng.random(n) < 0.5),
+        [calculate_emi(*loan) for loan in zip(debt_amounts, debt_rates, debt_tenures)],
+        rng.choice([0.0, 3000.0, 15000.0], n)
+    )
+    sip_step_ups = rng.choice([0.0, 5.0, 10.0], n)
+    redirect_emis = rng.random(n) < 0.5
+    portfolio_returns = np.array([
+        calculate_investment_returns(0, 1, 0, dict(zip(ASSET_KEYS, allocation)), 'normal')['portfolio_return']
+        for allocation in allocations
+    ])
+
+    batch = cashflow.evaluate_cashflow_plan_batch(
+        amounts, years, monthly_investments, portfolio_returns, targets, debt_amounts, debt_rates, debt_emis,
+        debt_tenures, sip_step_ups, redirect_emis, block_size=37
+    )
+    for i in range(n):
+        plan = cashflow.evaluate_cashflow_plan(
+            amounts[i], int(years[i]), monthly_investments[i], dict(zip(ASSET_KEYS, allocations[i])), 'normal',
+            targets[i], debt_amounts[i], debt_rates[i], debt_emis[i], int(debt_tenures[i]), sip_step_ups[i],
+            bool(redirect_emis[i])
+        )
+        for field in ['total_investment', 'future_value', 'effective_monthly_investment', 'total_debt_paid']:
+            assert batch[field][i] == plan['result'][field], (i, field)
+        time_to_goal = batch['time_to_goal'][i]
+        assert (np.isnan(time_to_goal) if plan['time_to_goal'] is None else time_to_goal == plan['time_to_goal']), i
@@ -0,0 +1,98 @@
+"""Correctness tests for the vectorized engines and solvers in investment_core."""
+import math
+
+import numpy as np
+import pytest
+
+import investment_core as core
+
+BALANCED = {'mutual_funds': 0.40, 'stocks': 0.25, 'fd': 0.15, 'bonds': 0.15, 'aif': 0.05}
+
+
+def _month_loop_time_to_goal(target_amount, initial_amount, monthly_investment, portfolio_return, debt_emi=0):
+    """The month-by-month search calculate_time_to_goal used before bisection"""
+    effective_monthly = max(0, monthly_investment - debt_emi)
+    monthly_return = portfolio_return / 12
+    for months in range(1, 1200):
+        fv_lump = initial_amount * (1 + portfolio_return) ** (months/12)
+        fv_sip = effective_monthly * (((1 + monthly_return) ** months - 1) / monthly_return)
+        if fv_lump + fv_sip >= target_amount:
+            return months / 12
+    return None
+
+
+@pytest.fixture(scope='module')
+def random_plans():
+    rng = np.random.default_rng(7)
+    n = 2000
+    return {
+        'amounts': rng.choice([0.0, 50000.0, 123456.78], n),
+        'years': rng.integers(1, 41, n),
+        'monthly_investments': rng.choice([0.0, 5000.0, 17500.5], n),
+        'allocations': rng.dirichlet(np.ones(5), size=n),
+        'scenario_idx': rng.integers(0, 3, n),
+        'debt_emis': rng.choice([0.0, 2000.0, 20000.0], n),
+    }
+
+
+def test_batch_matches_scalar_bit_for_bit(random_plans):
+    results = core.calculate_investment_returns_batch(
+        random_plans['amounts'], random_plans['years'], random_plans['monthly_investments'],
+        random_plans['allocations'], random_plans['scenario_idx'], random_plans['debt_emis']
+    )
+    for i in range(len(random_plans['amounts'])):
+        allocation = dict(zip(core.ASSET_KEYS, random_plans['allocations'][i]))
+        expected = core.calculate_investment_returns(
+            random_plans['amounts'][i], int(random_plans['years'][i]), random_plans['monthly_investments'][i],
+            allocation, core.SCENARIO_KEYS[random_plans['scenario_idx'][i]], random_plans['debt_emis'][i]
+        )
+        for field in core.RESULT_FIELDS:
+            assert results[field][i] == expected[field], (i, field)
+
+
+@pytest.mark.parametrize('portfolio_return', [0.02, 0.085, 0.12, 0.2])
+@pytest.mark.parametrize('initial_amount, monthly_investment, debt_emi', [
+    (50000, 5000, 0), (100000, 1000, 0), (1, 20000, 0), (50000, 5000, 4000), (2000000, 500, 0),
+])
+def test_bisection_matches_month_loop(initial_amount, monthly_investment, debt_emi, portfolio_return):
+    targets = np.geomspace(initial_amount * 1.001, 1e9, 60)
+    batch = core.calculate_time_to_goal_batch(targets, initial_amount, monthly_investment, portfolio_return, debt_emi)
+    for target, batch_years in zip(targets, batch):
+        expected = _month_loop_time_to_goal(target, initial_amount, monthly_investment, portfolio_return, debt_emi)
+        years = core.calculate_time_to_goal(target, initial_amount, monthly_investment, portfolio_return, debt_emi)
+        assert years == expected
+        assert (math.isnan(batch_years) if expected is None else batch_years == expected)
+
+
+@pytest.mark.parametrize('scenario', core.SCENARIO_KEYS)
+@pytest.mark.parametrize('amount, monthly_investment, debt_emi', [(50000, 5000, 0), (0, 10000, 2000), (200000, 0, 0)])
+def test_goal_seek_hits_its_target(scenario, amount, monthly_investment, debt_emi):
+    targets = np.array([1000000.0, 5000000.0])
+    horizons = np.array([5, 10, 25])
+    solution = core.goal_seek(targets[:, None], amount, horizons[None, :], monthly_investment, BALANCED, debt_emi,
+                              scenarios=[scenario])[scenario]
+
+    for i, target in enumerate(targets):
+        for j, years in enumerate(horizons):
+            years = int(years)
+            sip = solution['monthly_investment'][i, j]
+            reached = core.calculate_investment_returns(amount, years, sip, BALANCED, scenario, debt_emi)
+            if sip > 0:
+                assert reached['future_value'] == pytest.approx(target, rel=1e-9)
+            else:
+                # The lump sum alone already gets there
+                assert reached['future_value'] >= target
+
+            lump_sum = solution['lump_sum'][i, j]
+            reached = core.calculate_investment_returns(lump_sum, years, monthly_investment, BALANCED, scenario,
+                                                        debt_emi)
+            if lump_sum > 0:
+                assert reached['future_value'] == pytest.approx(target, rel=1e-9)
+            else:
+                assert reached['future_value'] >= target
+
+        portfolio_return = core.calculate_investment_returns(amount, 1, monthly_investment, BALANCED,
+                                                             scenario)['portfolio_return']
+        expected = core.calculate_time_to_goal(target, amount, monthly_investment, portfolio_return, debt_emi)
+        for years in solution['years'][i]:
+            assert (math.isnan(years) if expected is None else years == expected)
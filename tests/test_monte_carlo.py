@@ -0,0 +1,38 @@
+"""Seeded simulations give the same paths whatever the worker count."""
+import numpy as np
+import pytest
+
+import investment_core as core
+
+BALANCED = {'mutual_funds': 0.40, 'stocks': 0.25, 'fd': 0.15, 'bonds': 0.15, 'aif': 0.05}
+
+
+def _same_summary(left, right):
+    assert left.keys() == right.keys()
+    for key in left:
+        np.testing.assert_array_equal(left[key], right[key], err_msg=key)
+
+
+@pytest.mark.parametrize('workers', [2, 3, None])
+def test_monte_carlo_paths_do_not_depend_on_workers(workers):
+    args = (50000, 10, 5000, BALANCED, 'normal', 1000, 2000000)
+    serial = core.simulate_monte_carlo(*args, n_paths=5000, seed=42, chunk_size=1000, workers=1)
+    sharded = core.simulate_monte_carlo(*args, n_paths=5000, seed=42, chunk_size=1000, workers=workers)
+    _same_summary(serial, sharded)
+
+
+def test_bootstrap_paths_do_not_depend_on_workers():
+    import backtest
+
+    series = backtest.load_return_series()
+    args = (series, 50000, 10, 5000, BALANCED, 1000, 2000000)
+    serial = backtest.simulate_bootstrap(*args, n_paths=4000, seed=42, chunk_size=1000, workers=1)
+    sharded = backtest.simulate_bootstrap(*args, n_paths=4000, seed=42, chunk_size=1000, workers=3)
+    _same_summary(serial, sharded)
+
+
+def test_different_seeds_give_different_paths():
+    args = (50000, 10, 5000, BALANCED, 'normal', 0, 2000000)
+    first = core.simulate_monte_carlo(*args, n_paths=2000, seed=1, chunk_size=1000)
+    second = core.simulate_monte_carlo(*args, n_paths=2000, seed=2, chunk_size=1000)
+    assert not np.array_equal(first['percentiles'], second['percentiles'])
@@ -0,0 +1,38 @@
+"""The preset lookup tables return exactly what the engines compute."""
+import numpy as np
+import pytest
+
+import investment_core as core
+from preset_tables import PresetTables
+
+
+@pytest.fixture(scope='module')
+def tables():
+    return PresetTables()
+
+
+@pytest.mark.parametrize('amount, monthly_investment, debt_emi', [(50000, 5000, 0), (0, 5000, 1000), (123456.78, 0, 0)])
+def test_investment_returns_match_the_engine(tables, amount, monthly_investment, debt_emi):
+    # Every preset, scenario and horizon the tables cover
+    for preset, allocation in tables.allocations.items():
+        for scenario in tables.scenarios:
+            for years in range(1, tables.max_years + 1):
+                assert tables.investment_returns(preset, amount, years, monthly_investment, scenario, debt_emi) == \
+                    core.calculate_investment_returns(amount, years, monthly_investment, allocation, scenario,
+                                                      debt_emi), (preset, scenario, years)
+
+
+@pytest.mark.parametrize('monthly', [False, True])
+def test_projection_table_matches_the_engine(tables, monthly):
+    for preset, allocation in tables.allocations.items():
+        table = tables.projection_table(preset, 50000, 30, 5000, 1000, monthly=monthly)
+        expected = core.build_projection_table(50000, 30, 5000, allocation, 1000, monthly=monthly)
+        assert table.equals(expected), preset
+
+
+@pytest.mark.parametrize('debt_emi', [0, 1000])
+def test_time_to_goal_matches_the_engine(tables, debt_emi):
+    portfolio_return = tables.investment_returns('Conservative', 50000, 1, 5000)['portfolio_return']
+    for target in np.geomspace(60000, 1e9, 200):
+        assert tables.time_to_goal(target, 50000, 5000, portfolio_return, debt_emi) == \
+            core.calculate_time_to_goal(target, 50000, 5000, portfolio_return, debt_emi), target
@@ -0,0 +1,94 @@
+"""Behaviour of the process-wide SharedResultCache."""
+import threading
+
+import pytest
+
+from result_cache import SharedResultCache, plan_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = SharedResultCache(ttl=60, clock=clock)
+    cache.put('plan', 1)
+    clock.now = 60
+    assert cache.get('plan') == 1
+    clock.now = 60.5
+    assert cache.get('plan') is None
+    assert cache.get_or_compute('plan', lambda: 2) == 2
+    stats = cache.statistics()
+    assert stats['expirations'] == 1
+    assert stats['misses'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SharedResultCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.statistics()['evictions'] == 1
+
+
+def test_concurrent_requests_compute_once():
+    cache = SharedResultCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('plan', compute)))
+               for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.statistics()['coalesced'] < 3:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ['result'] * 4
+    assert len(calls) == 1
+    stats = cache.statistics()
+    assert stats['misses'] == 1
+    assert stats['coalesced'] == 3
+    assert stats['in_flight'] == 0
+
+
+def test_errors_are_not_cached():
+    cache = SharedResultCache()
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('plan', fail)
+    assert 'plan' not in cache
+    assert cache.get_or_compute('plan', lambda: 3) == 3
+    assert cache.statistics()['errors'] == 1
+
+
+def test_plan_key_canonicalizes_equal_plans():
+    import numpy as np
+
+    allocation = {'stocks': 0.5, 'fd': 0.5}
+    assert plan_key('f', 50000, allocation, seed=1) == \
+        plan_key('f', np.float64(50000.0), dict(reversed(list(allocation.items()))), seed=1.0)
+    assert plan_key('f', 50000) != plan_key('f', 50001)